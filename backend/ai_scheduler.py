@@ -8,7 +8,10 @@ import os
 import json
 from datetime import timedelta
 from db import db
-from models import Staff, StaffArea, TimeOffRequest
+from models import Staff, StaffArea
+from utils import get_time_off_days
+from rules import clinic_rules
+from schedule_engine import build_weekly_schedule
 
 # -- OpenAI -- loaded lazily so a missing/broken install never crashes the backend --
 def _get_openai_client():
@@ -20,18 +23,6 @@ def _get_openai_client():
         return None
 
 
-# -- Low-level shift builder (module-level to avoid closure issues) --
-def _make_shift(staff, area, date_str, start_str):
-    h, m = int(start_str[:2]), int(start_str[3:])
-    return {
-        'staff_id':   staff.id,
-        'area_id':    area.id,
-        'date':       date_str,
-        'start_time': start_str,
-        'end_time':   f"{h + staff.shift_length:02d}:{m:02d}",
-    }
-
-
 def apply_ai_adjustments(shifts, instruction, staff_list, area_list):
     """
     Takes a deterministic schedule and applies plain-English tweaks via OpenAI.
@@ -127,9 +118,6 @@ def generate_weekly_schedule(week_start_date, fill_empty_only=False,
     Optionally applies an AI plain-English adjustment on top.
     Returns: {success, shifts, message, validation_errors}
     """
-    warnings   = []
-    all_shifts = []
-
     # -- Load --
     staff_query = Staff.query.filter_by(is_active=True)
     area_query  = StaffArea.query
@@ -137,179 +125,17 @@ def generate_weekly_schedule(week_start_date, fill_empty_only=False,
         staff_query = staff_query.filter_by(clinic_id=clinic_id)
         area_query  = area_query.filter_by(clinic_id=clinic_id)
     staff_list = staff_query.all()
-    area_map   = {a.name: a for a in area_query.all()}
-
-    week_end = week_start_date + timedelta(days=4)
-    weekdays = [week_start_date + timedelta(days=i) for i in range(5)]
+    area_list  = area_query.all()
 
     if not staff_list:
         return {'success': False, 'shifts': [],
                 'message': 'No active staff found. Run the clinic setup script first.',
                 'validation_errors': []}
 
-    # -- Build blocked set: (staff_id, 'YYYY-MM-DD') --
-    blocked = set()
-
-    tor_query = TimeOffRequest.query.filter(
-        TimeOffRequest.status == 'approved',
-        TimeOffRequest.start_date <= week_end,
-        TimeOffRequest.end_date >= week_start_date
+    time_off_days = get_time_off_days(clinic_id, week_start_date, week_start_date + timedelta(days=4))
+    all_shifts, warnings = build_weekly_schedule(
+        week_start_date, staff_list, area_list, time_off_days, clinic_rules(clinic_id), active_rooms
     )
-    if clinic_id is not None:
-        tor_query = tor_query.filter(TimeOffRequest.clinic_id == clinic_id)
-    for t in tor_query.all():
-        cur = t.start_date
-        while cur <= t.end_date:
-            if week_start_date <= cur <= week_end:
-                blocked.add((t.staff_id, cur.strftime('%Y-%m-%d')))
-            cur += timedelta(days=1)
-
-    for s in staff_list:
-        if s.required_days_off:
-            for day_name in json.loads(s.required_days_off):
-                for d in weekdays:
-                    if d.strftime('%A') == day_name:
-                        blocked.add((s.id, d.strftime('%Y-%m-%d')))
-
-    # -- Assign 1 rotating day off per week for every 4-day/week non-per-diem staff --
-    four_day = [s for s in staff_list if s.days_per_week == 4 and not s.is_per_diem]
-
-    off_count = {d.strftime('%Y-%m-%d'): 0 for d in weekdays}
-    for (_, ds) in blocked:
-        if ds in off_count:
-            off_count[ds] += 1
-
-    for s in four_day:
-        free = [d for d in weekdays if (s.id, d.strftime('%Y-%m-%d')) not in blocked]
-        if len(free) <= 4:
-            continue  # already has a blocked day this week
-
-        if s.flexible_days_off:
-            flex = json.loads(s.flexible_days_off)
-            preferred = [d for d in free if d.strftime('%A') in flex]
-            pool = preferred if preferred else free
-        else:
-            pool = free
-
-        chosen = min(pool, key=lambda d: off_count[d.strftime('%Y-%m-%d')])
-        ds = chosen.strftime('%Y-%m-%d')
-        blocked.add((s.id, ds))
-        off_count[ds] += 1
-
-    # -- RN slot definitions -- no Charge/Float in auto-schedule --
-    RN_SLOTS = [
-        ('06:15', 'Admitting'),
-        ('06:30', 'Admitting'),
-        ('07:30', 'Recovery'),
-        ('07:30', 'Recovery'),
-    ]
-
-    ALL_PROC_ROOMS = ['Procedure Room 1', 'Procedure Room 2',
-                      'Procedure Room 3', 'Procedure Room 4']
-
-    # -- Build each day --
-    for day_idx, day in enumerate(weekdays):
-        date_str = day.strftime('%Y-%m-%d')
-
-        today       = [s for s in staff_list if (s.id, date_str) not in blocked]
-        rns         = sorted([s for s in today if s.role == 'RN'         and not s.is_per_diem], key=lambda s: s.name)
-        gi_techs    = sorted([s for s in today if s.role == 'GI_Tech'],                           key=lambda s: s.name)
-        scope_techs = sorted([s for s in today if s.role == 'Scope_Tech'],                        key=lambda s: s.name)
-
-        assigned = set()
-
-        # -- Scope Room --
-        scope_area = area_map.get('Scope Room')
-        for st in scope_techs:
-            if scope_area and st.id not in assigned:
-                start = st.start_time.strftime('%H:%M') if st.start_time else '07:30'
-                all_shifts.append(_make_shift(st, scope_area, date_str, start))
-                assigned.add(st.id)
-
-        if len(scope_techs) < 2:
-            sub = next((gt for gt in gi_techs if gt.id not in assigned), None)
-            if sub and scope_area:
-                all_shifts.append(_make_shift(sub, scope_area, date_str, '07:00'))
-                assigned.add(sub.id)
-                warnings.append(f"{date_str}: {sub.name} (GI Tech) covering Scope Room")
-
-        # -- Which procedure rooms are open today? --
-        if active_rooms and date_str in active_rooms:
-            day_rooms = [r for r in ALL_PROC_ROOMS if r in active_rooms[date_str]]
-        else:
-            day_rooms = ALL_PROC_ROOMS
-
-        # -- GI Techs -- put exactly 1 per active room (opener slot first) --
-        gi_pool = [s for s in gi_techs if s.id not in assigned]
-        jess   = next((s for s in gi_pool if s.name == 'Jess'),   None)
-        curtis = next((s for s in gi_pool if s.name == 'Curtis'), None)
-        opener = jess or curtis
-        if opener:
-            gi_pool = [opener] + [s for s in gi_pool if s.id != opener.id]
-
-        gi_ptr = 0
-        for room_name in day_rooms:
-            room = area_map.get(room_name)
-            if not room or gi_ptr >= len(gi_pool):
-                continue
-            gt = gi_pool[gi_ptr]
-            start = gt.start_time.strftime('%H:%M') if gt.start_time else (
-                '06:15' if gi_ptr == 0 else ('07:00' if gi_ptr % 2 == 0 else '07:30')
-            )
-            if gt.id not in assigned:
-                all_shifts.append(_make_shift(gt, room, date_str, start))
-                assigned.add(gt.id)
-            gi_ptr += 1
-
-        # -- RNs -> Admitting (2) + Recovery (2), then rotate into rooms --
-        rn_pool = rns[:]
-        if rn_pool:
-            offset  = day_idx % len(rn_pool)
-            rn_pool = rn_pool[offset:] + rn_pool[:offset]
-
-        for i, rn in enumerate(rn_pool[:4]):
-            start, area_name = RN_SLOTS[i]
-            area = area_map.get(area_name)
-            if area and rn.id not in assigned:
-                all_shifts.append(_make_shift(rn, area, date_str, start))
-                assigned.add(rn.id)
-
-        # Extra RNs (5th+) rotate into procedure rooms as 2nd person
-        extra_rns = [rn for rn in rn_pool[4:] if rn.id not in assigned]
-        if extra_rns and day_rooms:
-            rotated_rooms = day_rooms[day_idx % len(day_rooms):] + day_rooms[:day_idx % len(day_rooms)]
-            for rn, room_name in zip(extra_rns, rotated_rooms):
-                room = area_map.get(room_name)
-                if room and rn.id not in assigned:
-                    all_shifts.append(_make_shift(rn, room, date_str, '07:00'))
-                    assigned.add(rn.id)
-
-        # -- Fill remaining procedure room slots (2nd person) with GI techs --
-        for room_name in day_rooms:
-            room = area_map.get(room_name)
-            if not room:
-                continue
-            in_room = sum(1 for sh in all_shifts
-                          if sh['date'] == date_str and sh['area_id'] == room.id)
-            while in_room < 2 and gi_ptr < len(gi_pool):
-                gt = gi_pool[gi_ptr]
-                gi_ptr += 1
-                if gt.id not in assigned:
-                    start = gt.start_time.strftime('%H:%M') if gt.start_time else '07:30'
-                    all_shifts.append(_make_shift(gt, room, date_str, start))
-                    assigned.add(gt.id)
-                    in_room += 1
-            if in_room < 2:
-                warnings.append(f"{date_str}: {room_name} short-staffed ({in_room}/2)")
-
-        # Coverage checks
-        for area_name, req in [('Admitting', 2), ('Recovery', 2)]:
-            a = area_map.get(area_name)
-            if a:
-                n = sum(1 for sh in all_shifts
-                        if sh['date'] == date_str and sh['area_id'] == a.id)
-                if n < req:
-                    warnings.append(f"{date_str}: {area_name} has {n}/{req} RNs -- add per diem if needed")
 
     # -- Optional AI adjustment --
     ai_note = None
@@ -317,7 +143,7 @@ def generate_weekly_schedule(week_start_date, fill_empty_only=False,
     if ai_instruction and ai_instruction.strip():
         final_shifts, ai_note = apply_ai_adjustments(
             all_shifts, ai_instruction.strip(),
-            staff_list, list(area_map.values())
+            staff_list, area_list
         )
 
     all_notes = warnings + ([ai_note] if ai_note else [])
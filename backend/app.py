@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_migrate import Migrate
 from flask_cors import CORS, cross_origin
 from flask_jwt_extended import (
@@ -6,20 +6,41 @@ from flask_jwt_extended import (
     jwt_required, get_jwt_identity, get_jwt
 )
 from flask_mail import Mail, Message
-from models import Staff, StaffArea, Shift, TimeOffRequest, AISuggestion, User, Clinic
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import Staff, StaffArea, Shift, TimeOffRequest, AISuggestion, User, Clinic, CoverageDaily, ShiftSwap, StaffAvailability, ScheduleTemplate
 from db import db
 import os
 import json
 import logging
 import secrets
+import time
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, date
-from utils import validate_shift, check_area_coverage
+from utils import validate_shift, validate_week_shifts, time_off_approval_impact, is_double_booking
+from week_context import WEEKDAYS, days_mask
+from coverage import refresh_coverage, rebuild_coverage, coverage_summary, evaluate_area_coverage
 from ai_scheduler import generate_weekly_schedule
 from sqlalchemy.orm import joinedload
-from sqlalchemy import text
+from sqlalchemy import text, update, insert, case, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from config import get_config
+from rate_limit import SlidingWindowLimiter, create_store
+from schedule_store import save_suggestion, load_suggestion_shifts, live_week_shifts
+from schedule_codec import diff_shifts
+from idempotency import idempotent
+from events import create_broker, stream
+from reports import load_report_data, hours_report, fairness_report
+from exports import export_rows, csv_chunks, build_xlsx
+from rules import DEFAULT_CLINIC_RULES, compile_area_rules, compile_clinic_rules
+from simulation import MAX_WEEKS as SIMULATION_MAX_WEEKS, MAX_SCENARIOS, load_baseline, parse_scenario, run_scenarios
+from schedule_templates import encode_template, encode_week, template_shifts, apply_template
+from calendar_feed import FeedCache, feed_window, lookup_feed, build_feed, hash_token as hash_calendar_token
+from availability import (
+    load_week_availability, shift_candidates, shift_hours,
+    month_start, month_end, month_bitset, area_roles, rank_fill_candidates, load_fill_rows
+)
 
 load_dotenv()
 
@@ -27,6 +48,9 @@ app = Flask(__name__)
 
 app.config.from_object(get_config())
 
+if app.config.get('TRUSTED_PROXY_COUNT'):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
 db.init_app(app)
 
 migrate = Migrate(app, db)
@@ -48,7 +72,8 @@ if cors_origins_env:
 
 CORS(app,
      resources={r"/*": {"origins": allowed_origins}},
-     allow_headers=["Content-Type", "Authorization"],
+     allow_headers=["Content-Type", "Authorization", "Idempotency-Key", "If-Match"],
+     expose_headers=["Idempotent-Replayed", "Retry-After", "ETag"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      supports_credentials=True)
 
@@ -88,6 +113,124 @@ def require_roles(*allowed_roles):
     return user, None, None
 
 
+rate_limit_store = create_store(app.config.get('RATELIMIT_STORAGE_URL'))
+auth_ip_limiter = SlidingWindowLimiter(
+    'auth-ip', app.config['AUTH_RATE_LIMIT_PER_IP'],
+    app.config['AUTH_RATE_LIMIT_WINDOW'], rate_limit_store
+)
+auth_email_limiter = SlidingWindowLimiter(
+    'auth-email', app.config['AUTH_RATE_LIMIT_PER_EMAIL'],
+    app.config['AUTH_RATE_LIMIT_WINDOW'], rate_limit_store
+)
+login_failure_limiter = SlidingWindowLimiter(
+    'login-fail', app.config['LOGIN_LOCKOUT_THRESHOLD'],
+    app.config['LOGIN_LOCKOUT_WINDOW'], rate_limit_store
+)
+
+
+event_broker = create_broker(
+    app.config.get('EVENTS_REDIS_URL'),
+    queue_size=app.config['EVENTS_QUEUE_SIZE'],
+    replay_size=app.config['EVENTS_REPLAY_SIZE'],
+    max_streams=app.config['EVENTS_MAX_STREAMS']
+)
+
+
+def publish_event(clinic_id, event_type, data, coverage=None):
+    """Tell open /events streams about a committed change (and the coverage rows it moved)."""
+    event_broker.publish(clinic_id, event_type, data)
+    if coverage:
+        event_broker.publish(clinic_id, 'coverage.updated', coverage)
+
+
+def publish_time_off_impact(clinic_id, impact):
+    """Shifts removed while approving time-off are a schedule change too."""
+    if impact and impact.get('removed_shift_ids'):
+        publish_event(clinic_id, 'shifts.batch',
+                      {'created': [], 'updated': [], 'deleted': impact['removed_shift_ids']},
+                      impact.get('coverage'))
+
+
+def too_many_requests(retry_after, message='Too many attempts. Please try again later.'):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
+def parse_version(value):
+    """A row version from JSON (an int or a digit string). Raises ValueError otherwise."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'Invalid version: {value!r}')
+    return int(value)
+
+
+def requested_version(data=None):
+    """
+    Version the client last saw, from If-Match ("3", W/"3") or "version" in the body.
+    None means no precondition. Raises ValueError for an unparseable value.
+    """
+    header = request.headers.get('If-Match', '').strip()
+    if header and header != '*':
+        if header.startswith('W/'):
+            header = header[2:]
+        return int(header.strip('"'))
+    if data and data.get('version') is not None:
+        return parse_version(data['version'])
+    return None
+
+
+def versioned_response(row, status=200, payload=None):
+    """JSON response (row.to_dict() by default) with the row's version as its ETag."""
+    response = jsonify(row.to_dict() if payload is None else payload)
+    response.headers['ETag'] = f'"{row.version}"'
+    return response, status
+
+
+def version_conflict(model, id, user, label):
+    """409 carrying the row as it is now, so the client can merge without a refetch."""
+    # Roll back before touching `user`: after a failed flush its attributes can't load
+    db.session.rollback()
+    current = model.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+    if current is None:
+        return jsonify({'error': f'{label} was deleted by someone else'}), 404
+    return versioned_response(current, 409, {
+        'error': f'{label} was changed by someone else',
+        'current': current.to_dict()
+    })
+
+
+def throttle_auth_request(route, email=None):
+    """Count an auth attempt against the caller's IP and (if given) email.
+    Each route ('login', 'register', ...) counts an email separately.
+    Returns (error_response, status) when the request should be rejected."""
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return None, None
+
+    allowed, retry_after = auth_ip_limiter.hit(request.remote_addr or 'unknown')
+    if allowed and email:
+        allowed, retry_after = auth_email_limiter.hit(f'{route}:{email}')
+    if not allowed:
+        app.logger.warning(f'Auth rate limit hit: ip={request.remote_addr} path={request.path}')
+        return too_many_requests(retry_after)
+    return None, None
+
+
+def allocate_username(clinic_id, base):
+    """Pick base, base1, base2, ... using one prefix query instead of probing."""
+    taken = {
+        username for (username,) in db.session.query(User.username).filter(
+            User.clinic_id == clinic_id,
+            User.username.startswith(base, autoescape=True)
+        )
+    }
+    username = base
+    counter = 1
+    while username in taken:
+        username = f"{base}{counter}"
+        counter += 1
+    return username
+
+
 def get_current_clinic_id():
     """Read clinic_id from the JWT claims (no DB query needed)."""
     claims = get_jwt()
@@ -104,6 +247,10 @@ def register():
         if not all(k in data for k in required):
             return jsonify({'error': 'name, email, password, and invite_code are required'}), 400
 
+        error_response, status = throttle_auth_request('register', data['email'].strip().lower())
+        if error_response:
+            return error_response, status
+
         clinic = Clinic.query.filter_by(invite_code=data['invite_code'].strip()).first()
         if not clinic:
             return jsonify({'error': 'Invalid invite code. Please contact your nurse administrator.'}), 403
@@ -117,11 +264,7 @@ def register():
             return jsonify({'error': 'An account with this email already exists'}), 400
 
         base = data['name'].strip().lower().replace(' ', '.')
-        username = base
-        counter = 1
-        while User.query.filter_by(clinic_id=clinic.id, username=username).first():
-            username = f"{base}{counter}"
-            counter += 1
+        username = allocate_username(clinic.id, base)
 
         first_name = data['name'].strip().split()[0]
         matched_staff = Staff.query.filter(
@@ -158,11 +301,28 @@ def login():
             return jsonify({'error': 'Email and password are required'}), 400
 
         email = data['email'].strip().lower()
+
+        error_response, status = throttle_auth_request('login', email)
+        if error_response:
+            return error_response, status
+
+        if app.config.get('RATELIMIT_ENABLED', True):
+            allowed, retry_after = login_failure_limiter.check(email)
+            if not allowed:
+                return too_many_requests(
+                    retry_after, 'Too many failed login attempts. Please try again later.'
+                )
+
         user = User.query.filter_by(email=email).first()
 
         if not user or not user.check_password(data['password']):
+            if app.config.get('RATELIMIT_ENABLED', True):
+                login_failure_limiter.hit(email)
             return jsonify({'error': 'Invalid email or password'}), 401
 
+        if app.config.get('RATELIMIT_ENABLED', True):
+            login_failure_limiter.reset(email)
+
         access_token = create_access_token(
             identity=str(user.id),
             additional_claims={'role': user.role, 'clinic_id': user.clinic_id}
@@ -189,11 +349,15 @@ def forgot_password():
         if not email:
             return jsonify({'error': 'Email is required'}), 400
 
+        error_response, status = throttle_auth_request('forgot-password', email)
+        if error_response:
+            return error_response, status
+
         user = User.query.filter_by(email=email).first()
 
         if user:
             token = secrets.token_urlsafe(32)
-            user.reset_token = token
+            user.reset_token_hash = User.hash_reset_token(token)
             user.reset_token_expiry = datetime.utcnow() + timedelta(hours=1)
             db.session.commit()
 
@@ -236,13 +400,13 @@ def reset_password():
         if len(new_password) < 8:
             return jsonify({'error': 'Password must be at least 8 characters'}), 400
 
-        user = User.query.filter_by(reset_token=token).first()
+        user = User.query.filter_by(reset_token_hash=User.hash_reset_token(token)).first()
 
         if not user or not user.reset_token_expiry or user.reset_token_expiry < datetime.utcnow():
             return jsonify({'error': 'Reset link is invalid or has expired'}), 400
 
         user.set_password(new_password)
-        user.reset_token = None
+        user.reset_token_hash = None
         user.reset_token_expiry = None
         db.session.commit()
 
@@ -414,11 +578,24 @@ def update_staff(id):
         if 'start_time' in data and data['start_time']:
             data['start_time'] = datetime.strptime(data['start_time'], '%H:%M').time()
 
+        role_changed = 'role' in data and data['role'] != staff.role
+
         for key, value in data.items():
             if hasattr(staff, key) and key not in ('id', 'clinic_id'):
                 setattr(staff, key, value)
 
+        coverage = []
+        if role_changed:
+            # Coverage counts are per role, so every area-day this person works changes
+            coverage = [row.to_dict() for row in refresh_coverage(
+                user.clinic_id, db.session.query(Shift.area_id, Shift.date).filter(
+                    Shift.staff_id == staff.id,
+                    Shift.date >= date.today()
+                ).distinct().all()
+            )]
+
         db.session.commit()
+        publish_event(user.clinic_id, 'staff.updated', staff.to_dict(), coverage)
         return jsonify(staff.to_dict()), 200
     except ValueError as ve:
         db.session.rollback()
@@ -479,6 +656,96 @@ def get_staff_schedule(id):
         return jsonify({'error': str(e)}), 500
 
 
+def parse_month(value):
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+@app.route('/staff/<int:id>/availability', methods=['GET'])
+@jwt_required()
+def get_staff_availability(id):
+    """Days the staff member marked available in ?month=YYYY-MM (default: this month)."""
+    try:
+        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+        if current_user.role == 'nurse' and current_user.staff_id != id:
+            return jsonify({'error': 'Nurses can only view their own availability'}), 403
+
+        try:
+            month = parse_month(request.args['month']) if request.args.get('month') else month_start(date.today())
+        except ValueError:
+            return jsonify({'error': 'month must be YYYY-MM'}), 400
+
+        Staff.query.filter_by(id=id, clinic_id=current_user.clinic_id).first_or_404()
+        row = StaffAvailability.query.filter_by(staff_id=id, month=month).first()
+        if row is None:
+            row = StaffAvailability(staff_id=id, month=month, days=0)
+        return jsonify(row.to_dict()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/staff/<int:id>/availability', methods=['PUT'])
+@jwt_required()
+def set_staff_availability(id):
+    """
+    Replace one month's availability.
+    Body: {"month": "YYYY-MM", "dates": ["YYYY-MM-DD", ...],
+           "windows": [{"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}, ...]}
+    A window must end inside the month; an earlier start is clipped to the 1st.
+    """
+    try:
+        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+        if current_user.role == 'nurse' and current_user.staff_id != id:
+            return jsonify({'error': 'Nurses can only set their own availability'}), 403
+
+        staff = Staff.query.filter_by(id=id, clinic_id=current_user.clinic_id).first_or_404()
+        data = request.get_json() or {}
+        try:
+            month = parse_month(data['month'])
+            last = month_end(month)
+            days = [datetime.strptime(d, '%Y-%m-%d').date() for d in data.get('dates', [])]
+            windows = [(datetime.strptime(w['start_date'], '%Y-%m-%d').date(),
+                        datetime.strptime(w['end_date'], '%Y-%m-%d').date()) for w in data.get('windows', [])]
+        except KeyError as ke:
+            return jsonify({'error': f'Missing required field: {str(ke)}'}), 400
+        except ValueError:
+            return jsonify({'error': 'month must be YYYY-MM and dates YYYY-MM-DD'}), 400
+        for start, end in windows:
+            if end < start or not month <= end <= last:
+                return jsonify({'error': f"Each window must end on or after its start, within {data['month']}"}), 400
+            # Clamped, so a window opened years earlier still walks at most one month
+            cur = max(start, month)
+            while cur <= end:
+                days.append(cur)
+                cur += timedelta(days=1)
+        if any(month_start(d) != month for d in days):
+            return jsonify({'error': f"All dates must fall in {data['month']}"}), 400
+
+        values = {'clinic_id': staff.clinic_id, 'staff_id': id, 'month': month,
+                  'days': month_bitset(days), 'updated_at': datetime.utcnow()}
+        row = StaffAvailability.query.filter_by(staff_id=id, month=month).first()
+        if row is None:
+            row = StaffAvailability(**values)
+            db.session.add(row)
+        else:
+            row.days = values['days']
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Saved concurrently from another tab; last write wins
+            db.session.rollback()
+            row = StaffAvailability.query.filter_by(staff_id=id, month=month).first()
+            row.days = values['days']
+            db.session.commit()
+        return jsonify(row.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ========== STAFF AREA ROUTES ==========
 
 @app.route('/areas', methods=['GET'])
@@ -518,11 +785,98 @@ def create_area():
             required_rn_count=data.get('required_rn_count', 0),
             required_tech_count=data.get('required_tech_count', 0),
             required_scope_tech_count=data.get('required_scope_tech_count', 0),
-            special_rules=data.get('special_rules')
+            special_rules=data.get('special_rules'),
+            rules=rules_json(data.get('rules'), compile_area_rules)
         )
         db.session.add(new_area)
         db.session.commit()
         return jsonify(new_area.to_dict()), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def rules_json(rules, compile_rules):
+    """Validate rules (a dict, or None to reset to the defaults) and return them as stored JSON text."""
+    if rules is None:
+        return None
+    text = json.dumps(rules, sort_keys=True)
+    compile_rules(text)  # raises ValueError if the rules are malformed
+    return text
+
+
+@app.route('/areas/<int:id>/rules', methods=['PUT'])
+@jwt_required()
+def update_area_rules(id):
+    """
+    Replace the area's staffing requirements. Body: {"rules": {"requirements": [...],
+    "preferences": [...]}} or {"rules": null} for the built-in defaults.
+    Stored coverage is recomputed from today on; past days keep the rules
+    they were scheduled under (python rebuild_coverage.py redoes history).
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        area = StaffArea.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not area:
+            return jsonify({'error': 'Area not found'}), 404
+
+        data = request.get_json() or {}
+        if 'rules' not in data:
+            return jsonify({'error': 'rules is required'}), 400
+        area.rules = rules_json(data['rules'], compile_area_rules)
+        rebuild_coverage(user.clinic_id, start=date.today())
+        db.session.commit()
+        return jsonify(area.to_dict()), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/clinic/rules', methods=['GET'])
+@jwt_required()
+def get_clinic_rules():
+    """The clinic's scheduling rules with defaults filled in."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        clinic = db.session.get(Clinic, user.clinic_id)
+        stored = json.loads(clinic.scheduling_rules) if clinic.scheduling_rules else {}
+        return jsonify({'rules': dict(DEFAULT_CLINIC_RULES, **stored), 'customized': sorted(stored)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/clinic/rules', methods=['PUT'])
+@jwt_required()
+def update_clinic_rules():
+    """Body: {"rules": {...}} overriding any of the default keys, or {"rules": null} to reset."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        data = request.get_json() or {}
+        if 'rules' not in data:
+            return jsonify({'error': 'rules is required'}), 400
+        clinic = db.session.get(Clinic, user.clinic_id)
+        clinic.scheduling_rules = rules_json(data['rules'], compile_clinic_rules)
+        db.session.commit()
+        stored = json.loads(clinic.scheduling_rules) if clinic.scheduling_rules else {}
+        return jsonify({'rules': dict(DEFAULT_CLINIC_RULES, **stored), 'customized': sorted(stored)}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -560,6 +914,7 @@ def get_shifts():
 
 @app.route('/shifts', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_shift():
     try:
         user, error_response, status = require_roles('nurse_admin')
@@ -586,10 +941,9 @@ def create_shift():
         if not area:
             return jsonify({'error': 'Area not found'}), 404
 
-        day_of_week = shift_date.strftime('%A')
-        required_days_off = json.loads(staff.required_days_off) if staff.required_days_off else []
+        day_of_week = WEEKDAYS[shift_date.weekday()]
 
-        if day_of_week in required_days_off:
+        if days_mask(staff.required_days_off) & (1 << shift_date.weekday()):
             return jsonify({
                 'error': f'Cannot schedule {staff.name} on {day_of_week} - this is a required day off'
             }), 400
@@ -598,8 +952,7 @@ def create_shift():
             TimeOffRequest.staff_id == staff_id,
             TimeOffRequest.clinic_id == clinic_id,
             TimeOffRequest.status == 'approved',
-            TimeOffRequest.start_date <= shift_date,
-            TimeOffRequest.end_date >= shift_date
+            TimeOffRequest.overlaps(shift_date, shift_date)
         ).first()
 
         if time_off_conflict:
@@ -607,15 +960,6 @@ def create_shift():
                 'error': f'Cannot create shift: {staff.name} has approved time-off from {time_off_conflict.start_date} to {time_off_conflict.end_date}'
             }), 400
 
-        existing_shift = Shift.query.filter(
-            Shift.staff_id == staff_id,
-            Shift.date == shift_date,
-            Shift.clinic_id == clinic_id
-        ).first()
-
-        if existing_shift:
-            return jsonify({'error': f'{staff.name} is already scheduled on {shift_date}'}), 400
-
         new_shift = Shift(
             clinic_id=clinic_id,
             staff_id=staff_id,
@@ -626,9 +970,20 @@ def create_shift():
         )
 
         db.session.add(new_shift)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': f'{staff.name} is already scheduled on {shift_date}'}), 400
+            raise
+
+        coverage = [row.to_dict() for row in refresh_coverage(clinic_id, {(area_id, shift_date)})]
         db.session.commit()
 
-        return jsonify(new_shift.to_dict()), 201
+        result = new_shift.to_dict()
+        publish_event(clinic_id, 'shift.created', result, coverage)
+        return jsonify(result), 201
 
     except ValueError as e:
         return jsonify({'error': f'Invalid date/time format: {str(e)}'}), 400
@@ -643,7 +998,7 @@ def get_shift_by_id(id):
     try:
         clinic_id = get_current_clinic_id()
         shift = Shift.query.filter_by(id=id, clinic_id=clinic_id).first_or_404()
-        return jsonify(shift.to_dict()), 200
+        return versioned_response(shift)
     except Exception as e:
         return jsonify({'error': 'Shift not found'}), 404
 
@@ -658,6 +1013,14 @@ def update_shift(id):
 
         shift = Shift.query.filter_by(id=id, clinic_id=user.clinic_id).first_or_404()
         data = request.get_json()
+        previous_area_day = (shift.area_id, shift.date)
+
+        try:
+            expected_version = requested_version(data)
+        except ValueError:
+            return jsonify({'error': 'If-Match/version must be a version number'}), 400
+        if expected_version is not None and expected_version != shift.version:
+            return version_conflict(Shift, id, user, 'Shift')
 
         staff_id = data.get('staff_id', shift.staff_id)
         area_id = data.get('area_id', shift.area_id)
@@ -667,7 +1030,8 @@ def update_shift(id):
         override_validation = data.get('override_validation', False)
 
         if not override_validation:
-            is_valid, error_message = validate_shift(staff_id, area_id, shift_date, start_time, end_time, shift_id=id)
+            is_valid, error_message = validate_shift(staff_id, area_id, shift_date, start_time, end_time,
+                                                     shift_id=id, check_double_booking=False)
             if not is_valid:
                 return jsonify({'error': error_message}), 400
 
@@ -677,8 +1041,24 @@ def update_shift(id):
         shift.start_time = start_time
         shift.end_time = end_time
 
+        try:
+            db.session.flush()
+        except StaleDataError:
+            # The UPDATE's version predicate matched nothing: someone saved in between
+            return version_conflict(Shift, id, user, 'Shift')
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                staff = Staff.query.get(staff_id)
+                name = staff.name if staff else 'Staff member'
+                return jsonify({'error': f'{name} is already scheduled on {shift_date}'}), 400
+            raise
+
+        coverage = [row.to_dict() for row in
+                    refresh_coverage(user.clinic_id, {previous_area_day, (area_id, shift_date)})]
         db.session.commit()
-        return jsonify(shift.to_dict()), 200
+        publish_event(user.clinic_id, 'shift.updated', shift.to_dict(), coverage)
+        return versioned_response(shift)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -693,14 +1073,450 @@ def delete_shift(id):
             return error_response, status
 
         shift = Shift.query.filter_by(id=id, clinic_id=user.clinic_id).first_or_404()
+        try:
+            expected_version = requested_version()
+        except ValueError:
+            return jsonify({'error': 'If-Match must be a version number'}), 400
+        if expected_version is not None and expected_version != shift.version:
+            return version_conflict(Shift, id, user, 'Shift')
+
         db.session.delete(shift)
+        try:
+            coverage = [row.to_dict() for row in refresh_coverage(user.clinic_id, {(shift.area_id, shift.date)})]
+        except StaleDataError:
+            return version_conflict(Shift, id, user, 'Shift')
         db.session.commit()
+        publish_event(user.clinic_id, 'shift.deleted', {'id': id}, coverage)
         return jsonify({'message': 'Shift deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+SHIFT_BATCH_MAX_OPERATIONS = 200
+SHIFT_FIELDS = ('staff_id', 'area_id', 'date', 'start_time', 'end_time')
+
+
+def parse_shift_fields(op):
+    """Typed shift fields present in a batch operation. Raises ValueError."""
+    fields = {}
+    for name in ('staff_id', 'area_id'):
+        if name in op:
+            fields[name] = int(op[name])
+    if 'date' in op:
+        fields['date'] = datetime.strptime(op['date'], '%Y-%m-%d').date()
+    for name in ('start_time', 'end_time'):
+        if name in op:
+            fields[name] = datetime.strptime(op[name], '%H:%M').time()
+    return fields
+
+
+@app.route('/shifts/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def batch_shift_operations():
+    """
+    Apply several shift edits atomically (moves, swaps, undo/redo, clearing a week).
+    Body: {"operations": [
+               {"op": "create", "staff_id": 1, "area_id": 2, "date": "...", "start_time": "07:00", "end_time": "17:00"},
+               {"op": "update", "id": 5, "version": 2, "area_id": 3},
+               {"op": "delete", "id": 7, "version": 1}
+           ],
+           "override_validation": false}
+    All operations must fall in one Mon-Sun week and are validated together
+    against the week as it will look afterwards. "version" is optional.
+    Returns the changed rows plus coverage for the affected days.
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        clinic_id = user.clinic_id
+        data = request.get_json() or {}
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'operations must be a non-empty list'}), 400
+        if len(operations) > SHIFT_BATCH_MAX_OPERATIONS:
+            return jsonify({'error': f'At most {SHIFT_BATCH_MAX_OPERATIONS} operations per batch'}), 400
+
+        parsed = []
+        target_ids = set()
+        for index, op in enumerate(operations):
+            kind = op.get('op') if isinstance(op, dict) else None
+            if kind not in ('create', 'update', 'delete'):
+                return jsonify({'error': 'op must be create, update, or delete', 'index': index}), 400
+            try:
+                fields = parse_shift_fields(op) if kind != 'delete' else {}
+                shift_id = int(op['id']) if kind != 'create' else None
+                version = int(op['version']) if op.get('version') is not None else None
+            except (KeyError, ValueError, TypeError):
+                return jsonify({'error': 'Invalid id, version, date, or time', 'index': index}), 400
+            if kind == 'create' and set(fields) != set(SHIFT_FIELDS):
+                return jsonify({'error': f'create needs {", ".join(SHIFT_FIELDS)}', 'index': index}), 400
+            if shift_id is not None:
+                if shift_id in target_ids:
+                    return jsonify({'error': f'Shift {shift_id} appears more than once', 'index': index}), 400
+                target_ids.add(shift_id)
+            parsed.append((index, kind, shift_id, version, fields))
+
+        existing = {
+            s.id: s for s in Shift.query.filter(Shift.clinic_id == clinic_id, Shift.id.in_(target_ids))
+        } if target_ids else {}
+        for index, kind, shift_id, version, fields in parsed:
+            if shift_id is not None and shift_id not in existing:
+                return jsonify({'error': 'Shift not found', 'index': index}), 404
+
+        stale = [existing[shift_id] for _, _, shift_id, version, _ in parsed
+                 if version is not None and existing[shift_id].version != version]
+        if stale:
+            return jsonify({
+                'error': 'Some shifts were changed by someone else',
+                'current': [s.to_dict() for s in stale]
+            }), 409
+
+        # Every date involved, before and after, must sit in one Mon-Sun week
+        dates = {s.date for s in existing.values()}
+        dates |= {fields['date'] for _, _, _, _, fields in parsed if 'date' in fields}
+        week_start = min(dates) - timedelta(days=min(dates).weekday())
+        week_end = week_start + timedelta(days=6)
+        if max(dates) > week_end:
+            return jsonify({'error': 'All operations must fall within one week (Mon-Sun)'}), 400
+
+        with db.session.no_autoflush:
+            # Loads the week once; the shifts named in operations are the same
+            # identity-mapped objects, so edits below are visible in the snapshot.
+            week = {s.id: s for s in Shift.query.filter(
+                Shift.clinic_id == clinic_id,
+                Shift.date >= week_start,
+                Shift.date <= week_end
+            )}
+
+            touched = set()
+            created, updated, deleted = [], [], []
+            changed_ops = {}
+            for index, kind, shift_id, version, fields in parsed:
+                if kind == 'create':
+                    shift = Shift(clinic_id=clinic_id, **fields)
+                    created.append(shift)
+                else:
+                    shift = existing[shift_id]
+                    touched.add((shift.area_id, shift.date))
+                    if kind == 'delete':
+                        deleted.append(shift)
+                        week.pop(shift_id, None)
+                        continue
+                    for name, value in fields.items():
+                        setattr(shift, name, value)
+                    updated.append(shift)
+                touched.add((shift.area_id, shift.date))
+                changed_ops[shift] = index
+
+            week_shifts = list(week.values()) + created
+            failures = validate_week_shifts(
+                clinic_id, week_start, week_shifts, list(changed_ops),
+                check_rules=not data.get('override_validation', False)
+            )
+        if failures:
+            db.session.rollback()
+            return jsonify({
+                'error': 'Some operations are invalid',
+                'errors': sorted(({'index': changed_ops[shift], 'error': message}
+                                  for shift, message in failures.items()), key=lambda e: e['index'])
+            }), 400
+
+        if db.engine.dialect.name == 'postgresql':
+            # Intermediate rows of a swap may collide; check the final state at commit
+            db.session.execute(text('SET CONSTRAINTS uq_shift_clinic_staff_date DEFERRED'))
+
+        try:
+            # Deletes first, so a delete + create for the same staff/day is not a collision
+            for shift in deleted:
+                db.session.delete(shift)
+            db.session.flush()
+            db.session.add_all(created)
+            db.session.flush()
+            refresh_coverage(clinic_id, touched)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            current = Shift.query.filter(Shift.clinic_id == clinic_id, Shift.id.in_(target_ids)).all()
+            return jsonify({
+                'error': 'Some shifts were changed by someone else',
+                'current': [s.to_dict() for s in current]
+            }), 409
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': 'Someone else scheduled one of these staff members on the same day'}), 409
+            raise
+
+        touched_dates = [day for _, day in touched]
+        changes = {
+            'created': [s.to_dict() for s in created],
+            'updated': [s.to_dict() for s in updated],
+            'deleted': [s.id for s in deleted]
+        }
+        coverage = coverage_summary(clinic_id, min(touched_dates), max(touched_dates))
+        publish_event(clinic_id, 'shifts.batch', changes, coverage)
+        return jsonify(dict(changes, coverage=coverage)), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== SHIFT SWAP ROUTES ==========
+
+def week_availability_for(shift):
+    return load_week_availability(shift.clinic_id, shift.date - timedelta(days=shift.date.weekday()))
+
+
+def swap_can_view_candidates(user, swap):
+    return user.role == 'nurse_admin' or user.staff_id == swap.requested_by_staff_id
+
+
+@app.route('/swaps', methods=['GET'])
+@jwt_required()
+def get_swaps():
+    """Swaps in the clinic; ?status=open,claimed (the default) or any of approved/cancelled."""
+    try:
+        user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+
+        statuses = [s for s in request.args.get('status', 'open,claimed').split(',') if s]
+        swaps = ShiftSwap.query.options(
+            joinedload(ShiftSwap.shift).joinedload(Shift.staff_member),
+            joinedload(ShiftSwap.shift).joinedload(Shift.area),
+            joinedload(ShiftSwap.requested_by),
+            joinedload(ShiftSwap.taker)
+        ).filter(
+            ShiftSwap.clinic_id == user.clinic_id,
+            ShiftSwap.status.in_(statuses)
+        ).order_by(ShiftSwap.created_at.desc()).all()
+        return jsonify([s.to_dict() for s in swaps]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/swaps', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_swap():
+    """Offer a shift for swap. Body: {"shift_id": int, "note": str}. Nurses may only offer their own."""
+    try:
+        user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+
+        data = request.get_json() or {}
+        if not data.get('shift_id'):
+            return jsonify({'error': 'shift_id is required'}), 400
+
+        shift = Shift.query.filter_by(id=data['shift_id'], clinic_id=user.clinic_id).first()
+        if not shift:
+            return jsonify({'error': 'Shift not found'}), 404
+        if user.role == 'nurse' and shift.staff_id != user.staff_id:
+            return jsonify({'error': 'You can only offer your own shifts'}), 403
+        if shift.date < date.today():
+            return jsonify({'error': 'Past shifts cannot be swapped'}), 400
+
+        swap = ShiftSwap(
+            clinic_id=user.clinic_id,
+            shift_id=shift.id,
+            requested_by_staff_id=shift.staff_id,
+            note=data.get('note')
+        )
+        db.session.add(swap)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'This shift is already offered for swap'}), 409
+
+        candidates = shift_candidates(week_availability_for(shift), shift)
+        publish_event(user.clinic_id, 'swap.created', swap.to_dict())
+        return jsonify(dict(swap.to_dict(), candidates=candidates)), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/swaps/<int:id>/candidates', methods=['GET'])
+@jwt_required()
+def get_swap_candidates(id):
+    """Eligible takers for the offered shift, best first."""
+    try:
+        user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+
+        swap = ShiftSwap.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not swap:
+            return jsonify({'error': 'Swap not found'}), 404
+        if not swap_can_view_candidates(user, swap):
+            return jsonify({'error': 'Forbidden'}), 403
+
+        return jsonify({
+            'swap_id': swap.id,
+            'candidates': shift_candidates(week_availability_for(swap.shift), swap.shift)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/swaps/<int:id>/claim', methods=['POST'])
+@jwt_required()
+def claim_swap(id):
+    """A nurse volunteers to take an open swap; an admin still has to approve it."""
+    try:
+        user, error_response, status = require_roles('nurse')
+        if error_response:
+            return error_response, status
+        if not user.staff_id:
+            return jsonify({'error': 'Your account is not linked to a staff member'}), 400
+
+        swap = ShiftSwap.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not swap:
+            return jsonify({'error': 'Swap not found'}), 404
+        if swap.status != 'open':
+            return jsonify({'error': f'Swap is already {swap.status}'}), 409
+
+        shift = swap.shift
+        if user.staff_id == shift.staff_id:
+            return jsonify({'error': 'You already hold this shift'}), 400
+        reason = week_availability_for(shift).ineligible_reason(
+            user.staff_id, shift.staff_member.role, shift.date,
+            shift_hours(shift.start_time, shift.end_time), shift.area.name
+        )
+        if reason:
+            return jsonify({'error': reason}), 409
+
+        claimed = db.session.execute(
+            update(ShiftSwap)
+            .where(ShiftSwap.id == id, ShiftSwap.status == 'open')
+            .values(status='claimed', taker_staff_id=user.staff_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'error': 'Someone else claimed this swap first'}), 409
+        db.session.commit()
+
+        publish_event(user.clinic_id, 'swap.updated', swap.to_dict())
+        return jsonify(swap.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/swaps/<int:id>/approve', methods=['POST'])
+@jwt_required()
+def approve_swap(id):
+    """
+    Hand the shift to the taker. Body (optional): {"taker_staff_id": int}, required
+    if nobody has claimed the swap. Eligibility is re-checked against the current
+    week, and the swap and the shift change commit together or not at all.
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        swap = ShiftSwap.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not swap:
+            return jsonify({'error': 'Swap not found'}), 404
+        if swap.status not in ShiftSwap.ACTIVE_STATUSES:
+            return jsonify({'error': f'Swap is already {swap.status}'}), 409
+
+        data = request.get_json(silent=True) or {}
+        taker_id = data.get('taker_staff_id') or swap.taker_staff_id
+        if not taker_id:
+            return jsonify({'error': 'taker_staff_id is required until someone claims the swap'}), 400
+
+        shift = swap.shift
+        if shift.staff_id != swap.requested_by_staff_id:
+            return jsonify({'error': 'The shift was reassigned after it was offered'}), 409
+        if shift.date < date.today():
+            return jsonify({'error': 'Past shifts cannot be swapped'}), 400
+
+        # Lock the taker so two approvals can't both spend their last free day
+        taker = Staff.query.filter_by(id=taker_id, clinic_id=user.clinic_id).with_for_update().first()
+        if not taker:
+            db.session.rollback()
+            return jsonify({'error': 'Taker not found'}), 404
+        reason = week_availability_for(shift).ineligible_reason(
+            taker.id, shift.staff_member.role, shift.date,
+            shift_hours(shift.start_time, shift.end_time), shift.area.name
+        )
+        if reason:
+            db.session.rollback()
+            return jsonify({'error': reason}), 409
+
+        decided = db.session.execute(
+            update(ShiftSwap)
+            .where(ShiftSwap.id == id, ShiftSwap.status.in_(ShiftSwap.ACTIVE_STATUSES))
+            .values(status='approved', taker_staff_id=taker.id, decided_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not decided:
+            db.session.rollback()
+            return jsonify({'error': 'Swap was decided by someone else'}), 409
+
+        # Same role, same area and day: coverage counts don't move
+        shift.staff_id = taker.id
+        try:
+            db.session.commit()
+        except StaleDataError:
+            return version_conflict(Shift, shift.id, user, 'Shift')
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': f'{taker.name} is already scheduled on {shift.date}'}), 409
+            raise
+
+        publish_event(user.clinic_id, 'shift.updated', shift.to_dict())
+        publish_event(user.clinic_id, 'swap.updated', swap.to_dict())
+        return jsonify(dict(swap.to_dict(), shift=shift.to_dict())), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/swaps/<int:id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_swap(id):
+    """Withdraw an open or claimed swap (the nurse who offered it, or an admin)."""
+    try:
+        user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+
+        swap = ShiftSwap.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not swap:
+            return jsonify({'error': 'Swap not found'}), 404
+        if user.role == 'nurse' and swap.requested_by_staff_id != user.staff_id:
+            return jsonify({'error': 'Forbidden'}), 403
+
+        cancelled = db.session.execute(
+            update(ShiftSwap)
+            .where(ShiftSwap.id == id, ShiftSwap.status.in_(ShiftSwap.ACTIVE_STATUSES))
+            .values(status='cancelled', decided_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not cancelled:
+            db.session.rollback()
+            return jsonify({'error': f'Swap is already {swap.status}'}), 409
+        db.session.commit()
+
+        publish_event(user.clinic_id, 'swap.updated', swap.to_dict())
+        return jsonify(swap.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ========== TIME OFF REQUEST ROUTES ==========
 
 @app.route('/time-off', methods=['GET'])
@@ -738,11 +1554,12 @@ def get_time_off_request_by_id(id):
     if current_user.role == 'nurse' and request_obj.staff_id != current_user.staff_id:
         return jsonify({'error': 'Forbidden'}), 403
 
-    return jsonify(request_obj.to_dict()), 200
+    return versioned_response(request_obj)
 
 
 @app.route('/time-off', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_time_off_request():
     try:
         current_user, error_response, status = require_roles('nurse_admin', 'nurse')
@@ -804,8 +1621,7 @@ def create_time_off_request():
             TimeOffRequest.clinic_id == clinic_id,
             TimeOffRequest.request_type == request_type,
             TimeOffRequest.status.in_(['pending', 'approved']),
-            TimeOffRequest.start_date <= end_date,
-            TimeOffRequest.end_date >= start_date
+            TimeOffRequest.overlaps(start_date, end_date)
         ).first()
 
         if overlapping:
@@ -828,7 +1644,9 @@ def create_time_off_request():
         db.session.add(new_request)
         db.session.commit()
 
-        return jsonify(new_request.to_dict()), 201
+        result = new_request.to_dict()
+        publish_event(clinic_id, 'time_off.created', result)
+        return jsonify(result), 201
 
     except KeyError as e:
         return jsonify({'error': f'Missing required field: {str(e)}'}), 400
@@ -848,43 +1666,200 @@ def update_time_off_request(id):
         request_obj = TimeOffRequest.query.filter_by(id=id, clinic_id=user.clinic_id).first_or_404()
         data = request.get_json()
 
+        try:
+            expected_version = requested_version(data)
+        except ValueError:
+            return jsonify({'error': 'If-Match/version must be a version number'}), 400
+        if expected_version is not None and expected_version != request_obj.version:
+            return version_conflict(TimeOffRequest, id, user, 'Time-off request')
+
+        conflict_action = data.get('conflict_action', 'report')
+        if conflict_action not in ('report', 'remove', 'suggest'):
+            return jsonify({'error': 'conflict_action must be report, remove, or suggest'}), 400
+
+        newly_approved = False
         if 'status' in data:
             valid_statuses = ['pending', 'approved', 'denied']
             if data['status'] not in valid_statuses:
                 return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
+            newly_approved = data['status'] == 'approved' and request_obj.status != 'approved'
             request_obj.status = data['status']
 
         if 'reason' in data:
             request_obj.reason = data['reason']
 
-        db.session.commit()
-        return jsonify(request_obj.to_dict()), 200
+        impact = None
+        try:
+            # Flush first so a concurrent edit is caught before any shifts are touched
+            db.session.flush()
+            if newly_approved:
+                impact = time_off_approval_impact(user.clinic_id, [request_obj.id], conflict_action)
+            db.session.commit()
+        except StaleDataError:
+            return version_conflict(TimeOffRequest, id, user, 'Time-off request')
+
+        result = request_obj.to_dict()
+        publish_event(user.clinic_id, 'time_off.updated', dict(result))
+        publish_time_off_impact(user.clinic_id, impact)
+        if impact is not None:
+            result['impact'] = impact
+        return versioned_response(request_obj, payload=result)
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/time-off/<int:id>', methods=['DELETE'])
+@app.route('/time-off/batch', methods=['POST'])
 @jwt_required()
-def delete_time_off_request(id):
+def batch_update_time_off_requests():
+    """
+    Approve/deny many requests at once.
+    Body: {"updates": [{"id": 1, "status": "approved", "version": 3}, ...],
+           "conflict_action": "report" | "remove" | "suggest"}
+    "version" is optional; when given, the row is only updated if nobody
+    else has changed it since the client read it.
+    """
     try:
-        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        user, error_response, status = require_roles('nurse_admin')
         if error_response:
             return error_response, status
 
-        request_obj = TimeOffRequest.query.filter_by(
-            id=id, clinic_id=current_user.clinic_id
-        ).first_or_404()
+        clinic_id = user.clinic_id
+        data = request.get_json(silent=True) or {}
+        updates = data.get('updates') if isinstance(data, dict) else None
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'error': 'updates must be a non-empty list'}), 400
+
+        conflict_action = data.get('conflict_action', 'report')
+        if conflict_action not in ('report', 'remove', 'suggest'):
+            return jsonify({'error': 'conflict_action must be report, remove, or suggest'}), 400
+
+        valid_statuses = ['pending', 'approved', 'denied']
+        wanted = {}
+        for item in updates:
+            try:
+                request_id = int(item['id'])
+            except (KeyError, ValueError, TypeError):
+                return jsonify({'error': 'Each update needs an integer id'}), 400
+            if item.get('status') not in valid_statuses:
+                return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
+            if request_id in wanted:
+                return jsonify({'error': f'Duplicate id {request_id} in updates'}), 400
+            wanted[request_id] = item
+
+        # A malformed version fails only its own item
+        versions, invalid = {}, set()
+        for request_id, item in wanted.items():
+            if item.get('version') is not None:
+                try:
+                    versions[request_id] = parse_version(item['version'])
+                except ValueError:
+                    invalid.add(request_id)
+
+        # One IN query both checks clinic ownership and fetches current versions
+        current = {
+            row.id: row for row in db.session.query(
+                TimeOffRequest.id, TimeOffRequest.status, TimeOffRequest.version
+            ).filter(
+                TimeOffRequest.clinic_id == clinic_id,
+                TimeOffRequest.id.in_(list(wanted))
+            )
+        }
+
+        results = {}
+        versioned, unversioned = [], []
+        for request_id, item in wanted.items():
+            row = current.get(request_id)
+            if request_id in invalid:
+                results[request_id] = {'id': request_id, 'result': 'invalid', 'status_code': 400,
+                                       'error': 'version must be an integer'}
+            elif not row:
+                results[request_id] = {'id': request_id, 'result': 'not_found'}
+            elif request_id in versions and versions[request_id] != row.version:
+                results[request_id] = {'id': request_id, 'result': 'conflict',
+                                       'status': row.status, 'version': row.version}
+            elif request_id in versions:
+                versioned.append((request_id, row.version))
+            else:
+                unversioned.append(request_id)
+
+        updated = {}
+        if versioned or unversioned:
+            stmt = update(TimeOffRequest).where(
+                TimeOffRequest.clinic_id == clinic_id,
+                or_(
+                    tuple_(TimeOffRequest.id, TimeOffRequest.version).in_(versioned),
+                    TimeOffRequest.id.in_(unversioned)
+                )
+            ).values(
+                status=case(
+                    {request_id: item['status'] for request_id, item in wanted.items()},
+                    value=TimeOffRequest.id
+                ),
+                version=TimeOffRequest.version + 1
+            ).returning(
+                TimeOffRequest.id, TimeOffRequest.version
+            ).execution_options(synchronize_session=False)
+            updated = {row.id: row.version for row in db.session.execute(stmt)}
+
+        for request_id, _ in versioned:
+            if request_id not in updated:
+                # Changed by someone else between our read and the UPDATE
+                results[request_id] = {'id': request_id, 'result': 'conflict'}
+        for request_id, version in updated.items():
+            results[request_id] = {'id': request_id, 'result': 'updated',
+                                   'status': wanted[request_id]['status'], 'version': version}
+
+        newly_approved = [
+            request_id for request_id in updated
+            if wanted[request_id]['status'] == 'approved' and current[request_id].status != 'approved'
+        ]
+        impact = None
+        if newly_approved:
+            impact = time_off_approval_impact(clinic_id, newly_approved, conflict_action)
 
-        if current_user.role == 'nurse':
-            if request_obj.staff_id != current_user.staff_id:
-                return jsonify({'error': 'Forbidden'}), 403
+        db.session.commit()
+        db.session.expire_all()
+
+        if updated:
+            publish_event(clinic_id, 'time_off.batch', {
+                'updated': [results[request_id] for request_id in updated]
+            })
+            publish_time_off_impact(clinic_id, impact)
+
+        return jsonify({
+            'updated': len(updated),
+            'results': [results[request_id] for request_id in wanted],
+            'impact': impact
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/time-off/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_time_off_request(id):
+    try:
+        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+
+        request_obj = TimeOffRequest.query.filter_by(
+            id=id, clinic_id=current_user.clinic_id
+        ).first_or_404()
+
+        if current_user.role == 'nurse':
+            if request_obj.staff_id != current_user.staff_id:
+                return jsonify({'error': 'Forbidden'}), 403
             if request_obj.status != 'pending':
                 return jsonify({'error': 'Only pending requests can be deleted'}), 400
 
         db.session.delete(request_obj)
         db.session.commit()
+        publish_event(current_user.clinic_id, 'time_off.deleted', {'id': id})
         return jsonify({'message': 'Time-off request deleted'}), 200
     except Exception as e:
         db.session.rollback()
@@ -908,7 +1883,11 @@ def get_area_coverage(area_id, date):
             Shift.date == coverage_date
         ).all()
 
-        is_covered, warnings = check_area_coverage(area_id, coverage_date)
+        summary = CoverageDaily.query.filter_by(area_id=area_id, date=coverage_date).first()
+        if summary:
+            is_covered, warnings = summary.is_covered, summary.to_dict()['warnings']
+        else:
+            is_covered, warnings = evaluate_area_coverage(area, 0, 0, 0)
 
         return jsonify({
             'area_id': area_id,
@@ -922,6 +1901,525 @@ def get_area_coverage(area_id, date):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/coverage', methods=['GET'])
+@jwt_required()
+def get_coverage_range():
+    """Per-area, per-day coverage for a date range (calendar badges) from coverage_daily."""
+    try:
+        clinic_id = get_current_clinic_id()
+        if not request.args.get('start_date') or not request.args.get('end_date'):
+            return jsonify({'error': 'start_date and end_date are required'}), 400
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+        if end < start:
+            return jsonify({'error': 'end_date must be on or after start_date'}), 400
+        if (end - start).days > 92:
+            return jsonify({'error': 'Date range cannot exceed 92 days'}), 400
+
+        return jsonify(coverage_summary(clinic_id, start, end)), 200
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/fill-suggestions', methods=['GET'])
+@jwt_required()
+def get_fill_suggestions():
+    """
+    Who to call when someone calls out: ?area_id=&date=YYYY-MM-DD[&role=RN].
+    Per-diem staff who marked the day available and off-duty staff, ranked.
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        if not request.args.get('area_id') or not request.args.get('date'):
+            return jsonify({'error': 'area_id and date are required'}), 400
+        try:
+            area_id = int(request.args['area_id'])
+            day = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'area_id must be an integer and date YYYY-MM-DD'}), 400
+
+        area = StaffArea.query.filter_by(id=area_id, clinic_id=user.clinic_id).first()
+        if not area:
+            return jsonify({'error': 'Area not found'}), 404
+
+        roles = [request.args['role']] if request.args.get('role') else area_roles(area)
+        candidates = rank_fill_candidates(load_fill_rows(user.clinic_id, day), area, day, roles)
+        return jsonify({
+            'area_id': area_id,
+            'date': day.strftime('%Y-%m-%d'),
+            'roles': roles,
+            'candidates': candidates
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== SCHEDULE TEMPLATES ==========
+
+TEMPLATE_APPLY_MAX_WEEKS = 16  # a quarter plus slack per request
+
+
+def parse_monday(value, field):
+    """(monday, error_message) for a YYYY-MM-DD string that must be a Monday."""
+    try:
+        day = datetime.strptime(value or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None, f'{field} must be a date in YYYY-MM-DD format'
+    if day.weekday() != 0:
+        return None, f'{field} must be a Monday'
+    return day, None
+
+
+@app.route('/templates', methods=['GET'])
+@jwt_required()
+def get_templates():
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        templates = ScheduleTemplate.query.filter_by(clinic_id=user.clinic_id).order_by(ScheduleTemplate.name).all()
+        return jsonify([t.to_dict() for t in templates]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/templates', methods=['POST'])
+@jwt_required()
+def create_template():
+    """
+    Save a recurring week. Body: {"name": str, "from_week": "YYYY-MM-DD"} to
+    capture an existing week, or {"name": str, "shifts": [{"staff_id", "area_id",
+    "weekday", "start_time", "end_time"}]} with weekday Monday-Friday (or 0-4).
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        data = request.get_json() or {}
+        if data.get('from_week'):
+            week_start, error = parse_monday(data['from_week'], 'from_week')
+            if error:
+                return jsonify({'error': error}), 400
+            blob, count = encode_week(user.clinic_id, week_start)
+        elif isinstance(data.get('shifts'), list):
+            shifts = data['shifts']
+            if not all(isinstance(s, dict) and all(isinstance(s.get(k), int) and not isinstance(s.get(k), bool)
+                                                   for k in ('staff_id', 'area_id')) for s in shifts):
+                return jsonify({'error': 'Each template shift must be an object with integer staff_id and area_id'}), 400
+            staff_ids = {s.get('staff_id') for s in shifts}
+            area_ids = {s.get('area_id') for s in shifts}
+            known_staff = Staff.query.filter(Staff.clinic_id == user.clinic_id, Staff.id.in_(staff_ids)).count()
+            known_areas = StaffArea.query.filter(StaffArea.clinic_id == user.clinic_id, StaffArea.id.in_(area_ids)).count()
+            if known_staff != len(staff_ids) or known_areas != len(area_ids):
+                return jsonify({'error': 'Unknown staff or area in shifts'}), 400
+            try:
+                blob, count = encode_template(shifts)
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid template shift: {e}'}), 400
+        else:
+            return jsonify({'error': 'from_week or shifts is required'}), 400
+
+        if count == 0:
+            return jsonify({'error': 'Template has no shifts'}), 400
+
+        template = ScheduleTemplate(
+            clinic_id=user.clinic_id,
+            name=data.get('name'),
+            template_data=blob,
+            shift_count=count
+        )
+        db.session.add(template)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'A template with this name already exists'}), 409
+
+        return jsonify(template.to_dict()), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/templates/<int:id>', methods=['GET'])
+@jwt_required()
+def get_template(id):
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        template = ScheduleTemplate.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not template:
+            return jsonify({'error': 'Template not found'}), 404
+        return jsonify(dict(template.to_dict(), shifts=template_shifts(template))), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/templates/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_template(id):
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        template = ScheduleTemplate.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not template:
+            return jsonify({'error': 'Template not found'}), 404
+        db.session.delete(template)
+        db.session.commit()
+        return jsonify({'message': 'Template deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/templates/<int:id>/apply', methods=['POST'])
+@jwt_required()
+@idempotent
+def apply_schedule_template(id):
+    """
+    Roll the template out to every week from start_week to end_week (Mondays,
+    inclusive). Body: {"start_week", "end_week", "dry_run": bool}. Shifts that
+    would clash with approved time-off, a required day off or an existing
+    shift are skipped and counted, not inserted.
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        template = ScheduleTemplate.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not template:
+            return jsonify({'error': 'Template not found'}), 404
+
+        data = request.get_json() or {}
+        start_week, error = parse_monday(data.get('start_week'), 'start_week')
+        if not error:
+            end_week, error = parse_monday(data.get('end_week', data.get('start_week')), 'end_week')
+        if error:
+            return jsonify({'error': error}), 400
+        if end_week < start_week:
+            return jsonify({'error': 'end_week must be on or after start_week'}), 400
+        n_weeks = (end_week - start_week).days // 7 + 1
+        if n_weeks > TEMPLATE_APPLY_MAX_WEEKS:
+            return jsonify({'error': f'Cannot apply a template to more than {TEMPLATE_APPLY_MAX_WEEKS} weeks at once'}), 400
+
+        week_starts = [start_week + timedelta(weeks=i) for i in range(n_weeks)]
+        dry_run = bool(data.get('dry_run'))
+        try:
+            result = apply_template(template, week_starts, dry_run=dry_run)
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': DOUBLE_BOOKED_WEEK_MESSAGE}), 409
+            raise
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            if result['created']:
+                publish_event(user.clinic_id, 'schedule.replaced', {
+                    'start_date': start_week.strftime('%Y-%m-%d'),
+                    'end_date': (end_week + timedelta(days=4)).strftime('%Y-%m-%d')
+                })
+
+        return jsonify(dict(result, template_id=template.id)), 200 if dry_run else 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== SIMULATION ==========
+
+@app.route('/simulate', methods=['POST'])
+@jwt_required()
+def simulate():
+    """
+    Compare coverage over the coming weeks under hypothetical changes, without
+    writing anything. Body:
+      {"start_week": "YYYY-MM-DD" (a Monday; default next Monday), "weeks": 4,
+       "scenarios": [{"name", "approve_time_off": [request ids], "remove_staff": [staff ids],
+                      "add_staff": [{"name", "role", "shift_length", "days_per_week", "is_per_diem"}],
+                      "closed_rooms": [area names], "active_rooms": {"YYYY-MM-DD": [area names]}}]}
+    The first result is always the unchanged baseline; the others carry their change against it.
+    """
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        data = request.get_json() or {}
+        if data.get('start_week'):
+            start_week, error = parse_monday(data['start_week'], 'start_week')
+            if error:
+                return jsonify({'error': error}), 400
+        else:
+            today = date.today()
+            start_week = today + timedelta(days=7 - today.weekday())
+        weeks = data.get('weeks', 4)
+        if not isinstance(weeks, int) or isinstance(weeks, bool) or not 1 <= weeks <= SIMULATION_MAX_WEEKS:
+            return jsonify({'error': f'weeks must be between 1 and {SIMULATION_MAX_WEEKS}'}), 400
+        specs = data.get('scenarios') or []
+        if not isinstance(specs, list) or not 1 <= len(specs) <= MAX_SCENARIOS:
+            return jsonify({'error': f'Provide between 1 and {MAX_SCENARIOS} scenarios'}), 400
+
+        started = time.perf_counter()
+        baseline = load_baseline(user.clinic_id, start_week, weeks)
+        db.session.rollback()  # read-only; release the connection before the CPU-bound part
+        if not baseline.staff:
+            return jsonify({'error': 'No active staff found'}), 400
+        try:
+            scenarios = [parse_scenario({'name': 'Baseline'}, baseline, 0)]
+            scenarios += [parse_scenario(spec, baseline, i) for i, spec in enumerate(specs, start=1)]
+        except (ValueError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        results = run_scenarios(baseline, scenarios, app.config['SIMULATION_WORKERS'])
+        return jsonify({
+            'start_week': start_week.strftime('%Y-%m-%d'),
+            'weeks': weeks,
+            'results': results,
+            'seconds': round(time.perf_counter() - started, 3)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== REPORTS ==========
+
+REPORT_MAX_DAYS = 3 * 366
+
+
+def report_range(max_days=REPORT_MAX_DAYS):
+    """(start, end, error_response) from ?start_date=&end_date=."""
+    if not request.args.get('start_date') or not request.args.get('end_date'):
+        return None, None, (jsonify({'error': 'start_date and end_date are required'}), 400)
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+    except ValueError:
+        return None, None, (jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400)
+    if end < start:
+        return None, None, (jsonify({'error': 'end_date must be on or after start_date'}), 400)
+    if (end - start).days > max_days:
+        return None, None, (jsonify({'error': f'Date range cannot exceed {max_days} days'}), 400)
+    return start, end, None
+
+
+@app.route('/reports/hours', methods=['GET'])
+@jwt_required()
+def get_hours_report():
+    """Scheduled vs contracted hours and overtime per staff member."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+        start, end, error = report_range()
+        if error:
+            return error
+
+        report = hours_report(*load_report_data(user.clinic_id, start, end), start, end)
+        return jsonify(dict(report, start_date=start.isoformat(), end_date=end.isoformat())), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/reports/fairness', methods=['GET'])
+@jwt_required()
+def get_fairness_report():
+    """Weekend/early-start share, area rotation and call-outs per staff member."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+        start, end, error = report_range()
+        if error:
+            return error
+
+        report = fairness_report(*load_report_data(user.clinic_id, start, end), start, end)
+        return jsonify(dict(report, start_date=start.isoformat(), end_date=end.isoformat())), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== EXPORTS ==========
+
+EXPORT_MAX_DAYS = 10 * 366
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+@app.route('/exports/shifts.csv', methods=['GET'])
+@jwt_required()
+def export_shifts_csv():
+    """Streamed payroll CSV for ?start_date=&end_date=; gzip-encoded when the client accepts it."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+        start, end, error = report_range(EXPORT_MAX_DAYS)
+        if error:
+            return error
+
+        compress = request.accept_encodings['gzip'] > 0  # honours q=0
+        rows = export_rows(user.clinic_id, start, end)
+        response = Response(stream_with_context(csv_chunks(rows, compress)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="shifts_{start}_{end}.csv"'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.headers['Vary'] = 'Accept-Encoding'
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/exports/shifts.xlsx', methods=['GET'])
+@jwt_required()
+def export_shifts_xlsx():
+    """Same rows as the CSV export as an Excel workbook."""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+        start, end, error = report_range(EXPORT_MAX_DAYS)
+        if error:
+            return error
+
+        try:
+            output = build_xlsx(export_rows(user.clinic_id, start, end))
+        except ImportError:
+            return jsonify({'error': 'XLSX export is not available on this server; use /exports/shifts.csv'}), 501
+        return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True,
+                         download_name=f'shifts_{start}_{end}.xlsx')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== CALENDAR FEEDS ==========
+
+feed_cache = FeedCache(app.config['CALENDAR_CACHE_SIZE'])
+
+
+@app.route('/staff/<int:id>/calendar-token', methods=['POST'])
+@jwt_required()
+def create_calendar_token(id):
+    """
+    Issue (or rotate) the secret feed URL for a staff member's calendar.
+    The token is only shown once; rotating invalidates the old URL.
+    """
+    try:
+        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+        if current_user.role == 'nurse' and current_user.staff_id != id:
+            return jsonify({'error': 'Nurses can only subscribe to their own calendar'}), 403
+
+        staff = Staff.query.filter_by(id=id, clinic_id=current_user.clinic_id).first_or_404()
+        token = secrets.token_urlsafe(32)
+        staff.calendar_token_hash = hash_calendar_token(token)
+        db.session.commit()
+        return jsonify({'token': token, 'path': f'calendar/{token}.ics'}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/staff/<int:id>/calendar-token', methods=['DELETE'])
+@jwt_required()
+def revoke_calendar_token(id):
+    try:
+        current_user, error_response, status = require_roles('nurse_admin', 'nurse')
+        if error_response:
+            return error_response, status
+        if current_user.role == 'nurse' and current_user.staff_id != id:
+            return jsonify({'error': 'Forbidden'}), 403
+
+        staff = Staff.query.filter_by(id=id, clinic_id=current_user.clinic_id).first_or_404()
+        staff.calendar_token_hash = None
+        db.session.commit()
+        return jsonify({'message': 'Calendar feed disabled'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/calendar/<string:token>.ics', methods=['GET'])
+def get_calendar_feed(token):
+    """Public (token-addressed) iCalendar feed; 304 when nothing in the window changed."""
+    try:
+        start, end = feed_window(date.today(), app.config['CALENDAR_PAST_DAYS'],
+                                 app.config['CALENDAR_FUTURE_DAYS'])
+        found = lookup_feed(token, start, end)
+        if found is None:
+            return Response('Calendar not found\n', status=404, mimetype='text/plain')
+        staff_id, staff_name, clinic_id, etag = found
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        entry = feed_cache.get(staff_id, etag)
+        if entry is None:
+            stamp = datetime.utcnow().replace(microsecond=0)
+            entry = (etag, build_feed(staff_id, staff_name, clinic_id, start, end, stamp), stamp)
+            feed_cache.put(staff_id, entry)
+
+        response = Response(entry[1], mimetype='text/calendar')
+        response.set_etag(etag)
+        response.last_modified = entry[2]
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        return response.make_conditional(request)
+    except Exception as e:
+        app.logger.error(f'Calendar feed failed: {e}')
+        return Response('Calendar temporarily unavailable\n', status=500, mimetype='text/plain')
+
+
+# ========== LIVE UPDATES ==========
+
+@app.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """
+    Server-Sent Events for the caller's clinic.
+    EventSource cannot set headers, so this route also accepts the access
+    token as ?jwt=<token>. Events: shift.created / shift.updated /
+    shift.deleted / shifts.batch, time_off.created / time_off.updated /
+    time_off.deleted / time_off.batch, staff.updated, coverage.updated,
+    schedule.replaced, and resync (reload, then reconnect).
+    503 with Retry-After when this worker already has EVENTS_MAX_STREAMS open.
+    """
+    user = get_authenticated_user()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    subscription = event_broker.subscribe(user.clinic_id, request.headers.get('Last-Event-ID'))
+    if subscription is None:
+        # This worker's stream slots are all taken; keep its threads for API requests
+        return Response('retry: 30000\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': '30', 'Cache-Control': 'no-cache'})
+    return Response(
+        stream(subscription, event_broker,
+               heartbeat=app.config['EVENTS_HEARTBEAT_SECONDS'],
+               max_seconds=app.config['EVENTS_STREAM_MAX_SECONDS']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/ai/generate-schedule', methods=['POST', 'OPTIONS'])
 @jwt_required()
 def ai_generate_schedule():
@@ -958,15 +2456,12 @@ def ai_generate_schedule():
         if not result['success']:
             return jsonify({'error': result['message']}), 500
 
-        suggestion = AISuggestion(
-            clinic_id=clinic_id,
-            week_start_date=week_start,
-            suggested_schedule=json.dumps(result['shifts']),
+        suggestion = save_suggestion(
+            clinic_id, week_start, result['shifts'],
             reasoning='Generated schedule',
             constraints_met='All constraints evaluated',
             accepted=False
         )
-        db.session.add(suggestion)
         db.session.commit()
 
         return jsonify({
@@ -979,8 +2474,124 @@ def ai_generate_schedule():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/ai/suggestions', methods=['GET'])
+@jwt_required()
+def get_ai_suggestions():
+    """List stored suggestions (metadata only), optionally for one week"""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        query = AISuggestion.query.filter_by(clinic_id=user.clinic_id)
+        if request.args.get('week_start_date'):
+            week_start = datetime.strptime(request.args['week_start_date'], '%Y-%m-%d').date()
+            query = query.filter_by(week_start_date=week_start)
+
+        suggestions = query.order_by(AISuggestion.id.desc()).limit(100).all()
+        return jsonify([s.to_dict() for s in suggestions]), 200
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/ai/suggestions/<int:id>', methods=['GET'])
+@jwt_required()
+def get_ai_suggestion(id):
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        suggestion = AISuggestion.query.filter_by(id=id, clinic_id=user.clinic_id).first_or_404()
+        result = suggestion.to_dict()
+        result['shifts'] = load_suggestion_shifts(suggestion)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': 'Suggestion not found'}), 404
+
+
+@app.route('/ai/suggestions/<int:id>/diff', methods=['GET'])
+@jwt_required()
+def diff_ai_suggestion(id):
+    """Diff a suggestion against another (?against=<id>) or the live schedule (?against=live)"""
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        suggestion = AISuggestion.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not suggestion:
+            return jsonify({'error': 'Suggestion not found'}), 404
+
+        against = request.args.get('against', 'live')
+        if against == 'live':
+            before = live_week_shifts(user.clinic_id, suggestion.week_start_date)
+        else:
+            try:
+                other_id = int(against)
+            except ValueError:
+                return jsonify({'error': 'against must be a suggestion id or "live"'}), 400
+            other = AISuggestion.query.filter_by(id=other_id, clinic_id=user.clinic_id).first()
+            if not other:
+                return jsonify({'error': 'Suggestion not found'}), 404
+            before = load_suggestion_shifts(other)
+
+        diff = diff_shifts(before, load_suggestion_shifts(suggestion))
+        diff['suggestion_id'] = suggestion.id
+        diff['against'] = against
+        return jsonify(diff), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+DOUBLE_BOOKED_WEEK_MESSAGE = ('Some staff are already scheduled on those dates. '
+                              'Clear the existing week or fill empty slots only.')
+
+
+def insert_week_shifts(clinic_id, week_start, shifts_data, clear_existing=False):
+    """
+    Bulk-insert a week of shift dicts (one multi-row INSERT ... RETURNING) and
+    rebuild coverage for the week. Raises IntegrityError on double booking;
+    the caller commits or rolls back.
+    """
+    if clear_existing:
+        Shift.query.filter(
+            Shift.clinic_id == clinic_id,
+            Shift.date >= week_start,
+            Shift.date <= week_start + timedelta(days=4)
+        ).delete(synchronize_session=False)
+
+    rows = [
+        {
+            'clinic_id': clinic_id,
+            'staff_id': shift_data['staff_id'],
+            'area_id': shift_data['area_id'],
+            'date': datetime.strptime(shift_data['date'], '%Y-%m-%d').date(),
+            'start_time': datetime.strptime(shift_data['start_time'], '%H:%M').time(),
+            'end_time': datetime.strptime(shift_data['end_time'], '%H:%M').time(),
+        }
+        for shift_data in shifts_data
+    ]
+    created_shifts = db.session.scalars(insert(Shift).returning(Shift), rows).all() if rows else []
+
+    touched = [r['date'] for r in rows] + [week_start, week_start + timedelta(days=4)]
+    rebuild_coverage(clinic_id, min(touched), max(touched))
+    return created_shifts
+
+
+def publish_schedule_replaced(clinic_id, week_start):
+    # Too many rows for a delta; streams reload the week's shifts and coverage
+    publish_event(clinic_id, 'schedule.replaced', {
+        'start_date': week_start.strftime('%Y-%m-%d'),
+        'end_date': (week_start + timedelta(days=4)).strftime('%Y-%m-%d')
+    })
+
+
 @app.route('/ai/apply-schedule', methods=['POST', 'OPTIONS'])
 @jwt_required()
+@idempotent
 def apply_ai_schedule():
     """Apply generated schedule by creating actual shifts"""
     if request.method == 'OPTIONS':
@@ -991,37 +2602,85 @@ def apply_ai_schedule():
         if error_response:
             return error_response, status
 
-        clinic_id = user.clinic_id
         data = request.get_json()
-        shifts_data = data['shifts']
-        clear_existing = data.get('clear_existing', False)
         week_start = datetime.strptime(data['week_start_date'], '%Y-%m-%d').date()
 
-        if clear_existing:
-            week_end = week_start + timedelta(days=4)
-            Shift.query.filter(
-                Shift.clinic_id == clinic_id,
-                Shift.date >= week_start,
-                Shift.date <= week_end
-            ).delete()
-
-        created_shifts = []
-        for shift_data in shifts_data:
-            new_shift = Shift(
-                clinic_id=clinic_id,
-                staff_id=shift_data['staff_id'],
-                area_id=shift_data['area_id'],
-                date=datetime.strptime(shift_data['date'], '%Y-%m-%d').date(),
-                start_time=datetime.strptime(shift_data['start_time'], '%H:%M').time(),
-                end_time=datetime.strptime(shift_data['end_time'], '%H:%M').time()
+        try:
+            created_shifts = insert_week_shifts(
+                user.clinic_id, week_start, data['shifts'], data.get('clear_existing', False)
             )
-            db.session.add(new_shift)
-            created_shifts.append(new_shift)
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': DOUBLE_BOOKED_WEEK_MESSAGE}), 400
+            raise
+        db.session.commit()
+        publish_schedule_replaced(user.clinic_id, week_start)
+
+        return jsonify({
+            'message': f'Successfully created {len(created_shifts)} shifts',
+            'shifts': [s.to_dict() for s in created_shifts]
+        }), 200
 
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/ai/suggestions/<int:id>/apply', methods=['POST', 'OPTIONS'])
+@jwt_required()
+def apply_ai_suggestion(id):
+    """
+    Apply a stored suggestion server-side. Body (optional): {"clear_existing": bool}.
+    Applying the same suggestion twice is a no-op, so double-clicks and retries are safe.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        user, error_response, status = require_roles('nurse_admin')
+        if error_response:
+            return error_response, status
+
+        suggestion = AISuggestion.query.filter_by(id=id, clinic_id=user.clinic_id).first()
+        if not suggestion:
+            return jsonify({'error': 'Suggestion not found'}), 404
+
+        data = request.get_json(silent=True) or {}
+
+        # Claim the suggestion; the row lock makes a concurrent second apply
+        # wait for this transaction and then match nothing.
+        claimed = db.session.execute(
+            update(AISuggestion)
+            .where(AISuggestion.id == id, AISuggestion.accepted.isnot(True))
+            .values(accepted=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({
+                'message': 'Suggestion already applied',
+                'suggestion_id': id,
+                'already_applied': True
+            }), 200
+
+        try:
+            created_shifts = insert_week_shifts(
+                user.clinic_id, suggestion.week_start_date,
+                load_suggestion_shifts(suggestion), data.get('clear_existing', False)
+            )
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_double_booking(e):
+                return jsonify({'error': DOUBLE_BOOKED_WEEK_MESSAGE}), 409
+            raise
         db.session.commit()
+        publish_schedule_replaced(user.clinic_id, suggestion.week_start_date)
 
         return jsonify({
             'message': f'Successfully created {len(created_shifts)} shifts',
+            'suggestion_id': id,
+            'already_applied': False,
             'shifts': [s.to_dict() for s in created_shifts]
         }), 200
 
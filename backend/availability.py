@@ -0,0 +1,250 @@
+"""
+Per-week availability bitmaps for a clinic's whole roster.
+
+Three queries (active staff, the week's shifts, approved time-off) build,
+for every staff member, two 7-bit masks over the Mon-Sun week (bit 0 =
+Monday): the days they already work and the days they are blocked (approved
+time-off or a required day off).  Checking whether someone can take a shift
+on a given day is then a couple of bit tests instead of per-candidate
+queries, so ranking takers for a swap costs the same for 5 staff or 500.
+
+Per-diem staff publish the days they can work as one integer bitset per
+month (bit d-1 = day d); call-out fill suggestions read those bitsets,
+the day's shifts and recent hours in a single query and score in memory.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, exists, func, select
+
+from db import db
+from models import Staff, Shift, StaffAvailability, TimeOffRequest
+from rules import ROLES, area_rules
+from utils import get_time_off_days
+from week_context import WEEKDAYS, days_mask
+
+RECENT_HOURS_DAYS = 14
+
+
+def day_bit(day):
+    return 1 << day.weekday()
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def shift_hours(start_time, end_time):
+    start = datetime.combine(datetime.min, start_time)
+    return (datetime.combine(datetime.min, end_time) - start).total_seconds() / 3600
+
+
+def allowed_in_area(staff, area_name):
+    if not staff.area_restrictions or staff.area_restrictions == '["Any"]':
+        return True
+    return area_name in json.loads(staff.area_restrictions)
+
+
+class WeekAvailability:
+    """Working/blocked day masks for one week, keyed by staff id."""
+
+    def __init__(self, week_start, staff_list, shift_rows, time_off_days):
+        """
+        shift_rows: (staff_id, date, area_id) for every shift in the week.
+        time_off_days: set of (staff_id, date) blocked by approved time-off.
+        """
+        self.week_start = week_start
+        self.staff = {s.id: s for s in staff_list}
+        self.working = dict.fromkeys(self.staff, 0)
+        self.blocked = {s.id: days_mask(s.required_days_off) for s in staff_list}
+        self.areas = {staff_id: set() for staff_id in self.staff}
+
+        for staff_id, day, area_id in shift_rows:
+            if staff_id in self.working:
+                self.working[staff_id] |= day_bit(day)
+                self.areas[staff_id].add(area_id)
+        for staff_id, day in time_off_days:
+            if staff_id in self.blocked:
+                self.blocked[staff_id] |= day_bit(day)
+
+    def ineligible_reason(self, staff_id, role, day, hours, area_name):
+        """Why staff_id can't take a `hours`-long shift on `day`, or None if they can."""
+        staff = self.staff.get(staff_id)
+        if staff is None:
+            return 'Staff member is not active in this clinic'
+        bit = day_bit(day)
+        if staff.role != role:
+            return f"{staff.name} is a {staff.role}, not a {role}"
+        if staff.shift_length != hours:
+            return f"{staff.name} works {staff.shift_length}-hour shifts"
+        if self.working[staff_id] & bit:
+            return f"{staff.name} is already scheduled on {day}"
+        if self.blocked[staff_id] & bit:
+            return f"{staff.name} is off on {day} (time-off or required day off)"
+        if popcount(self.working[staff_id]) >= staff.days_per_week:
+            return f"{staff.name} already works {staff.days_per_week} days this week"
+        if not allowed_in_area(staff, area_name):
+            return f"{staff.name} can't work in {area_name}"
+        return None
+
+    def candidates(self, role, day, hours, area_id, area_name, exclude=()):
+        """
+        Everyone eligible for the shift, best first: most spare days this week
+        (spreads extra work), then those already working the area this week,
+        then by name.
+        """
+        ranked = []
+        for staff_id, staff in self.staff.items():
+            if staff_id in exclude or self.ineligible_reason(staff_id, role, day, hours, area_name):
+                continue
+            days_scheduled = popcount(self.working[staff_id])
+            ranked.append({
+                'staff_id': staff_id,
+                'staff_name': staff.name,
+                'days_scheduled': days_scheduled,
+                'days_per_week': staff.days_per_week,
+                'worked_area_this_week': area_id in self.areas[staff_id],
+            })
+        ranked.sort(key=lambda c: (c['days_scheduled'] - c['days_per_week'],
+                                   not c['worked_area_this_week'], c['staff_name']))
+        return ranked
+
+
+def load_week_availability(clinic_id, week_start):
+    """Build the index for the Mon-Sun week starting at `week_start`."""
+    week_end = week_start + timedelta(days=6)
+    staff_list = Staff.query.filter_by(clinic_id=clinic_id, is_active=True).all()
+    shift_rows = db.session.query(Shift.staff_id, Shift.date, Shift.area_id).filter(
+        Shift.clinic_id == clinic_id,
+        Shift.date.between(week_start, week_end)
+    ).all()
+    return WeekAvailability(week_start, staff_list, shift_rows,
+                            get_time_off_days(clinic_id, week_start, week_end))
+
+
+def shift_candidates(availability, shift, exclude=()):
+    """Ranked takers for an existing shift (its current holder is always excluded)."""
+    return availability.candidates(
+        shift.staff_member.role, shift.date, shift_hours(shift.start_time, shift.end_time),
+        shift.area_id, shift.area.name, exclude=set(exclude) | {shift.staff_id}
+    )
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def month_bitset(dates):
+    """Bitset for days of one month: bit d-1 set for every date with day d."""
+    mask = 0
+    for day in dates:
+        mask |= 1 << (day.day - 1)
+    return mask
+
+
+def is_available(bitset, day):
+    return bitset is not None and bool(bitset >> (day.day - 1) & 1)
+
+
+def area_roles(area):
+    """Roles the area's staffing rules accept (every role if it has no requirements)."""
+    accepted = area_rules(area).roles
+    return [role for role in ROLES if role in accepted] or list(ROLES)
+
+
+def rank_fill_candidates(rows, area, day, roles):
+    """
+    Score everyone who could cover `area` on `day`, best first.
+
+    rows: (staff, availability bitset or None, working that day, days worked
+    that week, shifts in the last RECENT_HOURS_DAYS days, on time-off) per
+    active staff member.  Hard rules drop a candidate; soft ones become
+    warnings that push them down the list.
+    """
+    day_name = WEEKDAYS[day.weekday()]
+    bit = day_bit(day)
+    ranked = []
+    for staff, bitset, working, week_days, recent_shifts, on_time_off in rows:
+        if staff.role not in roles or working or on_time_off:
+            continue
+        if days_mask(staff.required_days_off) & bit:
+            continue
+        if not allowed_in_area(staff, area.name):
+            continue
+
+        available = is_available(bitset, day)
+        warnings = []
+        if staff.is_per_diem and not available:
+            warnings.append('Has not marked this day available')
+        if not staff.is_per_diem and week_days >= staff.days_per_week:
+            warnings.append(f'Already works {week_days} days this week')
+        if days_mask(staff.flexible_days_off) & bit:
+            warnings.append(f'Prefers {day_name} off')
+
+        ranked.append({
+            'staff_id': staff.id,
+            'staff_name': staff.name,
+            'role': staff.role,
+            'is_per_diem': bool(staff.is_per_diem),
+            'marked_available': available,
+            'days_this_week': week_days,
+            'recent_hours': recent_shifts * staff.shift_length,
+            'restricted_to_area': staff.area_restrictions not in (None, '', '["Any"]'),
+            'warnings': warnings,
+        })
+
+    # Fewest broken preferences, then per-diem who offered the day, then
+    # whoever has worked least lately; area specialists break remaining ties
+    ranked.sort(key=lambda c: (len(c['warnings']), not c['marked_available'], c['recent_hours'],
+                               not c['restricted_to_area'], c['staff_name']))
+    return ranked
+
+
+def load_fill_rows(clinic_id, day):
+    """
+    One statement: active staff with their month bitset, whether they work
+    `day`, their days that week, recent shift count and time-off on `day`.
+    """
+    week_start = day - timedelta(days=day.weekday())
+    recent_start = day - timedelta(days=RECENT_HOURS_DAYS)
+    window_start = min(week_start, recent_start)
+    window_end = week_start + timedelta(days=6)
+
+    shift_stats = select(
+        Shift.staff_id,
+        func.sum(case((Shift.date == day, 1), else_=0)).label('working'),
+        func.sum(case((Shift.date.between(week_start, window_end), 1), else_=0)).label('week_days'),
+        func.sum(case((and_(Shift.date >= recent_start, Shift.date < day), 1), else_=0)).label('recent_shifts'),
+    ).where(
+        Shift.clinic_id == clinic_id,
+        Shift.date.between(window_start, window_end)
+    ).group_by(Shift.staff_id).subquery()
+
+    on_time_off = exists().where(
+        TimeOffRequest.staff_id == Staff.id,
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(day, day)
+    )
+
+    stmt = select(
+        Staff,
+        StaffAvailability.days,
+        func.coalesce(shift_stats.c.working, 0),
+        func.coalesce(shift_stats.c.week_days, 0),
+        func.coalesce(shift_stats.c.recent_shifts, 0),
+        on_time_off,
+    ).outerjoin(
+        shift_stats, shift_stats.c.staff_id == Staff.id
+    ).outerjoin(
+        StaffAvailability, and_(StaffAvailability.staff_id == Staff.id,
+                                StaffAvailability.month == month_start(day))
+    ).where(
+        Staff.clinic_id == clinic_id,
+        Staff.is_active.is_(True)
+    )
+    return db.session.execute(stmt).all()
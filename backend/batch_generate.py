@@ -0,0 +1,159 @@
+"""
+Generate next week's schedule for every clinic (or a chosen few) at once.
+
+Everything the generator needs is loaded for all clinics up front -- one
+query each for clinics, active staff, areas and approved time-off -- and
+turned into plain StaffInput/AreaInput rows.  The clinics are then
+scheduled in parallel across a process pool (the algorithm is CPU-bound
+and touches no database), and each result is stored in the main process
+as an unaccepted AISuggestion, exactly as if the clinic's admin had
+clicked Generate.
+
+Usage:
+  python batch_generate.py                        # every clinic, next Monday
+  python batch_generate.py --week 2026-11-02      # a given week
+  python batch_generate.py --clinic 2 --clinic 5  # only these clinics
+  python batch_generate.py --workers 8 --dry-run  # time it without saving
+  python batch_generate.py --export week.json     # write snapshots for schedule_engine.py instead
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from schedule_engine import StaffInput, AreaInput, build_weekly_schedule, snapshot_from_inputs, write_snapshots
+from rules import compile_clinic_rules
+
+
+@dataclass
+class ClinicJob:
+    clinic_id: int
+    name: str
+    rules: str = None
+    staff: list = field(default_factory=list)
+    areas: list = field(default_factory=list)
+    time_off: set = field(default_factory=set)
+
+
+def next_monday(today=None):
+    today = today or date.today()
+    return today + timedelta(days=7 - today.weekday())
+
+
+def load_jobs(week_start, clinic_ids=None):
+    """One ClinicJob per clinic with staff, areas, time-off and rules (four queries in all)."""
+    from db import db
+    from models import Clinic, Staff, StaffArea
+    from utils import get_time_off_days
+
+    clinics = db.session.query(Clinic.id, Clinic.name, Clinic.scheduling_rules).order_by(Clinic.id)
+    if clinic_ids:
+        clinics = clinics.filter(Clinic.id.in_(clinic_ids))
+    jobs = {cid: ClinicJob(cid, name, rules) for cid, name, rules in clinics}
+    if not jobs:
+        return []
+
+    staff_rows = db.session.query(
+        Staff.clinic_id, Staff.id, Staff.name, Staff.role, Staff.shift_length, Staff.days_per_week,
+        Staff.start_time, Staff.is_per_diem, Staff.required_days_off, Staff.flexible_days_off
+    ).filter(Staff.is_active.is_(True), Staff.clinic_id.in_(jobs))
+    staff_clinic = {}
+    for clinic_id, *fields in staff_rows:
+        jobs[clinic_id].staff.append(StaffInput(*fields))
+        staff_clinic[fields[0]] = clinic_id
+
+    area_rows = db.session.query(
+        StaffArea.clinic_id, StaffArea.id, StaffArea.name, StaffArea.required_rn_count,
+        StaffArea.required_tech_count, StaffArea.required_scope_tech_count, StaffArea.rules
+    ).filter(StaffArea.clinic_id.in_(jobs))
+    for clinic_id, *fields in area_rows:
+        jobs[clinic_id].areas.append(AreaInput(*fields))
+
+    # Staff ids are global, so one unfiltered range query serves every clinic
+    for staff_id, day in get_time_off_days(None, week_start, week_start + timedelta(days=4)):
+        if staff_id in staff_clinic:
+            jobs[staff_clinic[staff_id]].time_off.add((staff_id, day))
+
+    return list(jobs.values())
+
+
+def run_job(job, week_start):
+    """Worker: (clinic_id, shifts, warnings, seconds) for one clinic. No database access."""
+    started = time.perf_counter()
+    if not job.staff:
+        return job.clinic_id, [], ['No active staff'], 0.0
+    shifts, warnings = build_weekly_schedule(
+        week_start, job.staff, job.areas, job.time_off, compile_clinic_rules(job.rules)
+    )
+    return job.clinic_id, shifts, warnings, time.perf_counter() - started
+
+
+def generate_all(jobs, week_start, workers):
+    """Run every job, in a process pool when there is more than one worker and job."""
+    if workers <= 1 or len(jobs) <= 1:
+        return [run_job(job, week_start) for job in jobs]
+    # Bigger clinics first so one slow clinic doesn't finish last on its own
+    ordered = sorted(jobs, key=lambda j: len(j.staff), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, ordered, [week_start] * len(ordered)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a week's schedule for many clinics")
+    parser.add_argument('--week', help='Week start, a Monday (YYYY-MM-DD); default next Monday')
+    parser.add_argument('--clinic', type=int, action='append', help='Clinic id (repeatable); default all')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--dry-run', action='store_true', help='Generate and report, but save nothing')
+    parser.add_argument('--export', metavar='FILE', help='Write the loaded clinics as snapshots (.json/.parquet) and exit')
+    args = parser.parse_args()
+
+    week_start = datetime.strptime(args.week, '%Y-%m-%d').date() if args.week else next_monday()
+    if week_start.weekday() != 0:
+        parser.error('--week must be a Monday')
+
+    from app import app, db
+    from schedule_store import save_suggestion
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        jobs = load_jobs(week_start, args.clinic)
+        names = {job.clinic_id: job.name for job in jobs}
+        t1 = time.perf_counter()
+
+        if args.export:
+            write_snapshots([
+                snapshot_from_inputs(week_start, job.staff, job.areas, job.time_off, job.rules)
+                for job in jobs if job.staff
+            ], args.export)
+            print(f"Wrote {sum(1 for job in jobs if job.staff)} clinic snapshot(s) to {args.export}")
+            return
+
+        results = generate_all(jobs, week_start, args.workers)
+        t2 = time.perf_counter()
+
+        total_shifts = 0
+        for clinic_id, shifts, warnings, seconds in sorted(results):
+            total_shifts += len(shifts)
+            if shifts and not args.dry_run:
+                save_suggestion(
+                    clinic_id, week_start, shifts,
+                    reasoning='Generated schedule (batch)',
+                    constraints_met='All constraints evaluated',
+                    accepted=False
+                )
+                db.session.commit()
+            print(f"  {names[clinic_id]}: {len(shifts)} shifts, {len(warnings)} warnings, {seconds * 1000:.1f} ms")
+        t3 = time.perf_counter()
+
+        generate_s = max(t2 - t1, 1e-9)
+        print(f"\nWeek of {week_start}: {len(jobs)} clinics, {total_shifts} shifts "
+              f"({'dry run' if args.dry_run else 'saved as suggestions'})")
+        print(f"  load {t1 - t0:.2f}s, generate {t2 - t1:.2f}s with {args.workers} worker(s), save {t3 - t2:.2f}s")
+        print(f"  {len(jobs) / generate_s:.1f} clinics/s, {total_shifts / generate_s:.0f} shifts/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark for the generator's and validator's inner loops.
+
+Times build_weekly_schedule and shift_rule_errors on synthetic rosters of
+growing size and counts, with cProfile, the date formatting/parsing calls
+made along the way (strftime, strptime, list.index, json.loads).  Those
+counts must stay flat as the roster grows -- the loops read precomputed
+WeekContext tables instead -- and the script exits non-zero if they don't.
+
+Usage:
+  python bench_scheduling.py                 # rosters of 50 and 400 staff
+  python bench_scheduling.py --sizes 100 1000 --repeat 20
+"""
+
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+import time as timer
+from datetime import date, time
+from types import SimpleNamespace
+
+from rules import compile_clinic_rules
+from schedule_engine import StaffInput, AreaInput, build_weekly_schedule
+from utils import shift_rule_errors
+from week_context import WEEKDAYS, day_names, days_mask, week_of
+
+MONDAY = date(2026, 11, 2)
+WATCHED = ('strftime', 'strptime', 'index', 'loads')
+AREAS = [AreaInput(1, 'Admitting', 2), AreaInput(2, 'Recovery', 2), AreaInput(3, 'Scope Room')] + [
+    AreaInput(4 + i, f'Procedure Room {i + 1}') for i in range(4)
+]
+
+
+def make_roster(size):
+    roles = ('RN', 'RN', 'GI_Tech', 'GI_Tech', 'Scope_Tech')
+    return [
+        StaffInput(i, f'Staff {i:04d}', roles[i % len(roles)], 10, 4 if i % 3 else 5, None, False,
+                   json.dumps([WEEKDAYS[i % 5]]) if i % 7 == 0 else None,
+                   json.dumps([WEEKDAYS[(i + 1) % 5], WEEKDAYS[(i + 3) % 5]]) if i % 2 else None)
+        for i in range(size)
+    ]
+
+
+def validate_week(roster, shifts, rules):
+    """Check every generated shift against the rest of its staff member's week, as a batch edit would."""
+    staff = {s.id: SimpleNamespace(**{f: getattr(s, f) for f in s.__slots__}, area_restrictions=None)
+             for s in roster}
+    areas = {a.id: a for a in AREAS}
+    week = week_of(MONDAY)
+    dates = dict(zip(week.iso, week.dates))
+    rows = [SimpleNamespace(staff_id=sh['staff_id'], area_id=sh['area_id'], date=dates[sh['date']],
+                            start_time=time(7, 0), end_time=time(17, 0))
+            for sh in shifts]
+    by_staff = {}
+    for row in rows:
+        by_staff.setdefault(row.staff_id, []).append(row)
+    errors = 0
+    for row in rows:
+        others = [o for o in by_staff[row.staff_id] if o is not row]
+        errors += len(shift_rule_errors(staff[row.staff_id], areas[row.area_id], row.date, row.start_time,
+                                        row.end_time, others, False, rules=rules, week=week))
+    return errors
+
+
+def watched_calls(fn, *args):
+    # Start cold, so the counts include the one json.loads per distinct day list
+    day_names.cache_clear()
+    days_mask.cache_clear()
+    profiler = cProfile.Profile()
+    profiler.runcall(fn, *args)
+    counts = dict.fromkeys(WATCHED, 0)
+    for (_, _, name), (_, calls, *_) in pstats.Stats(profiler).stats.items():
+        for watched in WATCHED:
+            if name == watched or f"'{watched}'" in name:
+                counts[watched] += calls
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 400], help='Roster sizes')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per size')
+    args = parser.parse_args(argv)
+
+    rules = compile_clinic_rules()
+    profiles = {}
+    for size in args.sizes:
+        roster = make_roster(size)
+        shifts, _ = build_weekly_schedule(MONDAY, roster, AREAS, set(), rules)
+
+        started = timer.perf_counter()
+        for _ in range(args.repeat):
+            build_weekly_schedule(MONDAY, roster, AREAS, set(), rules)
+        generate_ms = (timer.perf_counter() - started) / args.repeat * 1000
+
+        started = timer.perf_counter()
+        for _ in range(args.repeat):
+            validate_week(roster, shifts, rules)
+        validate_ms = (timer.perf_counter() - started) / args.repeat * 1000
+
+        profiles[size] = (watched_calls(build_weekly_schedule, MONDAY, roster, AREAS, set(), rules),
+                          watched_calls(validate_week, roster, shifts, rules))
+        print(f"{size:5d} staff, {len(shifts):5d} shifts: generate {generate_ms:7.2f} ms, "
+              f"validate {validate_ms:7.2f} ms ({validate_ms / max(len(shifts), 1) * 1000:.1f} us/shift)")
+        for label, counts in zip(('generate', 'validate'), profiles[size]):
+            print(f"      {label:8s} " + ', '.join(f"{name} x{n}" for name, n in counts.items()))
+
+    smallest, largest = profiles[min(profiles)], profiles[max(profiles)]
+    grew = [f"{label} {name}" for label, small, large in zip(('generate', 'validate'), smallest, largest)
+            for name in WATCHED if large[name] > small[name]]
+    if grew:
+        print(f"Date formatting/parsing grows with the roster: {', '.join(grew)}", file=sys.stderr)
+        return 1
+    print("Date formatting/parsing calls do not grow with the roster.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
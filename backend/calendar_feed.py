@@ -0,0 +1,192 @@
+"""
+Per-staff iCalendar (.ics) feeds for phone/desktop calendar apps.
+
+Calendar apps poll a subscribed URL every few minutes, with no login, so
+the feed is addressed by a random token (stored hashed, like password reset
+tokens) and is made cheap to poll:
+
+  - one statement resolves the token and fingerprints the staff member's
+    shifts and approved time-off in the feed window (count, sum of row
+    versions, max id -- any insert, edit, delete or approval moves it)
+  - the fingerprint is the ETag, so an unchanged feed is a 304 without
+    rendering anything
+  - rendered feeds are kept in a per-process LRU keyed by staff and
+    fingerprint, so a changed feed is rendered once, not once per poller
+
+The window is limited to CALENDAR_PAST_DAYS back and CALENDAR_FUTURE_DAYS
+ahead of today.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from db import db
+from models import Staff, StaffArea, Shift, TimeOffRequest
+
+
+FEED_PATH = re.compile(r'(/calendar/)[^/?\s]+(\.ics)')
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def redact_feed_token(path):
+    """The token is the feed's only secret, so keep it out of access logs."""
+    return FEED_PATH.sub(r'\1<token>\2', path)
+
+
+class FeedCache:
+    """Thread-safe LRU: staff_id -> (etag, body, last_modified)."""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, staff_id, etag):
+        with self._lock:
+            entry = self._entries.get(staff_id)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(staff_id)
+            return entry
+
+    def put(self, staff_id, entry):
+        with self._lock:
+            self._entries[staff_id] = entry
+            self._entries.move_to_end(staff_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def feed_window(today, past_days, future_days):
+    return today - timedelta(days=past_days), today + timedelta(days=future_days)
+
+
+def lookup_feed(token, start, end):
+    """
+    (staff_id, staff_name, clinic_id, etag) for a feed token, or None.
+    The ETag changes whenever a shift or approved time-off in [start, end]
+    does, or an area those shifts are in is renamed (the feed prints its name).
+    """
+    shift_stats = select(
+        func.count(Shift.id), func.coalesce(func.sum(Shift.version), 0), func.coalesce(func.max(Shift.id), 0)
+    ).where(
+        Shift.staff_id == Staff.id,
+        Shift.date.between(start, end)
+    )
+    time_off_stats = select(
+        func.count(TimeOffRequest.id), func.coalesce(func.sum(TimeOffRequest.version), 0),
+        func.coalesce(func.max(TimeOffRequest.id), 0)
+    ).where(
+        TimeOffRequest.staff_id == Staff.id,
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(start, end)
+    )
+    columns = [Staff.id, Staff.name, Staff.clinic_id]
+    for stats in (shift_stats, time_off_stats):
+        columns += [stats.with_only_columns(c).scalar_subquery() for c in stats.selected_columns]
+
+    row = db.session.execute(
+        select(*columns).where(Staff.calendar_token_hash == hash_token(token), Staff.is_active.is_(True))
+    ).first()
+    if row is None:
+        return None
+    area_names = db.session.scalars(
+        select(StaffArea.name).distinct().join(Shift, Shift.area_id == StaffArea.id).where(
+            Shift.staff_id == row.id,
+            Shift.date.between(start, end)
+        )
+    )
+    fingerprint = ':'.join([str(v) for v in row[3:]] + sorted(area_names))
+    digest = hashlib.sha1(f'{row.id}:{row.name}:{start}:{fingerprint}'.encode()).hexdigest()[:20]
+    return row.id, row.name, row.clinic_id, digest
+
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    """RFC 5545 lines are at most 75 octets; continuation lines start with a space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current = [], b''
+    for char in line:
+        size = len(char.encode('utf-8'))
+        if len(current) + size > (75 if not parts else 74):
+            parts.append(current.decode('utf-8'))
+            current = b''
+        current += char.encode('utf-8')
+    parts.append(current.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def render_ics(staff_name, clinic_id, shifts, time_off, stamp):
+    """
+    shifts: (id, date, start_time, end_time, area_name);
+    time_off: (id, start_date, end_date, request_type).
+    Times are floating (the clinic's local time), which is what calendar apps
+    show as-is on the device.
+    """
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Medical Office Scheduler//Staff Schedule//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(staff_name)} - Work schedule',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        'X-PUBLISHED-TTL:PT1H',
+    ]
+    for shift_id, day, start_time, end_time, area_name in shifts:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:shift-{shift_id}@clinic-{clinic_id}.scheduler',
+            f'DTSTAMP:{dtstamp}',
+            f"DTSTART:{datetime.combine(day, start_time).strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND:{datetime.combine(day, end_time).strftime('%Y%m%dT%H%M%S')}",
+            f'SUMMARY:{_escape(area_name)} shift',
+            f'LOCATION:{_escape(area_name)}',
+            'END:VEVENT',
+        ]
+    for request_id, first, last, request_type in time_off:
+        label = 'Day off' if request_type == 'day_off' else 'PTO'
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:time-off-{request_id}@clinic-{clinic_id}.scheduler',
+            f'DTSTAMP:{dtstamp}',
+            f"DTSTART;VALUE=DATE:{first.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(last + timedelta(days=1)).strftime('%Y%m%d')}",
+            f'SUMMARY:{label}',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def build_feed(staff_id, staff_name, clinic_id, start, end, stamp):
+    """Render the feed for the window (two small indexed queries)."""
+    shifts = db.session.query(
+        Shift.id, Shift.date, Shift.start_time, Shift.end_time, StaffArea.name
+    ).join(StaffArea, StaffArea.id == Shift.area_id).filter(
+        Shift.staff_id == staff_id,
+        Shift.date.between(start, end)
+    ).order_by(Shift.date).all()
+    time_off = db.session.query(
+        TimeOffRequest.id, TimeOffRequest.start_date, TimeOffRequest.end_date, TimeOffRequest.request_type
+    ).filter(
+        TimeOffRequest.staff_id == staff_id,
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(start, end)
+    ).order_by(TimeOffRequest.start_date).all()
+    return render_ics(staff_name, clinic_id, shifts, time_off, stamp)
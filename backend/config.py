@@ -58,6 +58,43 @@ class Config:
     CLINIC_INVITE_CODE = os.getenv('CLINIC_INVITE_CODE', 'CLINIC2024')
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
+    # Auth rate limiting (sliding window, checked before any hashing/DB work)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL')  # e.g. redis://redis:6379/0
+    AUTH_RATE_LIMIT_WINDOW = 60          # seconds
+    AUTH_RATE_LIMIT_PER_IP = 20          # auth requests per IP per window
+    AUTH_RATE_LIMIT_PER_EMAIL = 5        # auth requests per email per window
+    LOGIN_LOCKOUT_THRESHOLD = 10         # failed logins per email before lockout
+    LOGIN_LOCKOUT_WINDOW = 900           # seconds
+
+    # AI suggestion retention
+    AI_SUGGESTION_KEEP_PER_WEEK = 10     # unaccepted suggestions kept per clinic/week
+    AI_SUGGESTION_RETENTION_DAYS = 90    # drop unaccepted suggestions for weeks older than this
+
+    # Idempotency-Key replay for retried POSTs
+    IDEMPOTENCY_TTL = 86400              # seconds a stored response can be replayed
+    IDEMPOTENCY_CACHE_SIZE = 2048        # per-process LRU in front of the idempotency_key table
+    IDEMPOTENCY_LEASE = 180              # seconds before an unfinished claim can be retaken (> gunicorn --timeout)
+
+    # Live updates (/events Server-Sent Events)
+    EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL')  # share events between gunicorn workers
+    EVENTS_HEARTBEAT_SECONDS = 15        # idle keep-alive comment interval
+    EVENTS_STREAM_MAX_SECONDS = 900      # streams close after this; EventSource reconnects
+    EVENTS_QUEUE_SIZE = 256              # per-stream buffer; a client that falls further behind resyncs
+    EVENTS_REPLAY_SIZE = 256             # recent events per clinic kept for Last-Event-ID replay
+    EVENTS_MAX_STREAMS = 8               # open streams per worker; each holds one of its 32 threads
+
+    # Per-staff iCalendar feeds (/calendar/<token>.ics)
+    CALENDAR_PAST_DAYS = 30              # feed covers today-30 ...
+    CALENDAR_FUTURE_DAYS = 180           # ... through today+180
+    CALENDAR_CACHE_SIZE = 4096           # rendered feeds kept per process
+
+    # What-if simulations (/simulate): worker processes per app process; 0 runs scenarios inline
+    SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS', '2'))
+
+    # Number of reverse proxies (nginx) in front of the app; used to trust X-Forwarded-For
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
     # SQLAlchemy Connection Pooling (important for production)
 
     SQLALCHEMY_ENGINE_OPTIONS = {
@@ -78,4 +78,56 @@ def sample_staff(app, _db, sample_areas):
         
         staff_ids = [s.id for s in staff_members]
         _db.session.expunge_all()
-        return staff_ids
\ No newline at end of file
+        return staff_ids
+
+
+def make_staff(id=1, name='Test RN', **overrides):
+    """A Staff stand-in for the pure (no database) rule and report tests."""
+    from types import SimpleNamespace
+
+    fields = dict(id=id, name=name, role='RN', shift_length=10, days_per_week=4,
+                  required_days_off=None, flexible_days_off=None, is_per_diem=False,
+                  is_active=True, area_restrictions='["Any"]')
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+@pytest.fixture
+def clinic_admin(app, _db):
+    """A clinic with areas, staff and a nurse_admin; .headers carry the admin's access token."""
+    from types import SimpleNamespace
+    from flask_jwt_extended import create_access_token
+    from models import Clinic, User
+
+    clinic = Clinic(name='Test Clinic', invite_code='TEST-CLINIC')
+    _db.session.add(clinic)
+    _db.session.flush()
+    areas = [
+        StaffArea(name='Admitting', required_rn_count=2, clinic_id=clinic.id),
+        StaffArea(name='Recovery', required_rn_count=2, clinic_id=clinic.id),
+        StaffArea(name='Procedure Room 1', required_tech_count=2, clinic_id=clinic.id),
+    ]
+    staff = [
+        Staff(name='Ann', role='RN', shift_length=10, days_per_week=4, clinic_id=clinic.id,
+              is_active=True, area_restrictions='["Any"]'),
+        Staff(name='Bea', role='RN', shift_length=10, days_per_week=4, clinic_id=clinic.id,
+              is_active=True, area_restrictions='["Any"]'),
+        Staff(name='Tom', role='GI_Tech', shift_length=8, days_per_week=5, clinic_id=clinic.id,
+              is_active=True, area_restrictions='["Any"]'),
+    ]
+    _db.session.add_all(areas + staff)
+    _db.session.flush()
+    admin = User(username='admin', email='admin@test.example', role='nurse_admin',
+                 clinic_id=clinic.id, staff_id=staff[0].id)
+    admin.set_password('password1')
+    _db.session.add(admin)
+    _db.session.commit()
+
+    token = create_access_token(identity=str(admin.id),
+                                additional_claims={'role': admin.role, 'clinic_id': clinic.id})
+    return SimpleNamespace(
+        clinic_id=clinic.id,
+        user_id=admin.id,
+        headers={'Authorization': f'Bearer {token}'},
+        area_ids=[a.id for a in areas],
+        staff_ids=[s.id for s in staff],
+    )
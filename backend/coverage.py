@@ -0,0 +1,170 @@
+"""
+Materialized per-day coverage.
+
+coverage_daily holds one row per (area, date) that has had shifts: role
+counts, the covered flag and the warnings.  Write paths call
+refresh_coverage() for the area-days they touched, inside their own
+transaction, so the coverage endpoints read indexed rows instead of
+recounting shifts.  The migration that creates the table backfills it from
+existing shifts, so an area-day without a row has nobody scheduled.
+
+Rebuild from scratch with:  python rebuild_coverage.py
+"""
+
+import json
+from datetime import timedelta
+from sqlalchemy import tuple_
+from db import db
+from models import Shift, Staff, StaffArea, CoverageDaily
+from rules import area_rules
+
+
+def evaluate_area_coverage(area, rn_count, tech_count, scope_tech_count):
+    """Apply the area's staffing rules to role counts. Returns (is_covered, warnings)."""
+    warnings = area_rules(area).warnings({'RN': rn_count, 'GI_Tech': tech_count, 'Scope_Tech': scope_tech_count})
+    return not warnings, warnings
+
+
+def _role_counts(clinic_id, area_dates=None, start=None, end=None, exclude_shift_ids=()):
+    """{(area_id, date): {role: count}} from one grouped query."""
+    query = db.session.query(
+        Shift.area_id, Shift.date, Staff.role, db.func.count(Shift.id)
+    ).join(Staff, Shift.staff_id == Staff.id).filter(Shift.clinic_id == clinic_id)
+    if area_dates is not None:
+        query = query.filter(tuple_(Shift.area_id, Shift.date).in_(list(area_dates)))
+    if start is not None:
+        query = query.filter(Shift.date >= start)
+    if end is not None:
+        query = query.filter(Shift.date <= end)
+    if exclude_shift_ids:
+        query = query.filter(Shift.id.notin_(list(exclude_shift_ids)))
+
+    counts = {}
+    for area_id, day, role, n in query.group_by(Shift.area_id, Shift.date, Staff.role):
+        counts.setdefault((area_id, day), {})[role] = n
+    return counts
+
+
+def _evaluate(area, by_role):
+    rn_count = by_role.get('RN', 0)
+    tech_count = by_role.get('GI_Tech', 0)
+    scope_tech_count = by_role.get('Scope_Tech', 0)
+    is_covered, warnings = evaluate_area_coverage(area, rn_count, tech_count, scope_tech_count)
+    return {
+        'rn_count': rn_count,
+        'tech_count': tech_count,
+        'scope_tech_count': scope_tech_count,
+        'is_covered': is_covered,
+        'warnings': warnings
+    }
+
+
+def coverage_for_area_days(clinic_id, area_dates, exclude_shift_ids=()):
+    """
+    Coverage for many (area_id, date) pairs with one grouped count query.
+    Shifts in exclude_shift_ids are left out (e.g. shifts about to be removed).
+    """
+    area_dates = set(area_dates)
+    if not area_dates:
+        return []
+
+    counts = _role_counts(clinic_id, area_dates, exclude_shift_ids=exclude_shift_ids)
+    areas = {a.id: a for a in StaffArea.query.filter(
+        StaffArea.id.in_({area_id for area_id, _ in area_dates})
+    )}
+
+    results = []
+    for area_id, day in sorted(area_dates, key=lambda k: (k[1], k[0])):
+        area = areas.get(area_id)
+        if not area:
+            continue
+        results.append(dict(
+            _evaluate(area, counts.get((area_id, day), {})),
+            area_id=area_id, area_name=area.name, date=day.strftime('%Y-%m-%d')
+        ))
+    return results
+
+
+def _store(row, clinic_id, area_id, day, values):
+    if row is None:
+        row = CoverageDaily(clinic_id=clinic_id, area_id=area_id, date=day)
+        db.session.add(row)
+    row.rn_count = values['rn_count']
+    row.tech_count = values['tech_count']
+    row.scope_tech_count = values['scope_tech_count']
+    row.is_covered = values['is_covered']
+    row.warnings = json.dumps(values['warnings'])
+    return row
+
+
+def refresh_coverage(clinic_id, area_dates):
+    """
+    Recompute coverage_daily for the given (area_id, date) pairs in the
+    caller's transaction.  Call after the shift changes have been added to
+    the session; the caller commits.
+    """
+    area_dates = {(area_id, day) for area_id, day in area_dates}
+    if not area_dates:
+        return []
+
+    db.session.flush()
+    counts = _role_counts(clinic_id, area_dates)
+    areas = {a.id: a for a in StaffArea.query.filter(
+        StaffArea.id.in_({area_id for area_id, _ in area_dates})
+    )}
+    existing = {
+        (row.area_id, row.date): row for row in CoverageDaily.query.filter(
+            tuple_(CoverageDaily.area_id, CoverageDaily.date).in_(list(area_dates))
+        )
+    }
+
+    rows = []
+    for area_id, day in area_dates:
+        area = areas.get(area_id)
+        if area:
+            rows.append(_store(existing.get((area_id, day)), clinic_id, area_id, day,
+                               _evaluate(area, counts.get((area_id, day), {}))))
+    return rows
+
+
+def rebuild_coverage(clinic_id, start=None, end=None):
+    """Drop and recompute coverage_daily for a clinic (optionally a date range)."""
+    delete_query = CoverageDaily.query.filter(CoverageDaily.clinic_id == clinic_id)
+    if start is not None:
+        delete_query = delete_query.filter(CoverageDaily.date >= start)
+    if end is not None:
+        delete_query = delete_query.filter(CoverageDaily.date <= end)
+    delete_query.delete(synchronize_session=False)
+
+    db.session.flush()
+    counts = _role_counts(clinic_id, start=start, end=end)
+    areas = {a.id: a for a in StaffArea.query.filter_by(clinic_id=clinic_id)}
+    for (area_id, day), by_role in counts.items():
+        area = areas.get(area_id)
+        if area:
+            _store(None, clinic_id, area_id, day, _evaluate(area, by_role))
+    return len(counts)
+
+
+def coverage_summary(clinic_id, start, end):
+    """Every area x day in [start, end] from coverage_daily; no shift scans."""
+    areas = StaffArea.query.filter_by(clinic_id=clinic_id).order_by(StaffArea.id).all()
+    rows = {
+        (row.area_id, row.date): row for row in CoverageDaily.query.filter(
+            CoverageDaily.clinic_id == clinic_id,
+            CoverageDaily.date >= start,
+            CoverageDaily.date <= end
+        )
+    }
+
+    summary = []
+    day = start
+    while day <= end:
+        date_str = day.strftime('%Y-%m-%d')
+        for area in areas:
+            row = rows.get((area.id, day))
+            values = row.to_dict() if row else dict(_evaluate(area, {}), area_id=area.id, date=date_str)
+            values['area_name'] = area.name
+            summary.append(values)
+        day += timedelta(days=1)
+    return summary
@@ -0,0 +1,224 @@
+"""
+Per-clinic pub/sub behind the /events Server-Sent Events stream.
+
+Write routes publish small delta events (a changed shift, time-off request
+or coverage rows) after they commit; every open stream for that clinic
+gets a copy and the client patches its local state instead of refetching.
+
+Delivery policy:
+  - each subscriber has a bounded queue; a client that falls behind is not
+    allowed to grow memory -- it is marked overflowed, sent a "resync"
+    event and disconnected, and reloads once when it reconnects
+  - the last few events per clinic are kept so a reconnect carrying
+    Last-Event-ID can be replayed; if that id is gone the client resyncs
+  - the stream sends a heartbeat comment when idle and closes after a
+    maximum lifetime so proxies don't hold dead connections and the JWT is
+    re-checked on reconnect
+  - each open stream holds a worker thread, so a worker takes at most
+    max_streams of them; past that subscribe() refuses and the client is
+    told to retry later, leaving threads for ordinary API requests
+
+The default broker is per-process.  Set EVENTS_REDIS_URL to fan events out
+between gunicorn workers through Redis pub/sub.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One open stream."""
+
+    def __init__(self, clinic_id, queue_size):
+        self.clinic_id = clinic_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+        self.replay = []
+        self.needs_resync = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: stop buffering for it and make it resync
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """In-process fan-out of clinic events to open streams."""
+
+    def __init__(self, queue_size=256, replay_size=256, max_streams=None):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.max_streams = max_streams
+        self._subscribers = {}  # clinic_id -> set of Subscription
+        self._recent = {}       # clinic_id -> deque of recent events
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._prefix = f"{os.getpid()}"
+
+    def _next_id(self):
+        return f"{int(time.time() * 1000)}-{self._prefix}-{next(self._counter)}"
+
+    def publish(self, clinic_id, event_type, data):
+        """Queue an event for every stream of the clinic. Never raises."""
+        if clinic_id is None:
+            return
+        event = {'id': self._next_id(), 'type': event_type, 'data': data}
+        try:
+            self._send(clinic_id, event)
+        except Exception as e:
+            logger.warning("Dropping %s event for clinic %s: %s", event_type, clinic_id, e)
+
+    def _send(self, clinic_id, event):
+        self._deliver(clinic_id, event)
+
+    def _deliver(self, clinic_id, event):
+        with self._lock:
+            recent = self._recent.get(clinic_id)
+            if recent is None:
+                recent = self._recent[clinic_id] = deque(maxlen=self.replay_size)
+            recent.append(event)
+            subscribers = list(self._subscribers.get(clinic_id, ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def subscribe(self, clinic_id, last_event_id=None):
+        """A new Subscription, or None if this worker already has max_streams open."""
+        subscription = Subscription(clinic_id, self.queue_size)
+        with self._lock:
+            if self.max_streams is not None and \
+                    sum(len(s) for s in self._subscribers.values()) >= self.max_streams:
+                return None
+            self._subscribers.setdefault(clinic_id, set()).add(subscription)
+            if last_event_id:
+                recent = list(self._recent.get(clinic_id, ()))
+                ids = [event['id'] for event in recent]
+                if last_event_id in ids:
+                    subscription.replay = recent[ids.index(last_event_id) + 1:]
+                else:
+                    subscription.needs_resync = True
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.clinic_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.clinic_id]
+
+    def subscriber_count(self, clinic_id=None):
+        with self._lock:
+            if clinic_id is not None:
+                return len(self._subscribers.get(clinic_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class RedisEventBroker(EventBroker):
+    """Publishes through Redis; a listener thread per worker delivers locally."""
+
+    CHANNEL_PREFIX = 'events:'
+
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def _send(self, clinic_id, event):
+        self._ensure_listener()
+        try:
+            self.client.publish(f"{self.CHANNEL_PREFIX}{clinic_id}", json.dumps(event))
+        except Exception as e:
+            logger.warning("Redis publish failed (%s) -- delivering to this worker only", e)
+            self._deliver(clinic_id, event)
+
+    def subscribe(self, clinic_id, last_event_id=None):
+        self._ensure_listener()
+        return super().subscribe(clinic_id, last_event_id)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='events-redis', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    clinic_id = int(channel[len(self.CHANNEL_PREFIX):])
+                    self._deliver(clinic_id, json.loads(message['data']))
+            except Exception as e:
+                logger.warning("Redis event listener error (%s); reconnecting", e)
+                time.sleep(1)
+
+
+def create_broker(url=None, queue_size=256, replay_size=256, max_streams=None):
+    """
+    Build a broker from EVENTS_REDIS_URL; falls back to in-process, which
+    only reaches subscribers of the same worker, so it is logged as an
+    error whenever the server runs more than one (WEB_CONCURRENCY > 1).
+    """
+    if url and url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+            return RedisEventBroker(redis.Redis.from_url(url), queue_size=queue_size,
+                                    replay_size=replay_size, max_streams=max_streams)
+        except Exception as e:
+            logger.error("Redis event broker unavailable (%s) -- /events only sees this worker's changes", e)
+    elif int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+        logger.error("EVENTS_REDIS_URL is not set but %s workers are running -- "
+                     "/events only sees each worker's own changes", os.getenv('WEB_CONCURRENCY'))
+    return EventBroker(queue_size=queue_size, replay_size=replay_size, max_streams=max_streams)
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def stream(subscription, broker, heartbeat=15, max_seconds=900, clock=time.monotonic):
+    """Generator of SSE text for one subscription; unsubscribes when closed."""
+    deadline = clock() + max_seconds
+    try:
+        yield "retry: 5000\n\n"
+        if subscription.needs_resync:
+            yield "event: resync\ndata: {}\n\n"
+            return
+        for event in subscription.replay:
+            yield format_sse(event)
+
+        while clock() < deadline:
+            event = subscription.get(timeout=min(heartbeat, max(0.0, deadline - clock())))
+            if subscription.overflowed:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
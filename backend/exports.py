@@ -0,0 +1,137 @@
+"""
+Payroll exports of shifts (and approved time-off days) for a date range.
+
+Rows come from one Shift-Staff-StaffArea join read through a server-side
+cursor (stream_results + yield_per), and are written out in chunks as
+they arrive, so memory stays flat however many years are exported.  The
+CSV can be gzip-compressed on the fly.  XLSX needs the optional openpyxl
+package; it is built in write-only mode into a temporary file (a zip
+can't be streamed before it is complete) and then sent from disk.
+"""
+
+import csv
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from db import db
+from models import Staff, StaffArea, Shift, TimeOffRequest
+
+COLUMNS = ['date', 'weekday', 'staff_id', 'staff_name', 'role', 'per_diem',
+           'area', 'start_time', 'end_time', 'hours', 'type']
+FETCH_SIZE = 1000
+CHUNK_ROWS = 500
+
+
+def shift_rows(clinic_id, start, end):
+    """Shift rows for the export, read with a server-side cursor."""
+    stmt = select(
+        Shift.date, Shift.staff_id, Staff.name, Staff.role, Staff.is_per_diem,
+        StaffArea.name, Shift.start_time, Shift.end_time
+    ).join(
+        Staff, Staff.id == Shift.staff_id
+    ).join(
+        StaffArea, StaffArea.id == Shift.area_id
+    ).where(
+        Shift.clinic_id == clinic_id,
+        Shift.date.between(start, end)
+    ).order_by(Shift.date, Staff.name).execution_options(stream_results=True, yield_per=FETCH_SIZE)
+
+    for day, staff_id, name, role, per_diem, area, start_time, end_time in db.session.execute(stmt):
+        hours = (datetime.combine(day, end_time) - datetime.combine(day, start_time)).total_seconds() / 3600
+        yield [day.isoformat(), day.strftime('%A'), staff_id, name, role, 'yes' if per_diem else 'no',
+               area, start_time.strftime('%H:%M'), end_time.strftime('%H:%M'), f'{hours:g}', 'shift']
+
+
+def time_off_rows(clinic_id, start, end):
+    """One row per approved time-off weekday inside the range; `type` is pto or day_off."""
+    stmt = select(
+        TimeOffRequest.start_date, TimeOffRequest.end_date, TimeOffRequest.request_type,
+        TimeOffRequest.staff_id, Staff.name, Staff.role, Staff.is_per_diem
+    ).join(
+        Staff, Staff.id == TimeOffRequest.staff_id
+    ).where(
+        TimeOffRequest.clinic_id == clinic_id,
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(start, end)
+    ).order_by(TimeOffRequest.start_date, Staff.name).execution_options(
+        stream_results=True, yield_per=FETCH_SIZE
+    )
+
+    for first, last, request_type, staff_id, name, role, per_diem in db.session.execute(stmt):
+        day, last = max(first, start), min(last, end)
+        while day <= last:
+            if day.weekday() < 5:
+                yield [day.isoformat(), day.strftime('%A'), staff_id, name, role,
+                       'yes' if per_diem else 'no', '', '', '', '', request_type or 'pto']
+            day += timedelta(days=1)
+
+
+def export_rows(clinic_id, start, end):
+    yield from shift_rows(clinic_id, start, end)
+    yield from time_off_rows(clinic_id, start, end)
+
+
+class _LineBuffer:
+    """csv.writer target that just collects what was written."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def take(self):
+        data, self.parts = ''.join(self.parts), []
+        return data
+
+
+def csv_chunks(rows, compress=False):
+    """Encoded CSV (header first) in chunks of CHUNK_ROWS rows, optionally gzip-compressed."""
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    # wbits=31: gzip container rather than a bare zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(COLUMNS)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            chunk = emit(buffer.take())
+            pending = 0
+            if chunk:
+                yield chunk
+    chunk = emit(buffer.take())
+    if chunk:
+        yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def build_xlsx(rows):
+    """
+    Write the rows to a temporary .xlsx and return the open file, rewound.
+    Raises ImportError if openpyxl is not installed.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Shifts')
+    sheet.append(COLUMNS)
+    for row in rows:
+        if row[9]:
+            row[9] = float(row[9])
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
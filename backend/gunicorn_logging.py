@@ -0,0 +1,20 @@
+"""
+Gunicorn access-log support (--logger-class gunicorn_logging.RedactingLogger).
+
+Calendar feeds are addressed by a secret token in the path
+(/calendar/<token>.ics), so the path atoms are masked before they are
+written to the access log.
+"""
+
+from gunicorn.glogging import Logger
+
+from calendar_feed import redact_feed_token
+
+
+class RedactingLogger(Logger):
+    def atoms(self, resp, req, environ, request_time):
+        atoms = super().atoms(resp, req, environ, request_time)
+        for key in ('U', 'r'):
+            if key in atoms:
+                atoms[key] = redact_feed_token(atoms[key])
+        return atoms
@@ -0,0 +1,187 @@
+"""
+Idempotency-Key support for POST endpoints that create rows.
+
+A client that may retry (mobile, flaky Wi-Fi) sends a unique
+Idempotency-Key header.  The first request claims (user, key) by inserting
+a placeholder row, runs the handler and stores the response; any retry with
+the same key is answered from the stored response without running the
+handler again.  Completed responses are also kept in a per-process LRU so
+most replays never touch the database.
+
+  - same key, different body      -> 422
+  - same key while first running  -> 409 (retry shortly)
+  - handler fails with 5xx        -> key released, a retry runs normally
+  - worker killed mid-request     -> the placeholder is retaken once it is
+                                     older than IDEMPOTENCY_LEASE
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+from models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class ResponseCache:
+    """Small thread-safe LRU of completed responses: (user_id, key) -> entry."""
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key, now):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[3] <= now:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, cache_key, entry):
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_cache = None
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(current_app.config.get('IDEMPOTENCY_CACHE_SIZE', 2048))
+    return _cache
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(status_code, body):
+    response = Response(body, status=status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _mismatch():
+    return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+
+
+def _claim(user_id, key, request_hash, now, expires_at, lease_start):
+    """Insert the placeholder row. Returns None if claimed, else the existing row."""
+    for _ in range(2):
+        # Opportunistically clear this user's expired keys, and placeholders whose
+        # request never finished (claimed before lease_start: the worker died)
+        IdempotencyKey.query.filter(
+            IdempotencyKey.user_id == user_id,
+            db.or_(
+                IdempotencyKey.expires_at <= now,
+                db.and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at <= lease_start)
+            )
+        ).delete(synchronize_session=False)
+        db.session.add(IdempotencyKey(
+            user_id=user_id, key=key, request_hash=request_hash, created_at=now, expires_at=expires_at
+        ))
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if existing is not None:
+            return existing
+        # The conflicting row expired and was cleared between our insert and read
+    return None
+
+
+def _release(user_id, key):
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(user_id=user_id, key=key).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent(f):
+    """
+    Replay the stored response for retried requests carrying an Idempotency-Key.
+    Place below @jwt_required(); requests without the header run as usual.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if request.method == 'OPTIONS' or not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        identity = get_jwt_identity()
+        if identity is None:
+            return f(*args, **kwargs)
+        user_id = int(identity)
+
+        now = datetime.utcnow()
+        request_hash = _fingerprint()
+        cache = _get_cache()
+        cache_key = (user_id, key)
+
+        cached = cache.get(cache_key, now)
+        if cached is not None:
+            if cached[0] != request_hash:
+                return _mismatch()
+            return _replay(cached[1], cached[2])
+
+        expires_at = now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', 86400))
+        lease_start = now - timedelta(seconds=current_app.config.get('IDEMPOTENCY_LEASE', 180))
+        existing = _claim(user_id, key, request_hash, now, expires_at, lease_start)
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                return _mismatch()
+            if existing.status_code is None:
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            cache.put(cache_key, (existing.request_hash, existing.status_code,
+                                  existing.response_body, existing.expires_at))
+            return _replay(existing.status_code, existing.response_body)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(user_id, key)
+            raise
+
+        # Server errors and throttling are transient -- let a retry run again
+        if response.status_code >= 500 or response.status_code == 429:
+            _release(user_id, key)
+            return response
+
+        body = response.get_data(as_text=True)
+        db.session.rollback()  # the handler has committed or discarded its own work
+        IdempotencyKey.query.filter_by(user_id=user_id, key=key).update(
+            {'status_code': response.status_code, 'response_body': body},
+            synchronize_session=False
+        )
+        db.session.commit()
+        cache.put(cache_key, (request_hash, response.status_code, body, expires_at))
+        return response
+
+    return decorated
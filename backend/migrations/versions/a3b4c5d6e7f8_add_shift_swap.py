@@ -0,0 +1,44 @@
+"""Add shift_swap for the shift-swap marketplace
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a3b4c5d6e7f8'
+down_revision = 'f2a3b4c5d6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'shift_swap',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clinic_id', sa.Integer(), nullable=False),
+        sa.Column('shift_id', sa.Integer(), nullable=False),
+        sa.Column('requested_by_staff_id', sa.Integer(), nullable=False),
+        sa.Column('taker_staff_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('note', sa.String(length=200), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('decided_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['clinic_id'], ['clinic.id']),
+        sa.ForeignKeyConstraint(['shift_id'], ['shift.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['requested_by_staff_id'], ['staff.id']),
+        sa.ForeignKeyConstraint(['taker_staff_id'], ['staff.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_swap_clinic_status', 'shift_swap', ['clinic_id', 'status'])
+    op.create_index('uq_swap_active_shift', 'shift_swap', ['shift_id'], unique=True,
+                    postgresql_where=sa.text("status IN ('open', 'claimed')"))
+
+
+def downgrade():
+    op.drop_index('uq_swap_active_shift', table_name='shift_swap')
+    op.drop_index('idx_swap_clinic_status', table_name='shift_swap')
+    op.drop_table('shift_swap')
@@ -0,0 +1,60 @@
+"""Enforce one shift per staff member per day
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.env')
+
+
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f6a7b8c9d0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # NULLs never collide in a unique constraint, so give legacy rows their
+    # staff member's clinic first; any still NULL are reported below.
+    op.execute("""
+        UPDATE shift SET clinic_id = staff.clinic_id
+        FROM staff
+        WHERE shift.staff_id = staff.id
+          AND shift.clinic_id IS NULL
+          AND staff.clinic_id IS NOT NULL
+    """)
+
+    # Duplicates that slipped past the old read-then-write check are schedule
+    # (and payroll) data, so refuse to pick a winner here: list them and stop.
+    duplicates = bind.execute(sa.text("""
+        SELECT clinic_id, staff_id, date, string_agg(id::text, ', ' ORDER BY id)
+        FROM shift
+        GROUP BY clinic_id, staff_id, date
+        HAVING COUNT(*) > 1
+        ORDER BY clinic_id, date, staff_id
+    """)).fetchall()
+    if duplicates:
+        listing = '\n'.join(f"  clinic {clinic_id}, staff {staff_id}, {day}: shifts {ids}"
+                             for clinic_id, staff_id, day, ids in duplicates)
+        raise RuntimeError(
+            f"{len(duplicates)} staff/day pairs have more than one shift. Delete or move the extras, "
+            f"then re-run the upgrade:\n{listing}"
+        )
+
+    unowned = bind.execute(sa.text("SELECT COUNT(*) FROM shift WHERE clinic_id IS NULL")).scalar()
+    if unowned:
+        logger.warning("%s shifts have no clinic_id and are not covered by uq_shift_clinic_staff_date",
+                       unowned)
+    op.create_unique_constraint('uq_shift_clinic_staff_date', 'shift', ['clinic_id', 'staff_id', 'date'])
+
+
+def downgrade():
+    op.drop_constraint('uq_shift_clinic_staff_date', 'shift', type_='unique')
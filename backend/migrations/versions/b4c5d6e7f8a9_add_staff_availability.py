@@ -0,0 +1,37 @@
+"""Add staff_availability month bitsets for per-diem staff
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b4c5d6e7f8a9'
+down_revision = 'a3b4c5d6e7f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'staff_availability',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clinic_id', sa.Integer(), nullable=False),
+        sa.Column('staff_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('days', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['clinic_id'], ['clinic.id']),
+        sa.ForeignKeyConstraint(['staff_id'], ['staff.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('staff_id', 'month', name='uq_availability_staff_month')
+    )
+    op.create_index('idx_availability_clinic_month', 'staff_availability', ['clinic_id', 'month'])
+
+
+def downgrade():
+    op.drop_index('idx_availability_clinic_month', table_name='staff_availability')
+    op.drop_table('staff_availability')
@@ -0,0 +1,80 @@
+"""Add coverage_daily summary table
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from alembic import op
+import sqlalchemy as sa
+
+from rules import area_rules
+
+
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    coverage_daily = op.create_table('coverage_daily',
+        sa.Column('id',               sa.Integer(),  nullable=False),
+        sa.Column('clinic_id',        sa.Integer(),  nullable=True),
+        sa.Column('area_id',          sa.Integer(),  nullable=False),
+        sa.Column('date',             sa.Date(),     nullable=False),
+        sa.Column('rn_count',         sa.Integer(),  nullable=False, server_default='0'),
+        sa.Column('tech_count',       sa.Integer(),  nullable=False, server_default='0'),
+        sa.Column('scope_tech_count', sa.Integer(),  nullable=False, server_default='0'),
+        sa.Column('is_covered',       sa.Boolean(),  nullable=False, server_default=sa.false()),
+        sa.Column('warnings',         sa.Text(),     nullable=True),
+        sa.Column('updated_at',       sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['clinic_id'], ['clinic.id']),
+        sa.ForeignKeyConstraint(['area_id'], ['staff_area.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('area_id', 'date', name='uq_coverage_area_date'),
+    )
+    op.create_index('idx_coverage_clinic_date', 'coverage_daily', ['clinic_id', 'date'])
+    _backfill(coverage_daily)
+
+
+def _backfill(coverage_daily):
+    """One row per area-day that has shifts, so existing schedules don't read as uncovered."""
+    bind = op.get_bind()
+    areas = {row.id: row for row in bind.execute(sa.text(
+        "SELECT id, clinic_id, name, required_rn_count, required_tech_count, required_scope_tech_count "
+        "FROM staff_area"
+    ))}
+    counts = {}
+    for area_id, day, role, n in bind.execute(sa.text(
+        "SELECT shift.area_id, shift.date, staff.role, COUNT(*) FROM shift "
+        "JOIN staff ON staff.id = shift.staff_id "
+        "GROUP BY shift.area_id, shift.date, staff.role"
+    ).columns(sa.column('area_id', sa.Integer), sa.column('date', sa.Date),
+              sa.column('role', sa.String), sa.column('n', sa.Integer))):
+        counts.setdefault((area_id, day), {})[role] = n
+
+    now = datetime.utcnow()
+    rows = []
+    for (area_id, day), by_role in counts.items():
+        area = areas.get(area_id)
+        if area is None:
+            continue
+        warnings = area_rules(SimpleNamespace(**area._mapping)).warnings(by_role)
+        rows.append({
+            'clinic_id': area.clinic_id, 'area_id': area_id, 'date': day,
+            'rn_count': by_role.get('RN', 0), 'tech_count': by_role.get('GI_Tech', 0),
+            'scope_tech_count': by_role.get('Scope_Tech', 0),
+            'is_covered': not warnings, 'warnings': json.dumps(warnings), 'updated_at': now,
+        })
+    for i in range(0, len(rows), 1000):
+        op.bulk_insert(coverage_daily, rows[i:i + 1000])
+
+
+def downgrade():
+    op.drop_index('idx_coverage_clinic_date', table_name='coverage_daily')
+    op.drop_table('coverage_daily')
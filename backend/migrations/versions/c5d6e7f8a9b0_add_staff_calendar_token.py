@@ -0,0 +1,25 @@
+"""Add staff.calendar_token_hash for iCalendar feeds
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c5d6e7f8a9b0'
+down_revision = 'b4c5d6e7f8a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('staff', sa.Column('calendar_token_hash', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_staff_calendar_token_hash', 'staff', ['calendar_token_hash'])
+
+
+def downgrade():
+    op.drop_constraint('uq_staff_calendar_token_hash', 'staff', type_='unique')
+    op.drop_column('staff', 'calendar_token_hash')
@@ -0,0 +1,35 @@
+"""Store AI suggestions as compressed snapshots/deltas
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c9d0e1f2a3b4'
+down_revision = 'b8c9d0e1f2a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows keep their JSON in suggested_schedule and are read from there
+    op.add_column('ai_suggestion', sa.Column('schedule_data', sa.LargeBinary(), nullable=True))
+    op.add_column('ai_suggestion', sa.Column('base_suggestion_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_aisugg_base_id', 'ai_suggestion', 'ai_suggestion',
+                          ['base_suggestion_id'], ['id'])
+    op.alter_column('ai_suggestion', 'suggested_schedule', existing_type=sa.Text(), nullable=True)
+    op.create_index('idx_aisugg_clinic_week', 'ai_suggestion', ['clinic_id', 'week_start_date'])
+
+
+def downgrade():
+    op.drop_index('idx_aisugg_clinic_week', table_name='ai_suggestion')
+    # Rows stored only as schedule_data cannot go back to the NOT NULL JSON column
+    op.execute("DELETE FROM ai_suggestion WHERE suggested_schedule IS NULL")
+    op.alter_column('ai_suggestion', 'suggested_schedule', existing_type=sa.Text(), nullable=False)
+    op.drop_constraint('fk_aisugg_base_id', 'ai_suggestion', type_='foreignkey')
+    op.drop_column('ai_suggestion', 'base_suggestion_id')
+    op.drop_column('ai_suggestion', 'schedule_data')
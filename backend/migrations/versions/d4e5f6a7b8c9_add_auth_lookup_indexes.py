@@ -0,0 +1,38 @@
+"""Add auth lookup indexes and hashed reset token
+
+Revision ID: d4e5f6a7b8c9
+Revises: c1d2e3f4a5b6
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd4e5f6a7b8c9'
+down_revision = 'c1d2e3f4a5b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # login and forgot-password search by email across clinics
+    op.create_index('ix_user_email', 'user', ['email'])
+
+    # registration allocates usernames with a single LIKE 'base%' query
+    op.create_index('ix_user_clinic_username_pattern', 'user', ['clinic_id', 'username'],
+                    postgresql_ops={'username': 'varchar_pattern_ops'})
+
+    # Store only a sha256 of the reset token; outstanding plaintext tokens
+    # (valid for 1 hour at most) are dropped and users can request a new link.
+    op.add_column('user', sa.Column('reset_token_hash', sa.String(64), nullable=True))
+    op.create_unique_constraint('uq_user_reset_token_hash', 'user', ['reset_token_hash'])
+    op.drop_column('user', 'reset_token')
+
+
+def downgrade():
+    op.add_column('user', sa.Column('reset_token', sa.String(200), nullable=True))
+    op.drop_constraint('uq_user_reset_token_hash', 'user', type_='unique')
+    op.drop_column('user', 'reset_token_hash')
+    op.drop_index('ix_user_clinic_username_pattern', table_name='user')
+    op.drop_index('ix_user_email', table_name='user')
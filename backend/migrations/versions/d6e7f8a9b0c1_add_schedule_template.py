@@ -0,0 +1,35 @@
+"""Add schedule_template for recurring weekly templates
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd6e7f8a9b0c1'
+down_revision = 'c5d6e7f8a9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'schedule_template',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clinic_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('template_data', sa.LargeBinary(), nullable=False),
+        sa.Column('shift_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['clinic_id'], ['clinic.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('clinic_id', 'name', name='uq_template_clinic_name')
+    )
+
+
+def downgrade():
+    op.drop_table('schedule_template')
@@ -0,0 +1,29 @@
+"""Add GiST daterange index for time-off overlap queries
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist is needed to put clinic_id/staff_id in the same GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.create_index(
+        'ix_tor_clinic_staff_daterange', 'time_off_request',
+        ['clinic_id', 'staff_id', sa.text("daterange(start_date, end_date, '[]')")],
+        postgresql_using='gist'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_tor_clinic_staff_daterange', table_name='time_off_request')
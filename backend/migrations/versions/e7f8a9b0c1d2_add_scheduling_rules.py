@@ -0,0 +1,25 @@
+"""Add clinic.scheduling_rules and staff_area.rules
+
+Revision ID: e7f8a9b0c1d2
+Revises: d6e7f8a9b0c1
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e7f8a9b0c1d2'
+down_revision = 'd6e7f8a9b0c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('clinic', sa.Column('scheduling_rules', sa.Text(), nullable=True))
+    op.add_column('staff_area', sa.Column('rules', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('staff_area', 'rules')
+    op.drop_column('clinic', 'scheduling_rules')
@@ -0,0 +1,28 @@
+"""Make the one-shift-per-day constraint deferrable for batch edits
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f2a3b4c5d6e7'
+down_revision = 'e1f2a3b4c5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Still checked per statement by default; /shifts/batch defers it to commit
+    # so swapping two staff members' days does not trip it halfway through.
+    op.drop_constraint('uq_shift_clinic_staff_date', 'shift', type_='unique')
+    op.create_unique_constraint('uq_shift_clinic_staff_date', 'shift', ['clinic_id', 'staff_id', 'date'],
+                                deferrable=True, initially='IMMEDIATE')
+
+
+def downgrade():
+    op.drop_constraint('uq_shift_clinic_staff_date', 'shift', type_='unique')
+    op.create_unique_constraint('uq_shift_clinic_staff_date', 'shift', ['clinic_id', 'staff_id', 'date'])
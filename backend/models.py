@@ -1,7 +1,9 @@
 from db import db
 from sqlalchemy.orm import validates
-from sqlalchemy import UniqueConstraint
-from datetime import datetime, time
+from sqlalchemy import UniqueConstraint, DDL, event
+from datetime import datetime, time, timedelta
+import hashlib
+import json
 from flask_bcrypt import generate_password_hash, check_password_hash
 
 
@@ -11,6 +13,7 @@ class Clinic(db.Model):
     id          = db.Column(db.Integer, primary_key=True)
     name        = db.Column(db.String(120), nullable=False)
     invite_code = db.Column(db.String(60),  nullable=False, unique=True)
+    scheduling_rules = db.Column(db.Text, nullable=True)  # JSON, see rules.py
     created_at  = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -32,9 +35,14 @@ class Staff(db.Model):
     required_days_off = db.Column(db.String(100), nullable=True)
     flexible_days_off = db.Column(db.String(100), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    calendar_token_hash = db.Column(db.String(64), nullable=True)  # sha256 of the .ics feed token
     shifts = db.relationship('Shift', back_populates='staff_member', cascade='all, delete-orphan')
     time_off_requests = db.relationship('TimeOffRequest', back_populates='staff_member', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        UniqueConstraint('calendar_token_hash', name='uq_staff_calendar_token_hash'),
+    )
+
     @validates('name')
     def validate_name(self, key, value):
         if not value or not value.strip():
@@ -87,6 +95,7 @@ class StaffArea(db.Model):
     required_tech_count = db.Column(db.Integer, default=0)
     required_scope_tech_count = db.Column(db.Integer, default=0)
     special_rules = db.Column(db.Text, nullable=True)
+    rules = db.Column(db.Text, nullable=True)  # JSON staffing requirements, see rules.py
 
     shifts = db.relationship('Shift', back_populates='area', cascade='all, delete-orphan')
 
@@ -108,7 +117,8 @@ class StaffArea(db.Model):
             'required_rn_count': self.required_rn_count,
             'required_tech_count': self.required_tech_count,
             'required_scope_tech_count': self.required_scope_tech_count,
-            'special_rules': self.special_rules
+            'special_rules': self.special_rules,
+            'rules': json.loads(self.rules) if self.rules else None
         }
 
 
@@ -123,14 +133,22 @@ class Shift(db.Model):
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     staff_member = db.relationship('Staff', back_populates='shifts')
     area = db.relationship('StaffArea', back_populates='shifts')
 
+    # ORM updates/deletes become ... WHERE id = :id AND version = :loaded_version
+    __mapper_args__ = {'version_id_col': version}
+
     __table_args__ = (
         db.Index('idx_shift_date_staff', 'date', 'staff_id'),
         db.Index('idx_shift_date_area', 'date', 'area_id'),
         db.Index('idx_shift_clinic_date', 'clinic_id', 'date'),
+        # One shift per staff member per day, enforced atomically by the database.
+        # Deferrable so a batch edit (e.g. a swap) is checked at commit, not per row.
+        UniqueConstraint('clinic_id', 'staff_id', 'date', name='uq_shift_clinic_staff_date',
+                         deferrable=True, initially='IMMEDIATE'),
     )
 
     @validates('date')
@@ -151,7 +169,8 @@ class Shift(db.Model):
             'area_name': self.area.name if self.area else None,
             'date': self.date.strftime('%Y-%m-%d'),
             'start_time': self.start_time.strftime('%H:%M'),
-            'end_time': self.end_time.strftime('%H:%M')
+            'end_time': self.end_time.strftime('%H:%M'),
+            'version': self.version
         }
 
 
@@ -167,9 +186,31 @@ class TimeOffRequest(db.Model):
     status = db.Column(db.String(20), default='pending', index=True)  # 'pending', 'approved', 'denied'
     request_type = db.Column(db.String(20), default='pto')  # 'pto' or 'day_off'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     staff_member = db.relationship('Staff', back_populates='time_off_requests')
 
+    # ORM updates become UPDATE ... WHERE id = :id AND version = :loaded_version
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        # GiST index over the inclusive date range so overlap (&&) queries are
+        # index-assisted instead of combining two independent btree range scans.
+        db.Index('ix_tor_clinic_staff_daterange', 'clinic_id', 'staff_id',
+                 db.text("daterange(start_date, end_date, '[]')"),
+                 postgresql_using='gist').ddl_if(dialect='postgresql'),
+    )
+
+    @classmethod
+    def overlaps(cls, start, end):
+        """SQL predicate: the request covers at least one day in [start, end]."""
+        if db.engine.dialect.name == 'postgresql':
+            inclusive = db.literal_column("'[]'")
+            return db.func.daterange(cls.start_date, cls.end_date, inclusive).op('&&')(
+                db.func.daterange(start, end, inclusive)
+            )
+        return db.and_(cls.start_date <= end, cls.end_date >= start)
+
     @validates('status')
     def validate_status(self, key, value):
         valid_statuses = ['pending', 'approved', 'denied']
@@ -195,7 +236,8 @@ class TimeOffRequest(db.Model):
             'reason': self.reason,
             'status': self.status,
             'request_type': self.request_type,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M')
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M'),
+            'version': self.version
         }
 
 
@@ -205,18 +247,24 @@ class AISuggestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     clinic_id = db.Column(db.Integer, db.ForeignKey('clinic.id'), nullable=True, index=True)
     week_start_date = db.Column(db.Date, nullable=False)
-    suggested_schedule = db.Column(db.Text, nullable=False)
+    suggested_schedule = db.Column(db.Text, nullable=True)  # legacy JSON; new rows use schedule_data
+    schedule_data = db.Column(db.LargeBinary, nullable=True)  # schedule_codec snapshot or delta
+    base_suggestion_id = db.Column(db.Integer, db.ForeignKey('ai_suggestion.id'), nullable=True)
     reasoning = db.Column(db.Text, nullable=True)
     constraints_met = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     accepted = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('idx_aisugg_clinic_week', 'clinic_id', 'week_start_date'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'clinic_id': self.clinic_id,
             'week_start_date': self.week_start_date.strftime('%Y-%m-%d'),
-            'suggested_schedule': self.suggested_schedule,
+            'base_suggestion_id': self.base_suggestion_id,
             'reasoning': self.reasoning,
             'constraints_met': self.constraints_met,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M'),
@@ -224,6 +272,37 @@ class AISuggestion(db.Model):
         }
 
 
+class CoverageDaily(db.Model):
+    __tablename__ = 'coverage_daily'
+
+    id = db.Column(db.Integer, primary_key=True)
+    clinic_id = db.Column(db.Integer, db.ForeignKey('clinic.id'), nullable=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('staff_area.id', ondelete='CASCADE'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    rn_count = db.Column(db.Integer, nullable=False, default=0)
+    tech_count = db.Column(db.Integer, nullable=False, default=0)
+    scope_tech_count = db.Column(db.Integer, nullable=False, default=0)
+    is_covered = db.Column(db.Boolean, nullable=False, default=False)
+    warnings = db.Column(db.Text, nullable=True)  # JSON list of warning strings
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('area_id', 'date', name='uq_coverage_area_date'),
+        db.Index('idx_coverage_clinic_date', 'clinic_id', 'date'),
+    )
+
+    def to_dict(self):
+        return {
+            'area_id': self.area_id,
+            'date': self.date.strftime('%Y-%m-%d'),
+            'rn_count': self.rn_count,
+            'tech_count': self.tech_count,
+            'scope_tech_count': self.scope_tech_count,
+            'is_covered': self.is_covered,
+            'warnings': json.loads(self.warnings) if self.warnings else []
+        }
+
+
 class User(db.Model):
     __tablename__ = 'user'
 
@@ -234,7 +313,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='nurse')  # 'nurse_admin' or 'nurse'
     staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'), nullable=True)
-    reset_token = db.Column(db.String(200), nullable=True)
+    reset_token_hash = db.Column(db.String(64), nullable=True)  # sha256 of the emailed token
     reset_token_expiry = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     staff_member = db.relationship('Staff', foreign_keys=[staff_id])
@@ -242,8 +321,18 @@ class User(db.Model):
     __table_args__ = (
         UniqueConstraint('clinic_id', 'email',    name='uq_user_clinic_email'),
         UniqueConstraint('clinic_id', 'username', name='uq_user_clinic_username'),
+        UniqueConstraint('reset_token_hash', name='uq_user_reset_token_hash'),
+        # login / forgot-password look users up by email across all clinics
+        db.Index('ix_user_email', 'email'),
+        # prefix scans (username LIKE 'base%') during registration
+        db.Index('ix_user_clinic_username_pattern', 'clinic_id', 'username',
+                 postgresql_ops={'username': 'varchar_pattern_ops'}),
     )
 
+    @staticmethod
+    def hash_reset_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password).decode('utf-8')
 
@@ -261,3 +350,132 @@ class User(db.Model):
             'staff_name': self.staff_member.name if self.staff_member else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a POST sent with an Idempotency-Key header"""
+    __tablename__ = 'idempotency_key'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer, nullable=True)       # NULL while the first request is running
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'key', name='uq_idempotency_user_key'),
+        db.Index('idx_idempotency_expires', 'expires_at'),
+    )
+
+
+class ScheduleTemplate(db.Model):
+    """A named recurring week (staff x weekday x area x times) for rolling out many weeks"""
+    __tablename__ = 'schedule_template'
+
+    id = db.Column(db.Integer, primary_key=True)
+    clinic_id = db.Column(db.Integer, db.ForeignKey('clinic.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    template_data = db.Column(db.LargeBinary, nullable=False)  # schedule_codec snapshot, day = weekday
+    shift_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('clinic_id', 'name', name='uq_template_clinic_name'),
+    )
+
+    @validates('name')
+    def validate_name(self, key, value):
+        if not value or not value.strip():
+            raise ValueError("Template name cannot be empty")
+        return value.strip()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'clinic_id': self.clinic_id,
+            'name': self.name,
+            'shift_count': self.shift_count,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M') if self.created_at else None,
+            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M') if self.updated_at else None
+        }
+
+
+class StaffAvailability(db.Model):
+    """Days in one month a (typically per-diem) staff member says they can work"""
+    __tablename__ = 'staff_availability'
+
+    id = db.Column(db.Integer, primary_key=True)
+    clinic_id = db.Column(db.Integer, db.ForeignKey('clinic.id'), nullable=False)
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.id', ondelete='CASCADE'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # first day of the month
+    days = db.Column(db.Integer, nullable=False, default=0)  # bit d-1 set = available on day d
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('staff_id', 'month', name='uq_availability_staff_month'),
+        db.Index('idx_availability_clinic_month', 'clinic_id', 'month'),
+    )
+
+    def to_dict(self):
+        return {
+            'staff_id': self.staff_id,
+            'month': self.month.strftime('%Y-%m'),
+            'dates': [(self.month + timedelta(days=d)).strftime('%Y-%m-%d')
+                      for d in range(31) if self.days >> d & 1]
+        }
+
+
+class ShiftSwap(db.Model):
+    """A shift offered up by its holder for someone else to take"""
+    __tablename__ = 'shift_swap'
+
+    ACTIVE_STATUSES = ('open', 'claimed')
+
+    id = db.Column(db.Integer, primary_key=True)
+    clinic_id = db.Column(db.Integer, db.ForeignKey('clinic.id'), nullable=False)
+    shift_id = db.Column(db.Integer, db.ForeignKey('shift.id', ondelete='CASCADE'), nullable=False)
+    requested_by_staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'), nullable=False)
+    taker_staff_id = db.Column(db.Integer, db.ForeignKey('staff.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='open')  # 'open', 'claimed', 'approved', 'cancelled'
+    note = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    decided_at = db.Column(db.DateTime, nullable=True)
+
+    shift = db.relationship('Shift')
+    requested_by = db.relationship('Staff', foreign_keys=[requested_by_staff_id])
+    taker = db.relationship('Staff', foreign_keys=[taker_staff_id])
+
+    __table_args__ = (
+        db.Index('idx_swap_clinic_status', 'clinic_id', 'status'),
+        # A shift can only be on offer once at a time
+        db.Index('uq_swap_active_shift', 'shift_id', unique=True,
+                 postgresql_where=db.text("status IN ('open', 'claimed')"),
+                 sqlite_where=db.text("status IN ('open', 'claimed')")),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'clinic_id': self.clinic_id,
+            'shift_id': self.shift_id,
+            'shift': self.shift.to_dict() if self.shift else None,
+            'requested_by_staff_id': self.requested_by_staff_id,
+            'requested_by_name': self.requested_by.name if self.requested_by else None,
+            'taker_staff_id': self.taker_staff_id,
+            'taker_name': self.taker.name if self.taker else None,
+            'status': self.status,
+            'note': self.note,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'decided_at': self.decided_at.isoformat() if self.decided_at else None
+        }
+
+
+# btree_gist lets the GiST time-off index include the integer clinic/staff columns
+event.listen(
+    TimeOffRequest.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
@@ -0,0 +1,191 @@
+"""
+Sliding-window rate limiting for the auth endpoints.
+
+Uses the two-bucket sliding-window approximation: each key keeps only the
+count for the current fixed window and the one before it, and the effective
+count is  previous * (1 - elapsed_fraction) + current.  That is O(1) memory
+per key, and idle keys are evicted LRU-style so a spray of random emails or
+IPs cannot grow the table without bound.
+
+The default MemoryStore is per-process.  Point RATELIMIT_STORAGE_URL at a
+redis:// URL to share counters between gunicorn workers; while Redis is
+unreachable the limits fall back to per-worker counting.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """In-process counter store (one per worker)."""
+
+    def __init__(self, max_keys=50000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [window_index, current, previous]
+        self._lock = threading.Lock()
+
+    def _roll(self, key, window_index):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [window_index, 0, 0]
+            self._buckets[key] = bucket
+        elif bucket[0] != window_index:
+            # Slide forward: the old current becomes previous only if it was
+            # the immediately preceding window, otherwise both are stale.
+            previous = bucket[1] if bucket[0] == window_index - 1 else 0
+            bucket[:] = [window_index, 0, previous]
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return bucket
+
+    def incr(self, key, window_index, ttl):
+        with self._lock:
+            bucket = self._roll(key, window_index)
+            bucket[1] += 1
+            return bucket[1], bucket[2]
+
+    def get(self, key, window_index):
+        with self._lock:
+            if key not in self._buckets:
+                return 0, 0
+            bucket = self._roll(key, window_index)
+            return bucket[1], bucket[2]
+
+    def reset(self, key, window_index):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class RedisStore:
+    """
+    Shared counter store for multi-worker deployments.  If Redis stops
+    answering, counting carries on in a per-worker MemoryStore (logged once
+    per outage) rather than failing the auth routes.
+    """
+
+    def __init__(self, client, fallback=None):
+        import redis
+        self.client = client
+        self.fallback = fallback or MemoryStore()
+        self._errors = redis.RedisError
+        self._down = False
+
+    @staticmethod
+    def _name(key, window_index):
+        return f"rl:{key}:{window_index}"
+
+    def _call(self, method, *args):
+        try:
+            result = getattr(self, f'_{method}')(*args)
+        except self._errors as e:
+            if not self._down:
+                logger.error("Redis rate-limit store failed (%s) -- counting per worker until it recovers", e)
+                self._down = True
+            return getattr(self.fallback, method)(*args)
+        if self._down:
+            logger.warning("Redis rate-limit store recovered")
+            self._down = False
+        return result
+
+    def _incr(self, key, window_index, ttl):
+        pipe = self.client.pipeline()
+        pipe.incr(self._name(key, window_index))
+        pipe.expire(self._name(key, window_index), ttl)
+        pipe.get(self._name(key, window_index - 1))
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def _get(self, key, window_index):
+        current, previous = self.client.mget(
+            self._name(key, window_index), self._name(key, window_index - 1)
+        )
+        return int(current or 0), int(previous or 0)
+
+    def _reset(self, key, window_index):
+        self.client.delete(self._name(key, window_index), self._name(key, window_index - 1))
+
+    def incr(self, key, window_index, ttl):
+        return self._call('incr', key, window_index, ttl)
+
+    def get(self, key, window_index):
+        return self._call('get', key, window_index)
+
+    def reset(self, key, window_index):
+        return self._call('reset', key, window_index)
+
+
+def create_store(url=None, max_keys=50000):
+    """
+    Build a store from RATELIMIT_STORAGE_URL; falls back to memory, which
+    makes every limit per worker (looser by the worker count), so that is
+    logged as an error when WEB_CONCURRENCY > 1.  The Redis client connects
+    lazily, so an unreachable server is handled by RedisStore per call.
+    """
+    if url and url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+            return RedisStore(redis.Redis.from_url(url), MemoryStore(max_keys=max_keys))
+        except (ImportError, ValueError) as e:
+            logger.error("Redis rate-limit store unavailable (%s) -- limits are per worker", e)
+    elif int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+        logger.error("RATELIMIT_STORAGE_URL is not set but %s workers are running -- "
+                     "auth limits are per worker", os.getenv('WEB_CONCURRENCY'))
+    return MemoryStore(max_keys=max_keys)
+
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` hits per `window` seconds for each key."""
+
+    def __init__(self, name, limit, window, store=None, clock=time.time):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.store = store or MemoryStore()
+        self.clock = clock
+
+    def _position(self):
+        now = self.clock()
+        window_index = int(now // self.window)
+        elapsed = (now - window_index * self.window) / self.window
+        return window_index, elapsed
+
+    def _estimate(self, current, previous, elapsed):
+        return previous * (1 - elapsed) + current
+
+    def _retry_after(self, current, previous, elapsed):
+        # Seconds until the weighted previous window decays enough to admit
+        # one more hit; at worst, until the current window rolls over.
+        if current + 1 > self.limit or previous == 0:
+            return max(1, math.ceil((1 - elapsed) * self.window))
+        needed = 1 - (self.limit - current - 1) / previous
+        return max(1, math.ceil((needed - elapsed) * self.window))
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def hit(self, key):
+        """Record one hit. Returns (allowed, retry_after_seconds)."""
+        window_index, elapsed = self._position()
+        current, previous = self.store.incr(self._key(key), window_index, self.window * 2)
+        if self._estimate(current, previous, elapsed) > self.limit:
+            return False, self._retry_after(current, previous, elapsed)
+        return True, 0
+
+    def check(self, key):
+        """Like hit() but without recording anything."""
+        window_index, elapsed = self._position()
+        current, previous = self.store.get(self._key(key), window_index)
+        if self._estimate(current, previous, elapsed) > self.limit - 1:
+            return False, self._retry_after(current, previous, elapsed)
+        return True, 0
+
+    def reset(self, key):
+        window_index, _ = self._position()
+        self.store.reset(self._key(key), window_index)
@@ -0,0 +1,47 @@
+"""
+Backfill / rebuild the coverage_daily summary table from raw shifts.
+
+The coverage_daily migration backfills the table itself; run this any time
+the summary is suspected to be out of sync, or to redo past days after
+changing an area's rules.
+
+Usage:
+  python rebuild_coverage.py                          # every clinic, all dates
+  python rebuild_coverage.py --clinic 2               # one clinic
+  python rebuild_coverage.py --start 2026-01-01 --end 2026-12-31
+"""
+
+import argparse
+from datetime import datetime
+
+from app import app, db
+from models import Clinic
+from coverage import rebuild_coverage
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild coverage_daily from shifts')
+    parser.add_argument('--clinic', type=int, help='Only rebuild this clinic id')
+    parser.add_argument('--start', help='First date to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last date to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        clinics = Clinic.query.order_by(Clinic.id)
+        if args.clinic:
+            clinics = clinics.filter_by(id=args.clinic)
+
+        for clinic in clinics.all():
+            n = rebuild_coverage(clinic.id, parse_date(args.start), parse_date(args.end))
+            db.session.commit()
+            print(f"  {clinic.name}: {n} area-days rebuilt")
+
+        print("\nCoverage rebuild complete.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Staffing analytics over a date range: hours vs contract, and fairness.
+
+The shifts for the range are pulled with one projected query and turned
+into flat NumPy arrays (staff index, area index, day, start minute,
+hours); every per-staff figure is then a bincount/group-by over those
+arrays rather than a Python loop per shift, so a year of a clinic's
+schedule is a few milliseconds of arithmetic.
+
+Call-outs are not recorded separately in this app, so a time-off request
+made at short notice (created within CALL_OUT_NOTICE_DAYS of its start)
+counts as one.
+"""
+
+import numpy as np
+
+from db import db
+from models import Staff, StaffArea, Shift, TimeOffRequest
+
+CALL_OUT_NOTICE_DAYS = 2
+EARLY_START_MINUTES = 7 * 60  # 06:15 / 06:30 Admitting starts
+
+
+def _ordinals(dates):
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+
+
+def _minutes(times):
+    return np.fromiter((t.hour * 60 + t.minute for t in times), dtype=np.int64, count=len(times))
+
+
+def _busdays(first, last):
+    """Mon-Fri days in [first, last], elementwise over ordinal arrays."""
+    epoch = np.datetime64('0001-01-01')
+    first = epoch + (np.asarray(first) - 1).astype('timedelta64[D]')
+    last = epoch + (np.asarray(last) - 1).astype('timedelta64[D]')
+    return np.busday_count(first, last + np.timedelta64(1, 'D'))
+
+
+class ShiftArrays:
+    """Column arrays for the shifts in a range, indexed against a staff and area list."""
+
+    def __init__(self, staff_ids, area_ids, rows):
+        """rows: (staff_id, area_id, date, start_time, end_time) per shift."""
+        self.staff_ids = np.asarray(sorted(staff_ids), dtype=np.int64)
+        self.area_ids = np.asarray(sorted(area_ids), dtype=np.int64)
+        columns = list(zip(*rows)) if rows else [(), (), (), (), ()]
+        staff, area, dates, starts, ends = columns
+
+        self.staff = np.searchsorted(self.staff_ids, np.asarray(staff, dtype=np.int64))
+        self.area = np.searchsorted(self.area_ids, np.asarray(area, dtype=np.int64))
+        self.day = _ordinals(dates)
+        self.start = _minutes(starts)
+        self.hours = (_minutes(ends) - self.start) / 60.0
+        self.weekday = (self.day - 1) % 7  # date.fromordinal(1) is a Monday
+
+    def __len__(self):
+        return len(self.day)
+
+    def per_staff(self, weights=None, mask=None):
+        """Sum of `weights` (or a count) per staff member, optionally over `mask` only."""
+        staff = self.staff if mask is None else self.staff[mask]
+        if weights is not None and mask is not None:
+            weights = weights[mask]
+        return np.bincount(staff, weights=weights, minlength=len(self.staff_ids))
+
+
+def _time_off_arrays(staff_ids, rows, start, end):
+    """
+    Per-staff approved time-off weekdays inside [start, end], plus call-out
+    count and days. rows: (staff_id, start_date, end_date, created_at, status).
+    """
+    n = len(staff_ids)
+    off_days = np.zeros(n)
+    call_outs = np.zeros(n)
+    call_out_days = np.zeros(n)
+    if not rows:
+        return off_days, call_outs, call_out_days
+
+    staff, first_dates, last_dates, created, statuses = zip(*rows)
+    idx = np.searchsorted(staff_ids, np.asarray(staff, dtype=np.int64))
+    firsts, lasts = _ordinals(first_dates), _ordinals(last_dates)
+    statuses = np.asarray(statuses)
+    clipped_first = np.maximum(firsts, start.toordinal())
+    clipped_last = np.minimum(lasts, end.toordinal())
+    weekdays = np.where(clipped_last >= clipped_first, _busdays(clipped_first, clipped_last), 0)
+
+    approved = statuses == 'approved'
+    np.add.at(off_days, idx[approved], weekdays[approved])
+
+    # Requests without a created_at (older rows) count as made well ahead
+    requested = np.array([c.date().toordinal() if c else first - CALL_OUT_NOTICE_DAYS - 1
+                          for c, first in zip(created, firsts)], dtype=np.int64)
+    short_notice = ((firsts - requested <= CALL_OUT_NOTICE_DAYS) & (statuses != 'denied')
+                    & (firsts >= start.toordinal()))
+    np.add.at(call_outs, idx[short_notice], 1)
+    np.add.at(call_out_days, idx[short_notice], weekdays[short_notice])
+    return off_days, call_outs, call_out_days
+
+
+def hours_report(staff_list, arrays, time_off_rows, start, end):
+    """
+    Scheduled hours per staff member against their contract
+    (days_per_week x shift_length, pro-rated to the weekdays in the range and
+    reduced by approved time-off), plus overtime beyond the weekly contract.
+    Per-diem staff have no contract: their expected and overtime hours are 0.
+    """
+    staff_ids = arrays.staff_ids
+    by_id = {s.id: s for s in staff_list}
+    days_per_week = np.array([by_id[i].days_per_week for i in staff_ids], dtype=float)
+    shift_length = np.array([by_id[i].shift_length for i in staff_ids], dtype=float)
+    per_diem = np.array([bool(by_id[i].is_per_diem) for i in staff_ids], dtype=bool)
+    weekly_contract = np.where(per_diem, 0, days_per_week * shift_length)
+
+    scheduled = arrays.per_staff(arrays.hours)
+    shifts = arrays.per_staff()
+    off_days, _, _ = _time_off_arrays(staff_ids, time_off_rows, start, end)
+
+    weeks_in_range = _busdays(start.toordinal(), end.toordinal()) / 5.0
+    expected = np.maximum(weekly_contract * weeks_in_range - off_days * shift_length, 0)
+
+    # Hours per (staff, week) via one bincount over a combined key
+    first_monday = start.toordinal() - start.weekday()
+    week = (arrays.day - first_monday) // 7
+    n_weeks = int((end.toordinal() - first_monday) // 7) + 1
+    weekly = np.bincount(arrays.staff * n_weeks + week, weights=arrays.hours,
+                         minlength=len(staff_ids) * n_weeks).reshape(len(staff_ids), n_weeks)
+    overtime = np.where(per_diem, 0, np.maximum(weekly - weekly_contract[:, None], 0).sum(axis=1))
+
+    rows = []
+    for i, staff_id in enumerate(staff_ids):
+        staff = by_id[staff_id]
+        if not staff.is_active and shifts[i] == 0:
+            continue
+        rows.append({
+            'staff_id': int(staff_id),
+            'staff_name': staff.name,
+            'role': staff.role,
+            'is_per_diem': bool(staff.is_per_diem),
+            'shifts': int(shifts[i]),
+            'scheduled_hours': round(float(scheduled[i]), 2),
+            'expected_hours': round(float(expected[i]), 2),
+            'difference': round(float(scheduled[i] - expected[i]), 2),
+            'overtime_hours': round(float(overtime[i]), 2),
+            'time_off_days': int(off_days[i]),
+        })
+    return {
+        'staff': rows,
+        'totals': {
+            'shifts': int(len(arrays)),
+            'scheduled_hours': round(float(scheduled.sum()), 2),
+            'expected_hours': round(float(expected.sum()), 2),
+            'overtime_hours': round(float(overtime.sum()), 2),
+        }
+    }
+
+
+def rotation_entropy(arrays):
+    """Shannon entropy (bits) of each staff member's shifts over areas, and it normalised to 0-1."""
+    n_staff, n_areas = len(arrays.staff_ids), max(len(arrays.area_ids), 1)
+    counts = np.bincount(arrays.staff * n_areas + arrays.area,
+                         minlength=n_staff * n_areas).reshape(n_staff, n_areas).astype(float)
+    totals = counts.sum(axis=1, keepdims=True)
+    p = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1)
+    normalised = entropy / np.log2(n_areas) if n_areas > 1 else np.zeros(n_staff)
+    return entropy, normalised
+
+
+def _spread(values):
+    if len(values) == 0:
+        return {'min': 0, 'max': 0, 'mean': 0, 'std': 0}
+    return {'min': round(float(values.min()), 2), 'max': round(float(values.max()), 2),
+            'mean': round(float(values.mean()), 2), 'std': round(float(values.std()), 2)}
+
+
+def fairness_report(staff_list, arrays, time_off_rows, start, end):
+    """
+    How evenly the less popular work is shared: weekend shifts, early
+    (pre-07:00) starts, area rotation and call-outs per staff member, with
+    min/max/mean/std per role so outliers stand out.
+    """
+    staff_ids = arrays.staff_ids
+    by_id = {s.id: s for s in staff_list}
+    shifts = arrays.per_staff()
+    weekend = arrays.per_staff(mask=arrays.weekday >= 5)
+    early = arrays.per_staff(mask=arrays.start < EARLY_START_MINUTES)
+    entropy, normalised = rotation_entropy(arrays)
+    _, call_outs, call_out_days = _time_off_arrays(staff_ids, time_off_rows, start, end)
+
+    roles = np.array([by_id[i].role for i in staff_ids])
+    included = np.array([by_id[i].is_active or shifts[k] > 0 for k, i in enumerate(staff_ids)], dtype=bool)
+    share = np.divide(early, shifts, out=np.zeros(len(early)), where=shifts > 0)
+
+    rows = []
+    for i in np.flatnonzero(included):
+        staff = by_id[staff_ids[i]]
+        rows.append({
+            'staff_id': int(staff_ids[i]),
+            'staff_name': staff.name,
+            'role': staff.role,
+            'shifts': int(shifts[i]),
+            'weekend_shifts': int(weekend[i]),
+            'early_starts': int(early[i]),
+            'early_start_share': round(float(share[i]), 3),
+            'area_entropy_bits': round(float(entropy[i]), 3),
+            'area_rotation': round(float(normalised[i]), 3),
+            'call_outs': int(call_outs[i]),
+            'call_out_days': int(call_out_days[i]),
+        })
+
+    by_role = {}
+    for role in sorted(set(roles[included])):
+        mask = included & (roles == role) & (shifts > 0)
+        by_role[role] = {
+            'staff': int(mask.sum()),
+            'weekend_shifts': _spread(weekend[mask]),
+            'early_starts': _spread(early[mask]),
+            'area_rotation': _spread(normalised[mask]),
+            'call_outs': _spread(call_outs[mask]),
+        }
+    return {'staff': rows, 'by_role': by_role}
+
+
+def load_report_data(clinic_id, start, end):
+    """Staff, ShiftArrays and time-off rows for the clinic and range."""
+    staff_list = Staff.query.filter_by(clinic_id=clinic_id).all()
+    area_ids = [a for (a,) in db.session.query(StaffArea.id).filter(StaffArea.clinic_id == clinic_id)]
+    shift_rows = db.session.query(
+        Shift.staff_id, Shift.area_id, Shift.date, Shift.start_time, Shift.end_time
+    ).filter(
+        Shift.clinic_id == clinic_id,
+        Shift.date.between(start, end)
+    ).all()
+    time_off_rows = db.session.query(
+        TimeOffRequest.staff_id, TimeOffRequest.start_date, TimeOffRequest.end_date,
+        TimeOffRequest.created_at, TimeOffRequest.status
+    ).filter(
+        TimeOffRequest.clinic_id == clinic_id,
+        TimeOffRequest.overlaps(start, end)
+    ).all()
+    arrays = ShiftArrays([s.id for s in staff_list], area_ids, shift_rows)
+    return staff_list, arrays, time_off_rows
@@ -0,0 +1,225 @@
+"""
+Staffing rules, stored per clinic (Clinic.scheduling_rules) and per area
+(StaffArea.rules) as JSON and compiled once into small rule objects.
+
+The validator, the coverage checker and the generator all read the same
+compiled objects, so a clinic with different rooms, start times or openers
+is configured with data rather than code.  Compilation is cached on the
+raw inputs (the JSON text, plus an area's name and required counts), so
+the name matching and JSON parsing happen once per distinct rule set, not
+once per shift checked.
+
+With nothing stored, the defaults reproduce the original GI lab rules:
+Scope Room takes 2 Scope Techs or GI Techs (at least one Scope Tech
+preferred), Procedure Rooms take 2 RNs or Techs, other areas take their
+required_*_count; early RNs go to Admitting and 07:30 RNs to Recovery.
+
+Area rules:
+    {"requirements": [{"roles": ["Scope_Tech", "GI_Tech"], "count": 2, "label": "..."}],
+     "preferences":  [{"roles": ["Scope_Tech"], "count": 1, "message": "..."}]}
+
+Clinic rules (any subset; missing keys keep the default):
+    {"valid_start_times": [...], "start_time_areas": {"RN": {"06:15": "Admitting"}},
+     "rn_slots": [["06:15", "Admitting"], ...], "scope_area": "Scope Room",
+     "procedure_rooms": [...], "openers": ["Jess", "Curtis"]}
+"""
+
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+
+ROLES = ('RN', 'GI_Tech', 'Scope_Tech')
+ROLE_LABELS = {'RN': 'RN', 'GI_Tech': 'GI Tech', 'Scope_Tech': 'Scope Tech'}
+
+DEFAULT_CLINIC_RULES = {
+    'valid_start_times': ['06:15', '06:30', '07:00', '07:30'],
+    'start_time_areas': {'RN': {'06:15': 'Admitting', '06:30': 'Admitting', '07:30': 'Recovery'}},
+    # No Charge/Float in the auto-schedule
+    'rn_slots': [['06:15', 'Admitting'], ['06:30', 'Admitting'], ['07:30', 'Recovery'], ['07:30', 'Recovery']],
+    'scope_area': 'Scope Room',
+    'procedure_rooms': ['Procedure Room 1', 'Procedure Room 2', 'Procedure Room 3', 'Procedure Room 4'],
+    'openers': ['Jess', 'Curtis'],
+}
+
+
+def _roles(value):
+    roles = tuple(value or ())
+    if not roles or any(role not in ROLES for role in roles):
+        raise ValueError(f"roles must be a non-empty list of: {', '.join(ROLES)}")
+    return roles
+
+
+def _count(value):
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError("count must be a non-negative integer")
+    return value
+
+
+_HHMM = re.compile(r'([01]\d|2[0-3]):[0-5]\d')
+
+
+def _start(value):
+    if not isinstance(value, str) or not _HHMM.fullmatch(value):
+        raise ValueError(f"start times must be 'HH:MM' strings, not {value!r}")
+    return value
+
+
+def _name(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"names must be non-empty strings, not {value!r}")
+    return value
+
+
+def _list(value, key):
+    # A bare string would otherwise be split into characters by tuple()
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"{key} must be a list")
+    return value
+
+
+class Requirement:
+    """At least `count` staff from `roles` (pooled), e.g. 2 Scope Techs or GI Techs."""
+    __slots__ = ('roles', 'count', 'label')
+
+    def __init__(self, roles, count, label=None):
+        self.roles = _roles(roles)
+        self.count = _count(count)
+        if label is None:
+            names = [ROLE_LABELS[r] for r in self.roles]
+            label = f"{names[0]}(s)" if len(names) == 1 else f"staff ({' or '.join(names)})"
+        self.label = label
+
+    def present(self, counts):
+        return sum(counts.get(role, 0) for role in self.roles)
+
+
+class Preference(Requirement):
+    """A soft minimum, reported only once every requirement is met."""
+    __slots__ = ('message',)
+
+    def __init__(self, roles, count, message=None):
+        super().__init__(roles, count)
+        self.message = message or f"Warning: fewer than {self.count} {self.label} scheduled"
+
+
+class AreaRules:
+    def __init__(self, requirements, preferences=()):
+        self.requirements = tuple(requirements)
+        self.preferences = tuple(preferences)
+        self.roles = frozenset(role for req in self.requirements for role in req.roles)
+        self.headcount = sum(req.count for req in self.requirements)
+
+    def warnings(self, counts):
+        """counts: {role: staff scheduled}. Returns the coverage warnings (empty = covered)."""
+        warnings = []
+        for req in self.requirements:
+            present = req.present(counts)
+            if present < req.count:
+                warnings.append(f"Needs {req.count - present} more {req.label}")
+        if not warnings:
+            warnings = [pref.message for pref in self.preferences if pref.present(counts) < pref.count]
+        return warnings
+
+
+def _default_area_rules(name, rn_count, tech_count, scope_tech_count):
+    if 'Scope Room' in name:
+        # Ideally 2 Scope Techs, but 1 Scope Tech + 1 GI Tech is allowed
+        return AreaRules(
+            [Requirement(('Scope_Tech', 'GI_Tech'), 2)],
+            [Preference(('Scope_Tech',), 1, "Warning: No Scope Techs scheduled (should have at least 1)")]
+        )
+    if 'Procedure Room' in name:
+        # 2 techs, 2 RNs, or 1 of each
+        return AreaRules([Requirement(('RN', 'GI_Tech'), 2, 'staff (RN or Tech)')])
+    required = [(('RN',), rn_count, 'RN(s)'), (('GI_Tech',), tech_count, 'Tech(s)'),
+                (('Scope_Tech',), scope_tech_count, 'Scope Tech(s)')]
+    return AreaRules([Requirement(roles, n, label) for roles, n, label in required if (n or 0) > 0])
+
+
+def _parse(rules_json):
+    rules = json.loads(rules_json) if isinstance(rules_json, str) else rules_json
+    if not isinstance(rules, dict):
+        raise ValueError("rules must be a JSON object")
+    return rules
+
+
+@lru_cache(maxsize=1024)
+def _compile_area(name, rn_count, tech_count, scope_tech_count, rules_json):
+    if not rules_json:
+        return _default_area_rules(name, rn_count, tech_count, scope_tech_count)
+    rules = _parse(rules_json)
+    try:
+        requirements = [Requirement(r['roles'], r['count'], r.get('label')) for r in rules.get('requirements', [])]
+        preferences = [Preference(p['roles'], p['count'], p.get('message')) for p in rules.get('preferences', [])]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid area rule: {e}")
+    return AreaRules(requirements, preferences)
+
+
+def compile_area_rules(rules_json):
+    """Compile stored area rules on their own (raises ValueError if malformed)."""
+    return _compile_area('', 0, 0, 0, rules_json)
+
+
+def area_rules(area):
+    """Compiled rules for an area (anything with name, required_*_count and optionally rules)."""
+    return _compile_area(area.name, area.required_rn_count or 0, area.required_tech_count or 0,
+                         area.required_scope_tech_count or 0, getattr(area, 'rules', None))
+
+
+class ClinicRules:
+    __slots__ = ('valid_start_times', 'start_time_areas', 'rn_slots', 'scope_area',
+                 'procedure_rooms', 'openers', 'slot_counts', '_valid')
+
+    def __init__(self, rules):
+        self.valid_start_times = tuple(_start(t) for t in _list(rules['valid_start_times'], 'valid_start_times'))
+        self._valid = frozenset(self.valid_start_times)
+        self.start_time_areas = {_roles([role])[0]: {_start(start): _name(area_name)
+                                                     for start, area_name in by_start.items()}
+                                 for role, by_start in rules['start_time_areas'].items()}
+        self.rn_slots = tuple((_start(start), _name(area_name))
+                              for start, area_name in _list(rules['rn_slots'], 'rn_slots'))
+        self.scope_area = _name(rules['scope_area'])
+        self.procedure_rooms = tuple(_name(n) for n in _list(rules['procedure_rooms'], 'procedure_rooms'))
+        self.openers = tuple(_name(n) for n in _list(rules['openers'], 'openers'))
+        # RNs each slotted area expects per day, e.g. {'Admitting': 2, 'Recovery': 2}
+        self.slot_counts = Counter(area_name for _, area_name in self.rn_slots)
+
+    def start_time_errors(self, role, start, area_name):
+        """start: 'HH:MM'."""
+        errors = []
+        expected = self.start_time_areas.get(role, {}).get(start)
+        if expected and area_name != expected:
+            errors.append(f"{ROLE_LABELS.get(role, role)}s starting at {start} should be assigned to {expected}, not {area_name}")
+        if start not in self._valid:
+            errors.append(f"Start time must be one of: {', '.join(self.valid_start_times)}")
+        return errors
+
+
+@lru_cache(maxsize=256)
+def compile_clinic_rules(rules_json=None):
+    """Compiled clinic rules; stored keys override DEFAULT_CLINIC_RULES."""
+    rules = dict(DEFAULT_CLINIC_RULES)
+    if rules_json:
+        overrides = _parse(rules_json)
+        unknown = set(overrides) - set(DEFAULT_CLINIC_RULES)
+        if unknown:
+            raise ValueError(f"Unknown clinic rules: {', '.join(sorted(unknown))}")
+        rules.update(overrides)
+    try:
+        return ClinicRules(rules)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid clinic rules: {e}")
+
+
+def clinic_rules(clinic_id):
+    """Compiled rules for a clinic (the defaults when it has none, or clinic_id is None)."""
+    # Imported here so the compiled rules (and schedule_engine) load without Flask
+    from db import db
+    from models import Clinic
+
+    rules_json = None
+    if clinic_id is not None:
+        rules_json = db.session.query(Clinic.scheduling_rules).filter(Clinic.id == clinic_id).scalar()
+    return compile_clinic_rules(rules_json)
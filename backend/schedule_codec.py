@@ -0,0 +1,132 @@
+"""
+Compact encoding for weekly schedules (AISuggestion storage).
+
+A schedule is reduced to integer rows
+    (staff_id, area_id, day_offset, start_minute, end_minute)
+relative to the week start, sorted, split into columns, packed as
+little-endian int32 arrays and zlib-compressed.  Sorted columns of small,
+repetitive integers compress far better than the JSON list of dicts.
+
+A delta is the same layout plus an op column (0 = remove, 1 = add) holding
+only the rows that differ from a base snapshot.
+
+Pure Python -- no Flask or database imports.
+"""
+
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+MAGIC = b'SC'
+SNAPSHOT = 0
+DELTA = 1
+_HEADER = struct.Struct('<2sBI')
+
+
+def _minutes(hhmm):
+    return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+
+
+def _hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def to_rows(shifts, week_start):
+    """Shift dicts ({'staff_id', 'area_id', 'date', 'start_time', 'end_time'}) -> sorted int rows."""
+    rows = []
+    for sh in shifts:
+        day = datetime.strptime(sh['date'], '%Y-%m-%d').date()
+        rows.append((
+            int(sh['staff_id']),
+            int(sh['area_id']),
+            (day - week_start).days,
+            _minutes(sh['start_time']),
+            _minutes(sh['end_time']),
+        ))
+    return sorted(rows, key=lambda r: (r[2], r[1], r[0], r[3]))
+
+
+def from_rows(rows, week_start):
+    """Int rows -> shift dicts in the API format."""
+    return [
+        {
+            'staff_id':   staff_id,
+            'area_id':    area_id,
+            'date':       (week_start + timedelta(days=day)).strftime('%Y-%m-%d'),
+            'start_time': _hhmm(start),
+            'end_time':   _hhmm(end),
+        }
+        for staff_id, area_id, day, start, end in rows
+    ]
+
+
+def _pack(kind, columns, n):
+    body = b''.join(struct.pack(f'<{n}i', *col) for col in columns)
+    return zlib.compress(_HEADER.pack(MAGIC, kind, n) + body, 9)
+
+
+def _unpack(blob):
+    raw = zlib.decompress(blob)
+    magic, kind, n = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError('Not an encoded schedule')
+    width = 6 if kind == DELTA else 5
+    offset = _HEADER.size
+    columns = []
+    for _ in range(width):
+        columns.append(struct.unpack_from(f'<{n}i', raw, offset))
+        offset += 4 * n
+    return kind, list(zip(*columns)) if n else []
+
+
+def encode_snapshot(rows):
+    rows = sorted(rows, key=lambda r: (r[2], r[1], r[0], r[3]))
+    return _pack(SNAPSHOT, list(zip(*rows)) if rows else [()] * 5, len(rows))
+
+
+def encode_delta(base_rows, rows):
+    base, new = set(base_rows), set(rows)
+    changes = sorted(
+        [r + (0,) for r in base - new] + [r + (1,) for r in new - base],
+        key=lambda r: (r[2], r[1], r[0], r[3], r[5])
+    )
+    return _pack(DELTA, list(zip(*changes)) if changes else [()] * 6, len(changes))
+
+
+def decode(blob, base_rows=None):
+    """Decode a snapshot, or a delta against base_rows."""
+    kind, rows = _unpack(blob)
+    if kind == SNAPSHOT:
+        return rows
+    if base_rows is None:
+        raise ValueError('Delta needs its base snapshot')
+    result = set(base_rows)
+    for row in rows:
+        if row[5]:
+            result.add(row[:5])
+        else:
+            result.discard(row[:5])
+    return sorted(result, key=lambda r: (r[2], r[1], r[0], r[3]))
+
+
+def diff_shifts(before, after):
+    """
+    Compare two shift lists keyed by (staff_id, date).
+    Returns {'added', 'removed', 'changed', 'unchanged_count'}; 'changed'
+    holds {'before', 'after'} pairs for staff whose area or times moved.
+    """
+    old = {(int(s['staff_id']), s['date']): s for s in before}
+    new = {(int(s['staff_id']), s['date']): s for s in after}
+    fields = ('area_id', 'start_time', 'end_time')
+
+    added = [new[k] for k in sorted(new.keys() - old.keys())]
+    removed = [old[k] for k in sorted(old.keys() - new.keys())]
+    changed = []
+    unchanged = 0
+    for k in sorted(old.keys() & new.keys()):
+        if any(str(old[k][f]) != str(new[k][f]) for f in fields):
+            changed.append({'before': old[k], 'after': new[k]})
+        else:
+            unchanged += 1
+
+    return {'added': added, 'removed': removed, 'changed': changed, 'unchanged_count': unchanged}
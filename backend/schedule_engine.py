@@ -0,0 +1,428 @@
+"""
+The schedule generator's core, with no Flask, database or OpenAI imports.
+
+build_weekly_schedule() is a pure function over plain inputs -- StaffInput
+and AreaInput rows, the (staff_id, date) set blocked by approved time-off
+and the clinic's compiled rules -- so it can run in worker processes, in
+tests, or offline from a snapshot file:
+
+  python schedule_engine.py clinic.json -o schedule.json
+  python schedule_engine.py snapshots.parquet -o shifts.parquet   # needs pyarrow
+  python schedule_engine.py clinic.json --repeat 200               # benchmark
+  python schedule_engine.py clinic.json --profile                  # cProfile top 25
+
+A snapshot is one clinic-week:
+  {"week_start": "2026-11-02", "rules": {...} or null,
+   "staff": [{"id", "name", "role", "shift_length", "days_per_week", "start_time": "HH:MM" or null,
+              "is_per_diem", "required_days_off": [...], "flexible_days_off": [...]}],
+   "areas": [{"id", "name", "required_rn_count", "required_tech_count",
+              "required_scope_tech_count", "rules": {...} or null}],
+   "time_off": [{"staff_id", "date": "YYYY-MM-DD"}, ...],
+   "active_rooms": {"YYYY-MM-DD": ["Procedure Room 1", ...]} (optional)}
+A .json file holds one snapshot or a list of them; a .parquet file holds one
+snapshot per row.  `python batch_generate.py --export FILE` writes them
+from the database.
+"""
+
+import argparse
+import json
+import sys
+import time as timer
+from dataclasses import dataclass
+from datetime import datetime, time
+from functools import lru_cache
+
+from rules import area_rules, compile_clinic_rules
+from week_context import WeekContext, days_mask
+
+
+# -- Plain, picklable stand-ins for Staff / StaffArea rows (batch runs ship these to worker processes) --
+@dataclass(frozen=True, slots=True)
+class StaffInput:
+    id: int
+    name: str
+    role: str
+    shift_length: int
+    days_per_week: int
+    start_time: time = None
+    is_per_diem: bool = False
+    required_days_off: str = None
+    flexible_days_off: str = None
+
+
+@dataclass(frozen=True, slots=True)
+class AreaInput:
+    id: int
+    name: str
+    required_rn_count: int = 0
+    required_tech_count: int = 0
+    required_scope_tech_count: int = 0
+    rules: str = None
+
+
+# -- Low-level shift builder (module-level to avoid closure issues) --
+def make_shift(staff, area, date_str, start_str):
+    h, m = int(start_str[:2]), int(start_str[3:])
+    return {
+        'staff_id':   staff.id,
+        'area_id':    area.id,
+        'date':       date_str,
+        'start_time': start_str,
+        'end_time':   f"{h + staff.shift_length:02d}:{m:02d}",
+    }
+
+
+# -- Compact working model: ints for days (0-4) and minutes past midnight, strings only at the end --
+def _minutes(hhmm):
+    return int(hhmm[:2]) * 60 + int(hhmm[3:])
+
+
+@lru_cache(maxsize=None)
+def _hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+@dataclass(slots=True)
+class _Member:
+    """What the generator needs from a Staff row, read once."""
+    id: int
+    name: str
+    role: str
+    shift_minutes: int
+    start: int           # fixed start (minutes), or None
+    is_per_diem: bool
+    four_day: bool       # gets a rotating day off
+    flexible: int        # preferred days off (bitmask)
+
+
+@dataclass(slots=True)
+class _Assignment:
+    member: _Member
+    area_id: int
+    day: int
+    start: int
+
+
+def _members(staff_list):
+    return [
+        _Member(s.id, s.name, s.role, s.shift_length * 60,
+                s.start_time.hour * 60 + s.start_time.minute if s.start_time else None,
+                bool(s.is_per_diem), s.days_per_week == 4 and not s.is_per_diem, days_mask(s.flexible_days_off))
+        for s in staff_list
+    ]
+
+
+def build_weekly_schedule(week_start_date, staff_list, area_list, time_off_days, rules, active_rooms=None):
+    """
+    The deterministic algorithm over preloaded data (no queries): active
+    staff and areas (ORM rows or StaffInput/AreaInput), the (staff_id, date)
+    set blocked by approved time-off, and the clinic's compiled rules.
+    Returns (shift dicts, warnings).
+    """
+    warnings   = []
+    placements = []
+    area_map   = {a.name: a for a in area_list}
+    week       = WeekContext(week_start_date)
+    day_strs   = week.iso[:5]
+    members    = _members(staff_list)
+
+    # -- Blocked days per staff, as bitmasks over the week (bits 5-6, the weekend, are never read) --
+    blocked = {}
+    for staff_id, d in time_off_days:
+        i = week.index.get(d)
+        if i is not None:
+            blocked[staff_id] = blocked.get(staff_id, 0) | (1 << i)
+
+    for s in staff_list:
+        if s.required_days_off:
+            blocked[s.id] = blocked.get(s.id, 0) | days_mask(s.required_days_off)
+
+    # -- Assign 1 rotating day off per week for every 4-day/week non-per-diem staff --
+    off_count = [sum(1 for mask in blocked.values() if mask & (1 << i)) for i in range(5)]
+
+    for m in members:
+        if not m.four_day:
+            continue
+        mask = blocked.get(m.id, 0)
+        free = [i for i in range(5) if not mask & (1 << i)]
+        if len(free) <= 4:
+            continue  # already has a blocked day this week
+
+        preferred = [i for i in free if m.flexible & (1 << i)]
+        pool = preferred if preferred else free
+
+        chosen = min(pool, key=off_count.__getitem__)
+        blocked[m.id] = mask | (1 << chosen)
+        off_count[chosen] += 1
+
+    # -- Slots, rooms and openers come from the clinic's rules --
+    RN_SLOTS       = [(_minutes(start), area_name) for start, area_name in rules.rn_slots]
+    ALL_PROC_ROOMS = list(rules.procedure_rooms)
+    room_size      = {name: area_rules(a).headcount for name, a in area_map.items()}
+    scope_area     = area_map.get(rules.scope_area)
+
+    # Sorted by name once; filtering a sorted list per day keeps the order
+    by_name     = sorted(members, key=lambda m: m.name)
+    rns_all     = [m for m in by_name if m.role == 'RN' and not m.is_per_diem]
+    gi_all      = [m for m in by_name if m.role == 'GI_Tech']
+    scope_all   = [m for m in by_name if m.role == 'Scope_Tech']
+
+    # -- Build each day --
+    for day_idx, date_str in enumerate(day_strs):
+        bit = 1 << day_idx
+        rns         = [m for m in rns_all   if not blocked.get(m.id, 0) & bit]
+        gi_techs    = [m for m in gi_all    if not blocked.get(m.id, 0) & bit]
+        scope_techs = [m for m in scope_all if not blocked.get(m.id, 0) & bit]
+
+        assigned = set()
+        placed   = {}  # area_id -> staff placed there today
+
+        def place(m, area, start):
+            placements.append(_Assignment(m, area.id, day_idx, start))
+            assigned.add(m.id)
+            placed[area.id] = placed.get(area.id, 0) + 1
+
+        # -- Scope Room --
+        for st in scope_techs:
+            if scope_area and st.id not in assigned:
+                place(st, scope_area, st.start if st.start is not None else 450)
+
+        if len(scope_techs) < 2:
+            sub = next((gt for gt in gi_techs if gt.id not in assigned), None)
+            if sub and scope_area:
+                place(sub, scope_area, 420)
+                warnings.append(f"{date_str}: {sub.name} (GI Tech) covering Scope Room")
+
+        # -- Which procedure rooms are open today? --
+        if active_rooms and date_str in active_rooms:
+            day_rooms = [r for r in ALL_PROC_ROOMS if r in active_rooms[date_str]]
+        else:
+            day_rooms = ALL_PROC_ROOMS
+
+        # -- GI Techs -- put exactly 1 per active room (opener slot first) --
+        gi_pool = [m for m in gi_techs if m.id not in assigned]
+        opener  = next((m for name in rules.openers for m in gi_pool if m.name == name), None)
+        if opener:
+            gi_pool = [opener] + [m for m in gi_pool if m.id != opener.id]
+
+        gi_ptr = 0
+        for room_name in day_rooms:
+            room = area_map.get(room_name)
+            if not room or gi_ptr >= len(gi_pool):
+                continue
+            gt = gi_pool[gi_ptr]
+            start = gt.start if gt.start is not None else (
+                375 if gi_ptr == 0 else (420 if gi_ptr % 2 == 0 else 450)
+            )
+            if gt.id not in assigned:
+                place(gt, room, start)
+            gi_ptr += 1
+
+        # -- RNs -> Admitting (2) + Recovery (2), then rotate into rooms --
+        rn_pool = rns
+        if rn_pool:
+            offset  = day_idx % len(rn_pool)
+            rn_pool = rn_pool[offset:] + rn_pool[:offset]
+
+        for i, rn in enumerate(rn_pool[:len(RN_SLOTS)]):
+            start, area_name = RN_SLOTS[i]
+            area = area_map.get(area_name)
+            if area and rn.id not in assigned:
+                place(rn, area, start)
+
+        # Extra RNs (5th+) rotate into procedure rooms as 2nd person
+        extra_rns = [rn for rn in rn_pool[len(RN_SLOTS):] if rn.id not in assigned]
+        if extra_rns and day_rooms:
+            rotated_rooms = day_rooms[day_idx % len(day_rooms):] + day_rooms[:day_idx % len(day_rooms)]
+            for rn, room_name in zip(extra_rns, rotated_rooms):
+                room = area_map.get(room_name)
+                if room and rn.id not in assigned:
+                    place(rn, room, 420)
+
+        # -- Fill remaining procedure room slots (2nd person) with GI techs --
+        for room_name in day_rooms:
+            room = area_map.get(room_name)
+            if not room:
+                continue
+            size = room_size[room_name]
+            in_room = placed.get(room.id, 0)
+            while in_room < size and gi_ptr < len(gi_pool):
+                gt = gi_pool[gi_ptr]
+                gi_ptr += 1
+                if gt.id not in assigned:
+                    place(gt, room, gt.start if gt.start is not None else 450)
+                    in_room += 1
+            if in_room < size:
+                warnings.append(f"{date_str}: {room_name} short-staffed ({in_room}/{size})")
+
+        # Coverage checks
+        for area_name, req in rules.slot_counts.items():
+            a = area_map.get(area_name)
+            if a:
+                n = placed.get(a.id, 0)
+                if n < req:
+                    warnings.append(f"{date_str}: {area_name} has {n}/{req} RNs -- add per diem if needed")
+
+    # -- Back to the shift dict API --
+    all_shifts = [
+        {
+            'staff_id':   a.member.id,
+            'area_id':    a.area_id,
+            'date':       day_strs[a.day],
+            'start_time': _hhmm(a.start),
+            'end_time':   _hhmm(a.start + a.member.shift_minutes),
+        }
+        for a in placements
+    ]
+    return all_shifts, warnings
+
+
+# -- Snapshots --
+
+def _json_text(value):
+    """Rules and day lists are stored as JSON text on the models; snapshots may hold either form."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+def _json_value(text):
+    return json.loads(text) if text else None
+
+
+def snapshot_from_inputs(week_start, staff_list, area_list, time_off_days, rules_json=None, active_rooms=None):
+    """A JSON-ready snapshot of one clinic-week."""
+    return {
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'rules': _json_value(rules_json),
+        'staff': [
+            {
+                'id': s.id, 'name': s.name, 'role': s.role,
+                'shift_length': s.shift_length, 'days_per_week': s.days_per_week,
+                'start_time': s.start_time.strftime('%H:%M') if s.start_time else None,
+                'is_per_diem': bool(s.is_per_diem),
+                'required_days_off': _json_value(s.required_days_off),
+                'flexible_days_off': _json_value(s.flexible_days_off),
+            }
+            for s in staff_list
+        ],
+        'areas': [
+            {
+                'id': a.id, 'name': a.name,
+                'required_rn_count': a.required_rn_count or 0,
+                'required_tech_count': a.required_tech_count or 0,
+                'required_scope_tech_count': a.required_scope_tech_count or 0,
+                'rules': _json_value(a.rules),
+            }
+            for a in area_list
+        ],
+        'time_off': [{'staff_id': staff_id, 'date': d.strftime('%Y-%m-%d')} for staff_id, d in sorted(time_off_days)],
+        'active_rooms': active_rooms,
+    }
+
+
+def run_snapshot(snapshot):
+    """Generate one snapshot. Returns (week_start, shifts, warnings)."""
+    week_start = datetime.strptime(snapshot['week_start'], '%Y-%m-%d').date()
+    staff_list = [
+        StaffInput(
+            s['id'], s['name'], s['role'], s['shift_length'], s['days_per_week'],
+            datetime.strptime(s['start_time'], '%H:%M').time() if s.get('start_time') else None,
+            bool(s.get('is_per_diem')),
+            _json_text(s.get('required_days_off')), _json_text(s.get('flexible_days_off')),
+        )
+        for s in snapshot['staff']
+    ]
+    area_list = [
+        AreaInput(
+            a['id'], a['name'], a.get('required_rn_count') or 0, a.get('required_tech_count') or 0,
+            a.get('required_scope_tech_count') or 0, _json_text(a.get('rules')),
+        )
+        for a in snapshot['areas']
+    ]
+    time_off_days = {(t['staff_id'], datetime.strptime(t['date'], '%Y-%m-%d').date())
+                     for t in snapshot.get('time_off') or ()}
+    rules = compile_clinic_rules(_json_text(snapshot.get('rules')))
+    active_rooms = snapshot.get('active_rooms')
+    if isinstance(active_rooms, str):
+        active_rooms = json.loads(active_rooms)
+    shifts, warnings = build_weekly_schedule(
+        week_start, staff_list, area_list, time_off_days, rules, active_rooms
+    )
+    return snapshot['week_start'], shifts, warnings
+
+
+def read_snapshots(path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open(path) as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def write_snapshots(snapshots, path):
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Free-form rules are kept as JSON text so every row has the same schema
+        rows = [dict(s, rules=_json_text(s['rules']), active_rooms=_json_text(s.get('active_rooms')),
+                     areas=[dict(a, rules=_json_text(a['rules'])) for a in s['areas']])
+                for s in snapshots]
+        pq.write_table(pa.Table.from_pylist(rows), path)
+    else:
+        with open(path, 'w') as f:
+            json.dump(snapshots, f)
+
+
+def write_results(results, path):
+    """JSON: one {week_start, shifts, warnings} per snapshot. Parquet: one row per shift."""
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        rows = [dict(shift, snapshot=i) for i, (_, shifts, _) in enumerate(results) for shift in shifts]
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        return
+    payload = [{'week_start': w, 'shifts': shifts, 'warnings': warnings} for w, shifts, warnings in results]
+    if path == '-':
+        json.dump(payload, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate schedules from snapshot files, no database needed')
+    parser.add_argument('inputs', nargs='+', help='Snapshot files (.json or .parquet)')
+    parser.add_argument('-o', '--output', help='Write results here (.json, .parquet, or - for stdout)')
+    parser.add_argument('--repeat', type=int, default=1, help='Run every snapshot N times and report timing')
+    parser.add_argument('--profile', action='store_true', help='Print the top of a cProfile run')
+    args = parser.parse_args(argv)
+
+    snapshots = [snapshot for path in args.inputs for snapshot in read_snapshots(path)]
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    started = timer.perf_counter()
+    for _ in range(max(args.repeat, 1)):
+        results = [run_snapshot(snapshot) for snapshot in snapshots]
+    elapsed = timer.perf_counter() - started
+
+    if args.profile:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+
+    runs = len(snapshots) * max(args.repeat, 1)
+    shifts = sum(len(r[1]) for r in results)
+    print(f"{len(snapshots)} snapshot(s), {shifts} shifts, {runs} run(s) in {elapsed * 1000:.1f} ms "
+          f"({elapsed / runs * 1000:.3f} ms per clinic-week)", file=sys.stderr)
+    if args.output:
+        write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
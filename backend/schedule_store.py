@@ -0,0 +1,128 @@
+"""
+AISuggestion storage: keyframe + delta snapshots with a retention policy.
+
+The first suggestion for a clinic/week is stored as a full compressed
+snapshot (a keyframe).  Later generations for the same week are stored as
+a delta against that keyframe while the delta stays small; otherwise they
+become the new keyframe.  Chains are therefore at most one delta deep.
+
+Rows written before this format existed still have the JSON in
+suggested_schedule and are read from there.
+"""
+
+import json
+from datetime import date, timedelta
+from flask import current_app
+from db import db
+from models import AISuggestion, Shift
+from schedule_codec import to_rows, from_rows, encode_snapshot, encode_delta, decode
+
+# Store a delta only while it is at most this fraction of a full snapshot
+DELTA_MAX_RATIO = 0.5
+
+
+def _latest_keyframe(clinic_id, week_start):
+    return AISuggestion.query.filter(
+        AISuggestion.clinic_id == clinic_id,
+        AISuggestion.week_start_date == week_start,
+        AISuggestion.schedule_data.isnot(None),
+        AISuggestion.base_suggestion_id.is_(None)
+    ).order_by(AISuggestion.id.desc()).first()
+
+
+def _rows(suggestion):
+    if suggestion.schedule_data is None:
+        return to_rows(json.loads(suggestion.suggested_schedule or '[]'), suggestion.week_start_date)
+    if suggestion.base_suggestion_id is None:
+        return decode(suggestion.schedule_data)
+    base = db.session.get(AISuggestion, suggestion.base_suggestion_id)
+    return decode(suggestion.schedule_data, decode(base.schedule_data))
+
+
+def load_suggestion_shifts(suggestion):
+    """Shift dicts for a stored suggestion, whatever its storage format."""
+    if suggestion.schedule_data is None:
+        return json.loads(suggestion.suggested_schedule or '[]')
+    return from_rows(_rows(suggestion), suggestion.week_start_date)
+
+
+def save_suggestion(clinic_id, week_start, shifts, **fields):
+    """Store a generated schedule as a keyframe or a delta; the caller commits."""
+    rows = to_rows(shifts, week_start)
+    full = encode_snapshot(rows)
+    data, base_id = full, None
+
+    keyframe = _latest_keyframe(clinic_id, week_start)
+    if keyframe is not None:
+        delta = encode_delta(decode(keyframe.schedule_data), rows)
+        if len(delta) <= len(full) * DELTA_MAX_RATIO:
+            data, base_id = delta, keyframe.id
+
+    suggestion = AISuggestion(
+        clinic_id=clinic_id,
+        week_start_date=week_start,
+        schedule_data=data,
+        base_suggestion_id=base_id,
+        **fields
+    )
+    db.session.add(suggestion)
+    db.session.flush()
+
+    prune_suggestions(clinic_id, week_start)
+    return suggestion
+
+
+def prune_suggestions(clinic_id, week_start):
+    """
+    Keep storage bounded:
+      - per week, only the newest AI_SUGGESTION_KEEP_PER_WEEK unaccepted suggestions
+      - nothing unaccepted for weeks older than AI_SUGGESTION_RETENTION_DAYS
+    Accepted suggestions, and keyframes that a kept row still depends on, are never removed.
+    """
+    keep = current_app.config.get('AI_SUGGESTION_KEEP_PER_WEEK', 10)
+    cutoff = date.today() - timedelta(days=current_app.config.get('AI_SUGGESTION_RETENTION_DAYS', 90))
+
+    week_rows = AISuggestion.query.filter(
+        AISuggestion.clinic_id == clinic_id,
+        db.or_(AISuggestion.week_start_date == week_start, AISuggestion.week_start_date < cutoff)
+    ).with_entities(
+        AISuggestion.id, AISuggestion.week_start_date, AISuggestion.accepted, AISuggestion.base_suggestion_id
+    ).order_by(AISuggestion.id.desc()).all()
+
+    doomed = set()
+    kept_this_week = 0
+    for row in week_rows:
+        if row.accepted:
+            continue
+        if row.week_start_date < cutoff:
+            doomed.add(row.id)
+        elif kept_this_week >= keep:
+            doomed.add(row.id)
+        else:
+            kept_this_week += 1
+
+    still_needed = {row.base_suggestion_id for row in week_rows
+                    if row.id not in doomed and row.base_suggestion_id}
+    doomed -= still_needed
+    if doomed:
+        AISuggestion.query.filter(AISuggestion.id.in_(doomed)).delete(synchronize_session=False)
+    return len(doomed)
+
+
+def live_week_shifts(clinic_id, week_start):
+    """Current shifts for the Mon-Fri week as shift dicts."""
+    shifts = Shift.query.filter(
+        Shift.clinic_id == clinic_id,
+        Shift.date >= week_start,
+        Shift.date <= week_start + timedelta(days=4)
+    ).all()
+    return [
+        {
+            'staff_id':   s.staff_id,
+            'area_id':    s.area_id,
+            'date':       s.date.strftime('%Y-%m-%d'),
+            'start_time': s.start_time.strftime('%H:%M'),
+            'end_time':   s.end_time.strftime('%H:%M'),
+        }
+        for s in shifts
+    ]
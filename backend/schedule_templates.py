@@ -0,0 +1,169 @@
+"""
+Recurring weekly schedule templates.
+
+A template is one week of (staff, area, weekday, start, end) rows stored
+with schedule_codec, with the weekday as the day offset.  Applying it to
+weeks X..Y never builds the whole range in memory:
+
+  - the rows are expanded week by week through a generator
+  - each candidate shift is checked against lookups loaded once for the
+    whole range (active staff and their required days off, approved
+    time-off, shifts that already exist) and against the same staff/area
+    rules as POST /shifts, and skipped, with a reason, if it would conflict
+  - the survivors are inserted in fixed-size executemany batches
+
+so rolling out a quarter costs a handful of queries plus one INSERT per
+batch, and the number of weeks per request is capped.
+"""
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from db import db
+from models import Shift, Staff, StaffArea
+from coverage import rebuild_coverage
+from schedule_codec import to_rows, from_rows, encode_snapshot, decode
+from schedule_store import live_week_shifts
+from rules import clinic_rules
+from utils import get_time_off_days, shift_rule_errors
+from week_context import WEEKDAYS, DAY_INDEX, days_mask, week_of
+
+TEMPLATE_EPOCH = date(2001, 1, 1)  # a Monday; template rows are dated in this week
+INSERT_BATCH_SIZE = 1000
+
+
+def _weekday_index(value):
+    """Schedules are Mon-Fri, so templates are too."""
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 4:
+        return value
+    if value in WEEKDAYS[:5]:
+        return DAY_INDEX[value]
+    raise ValueError(f"weekday must be 0-4 or one of: {', '.join(WEEKDAYS[:5])}")
+
+
+def encode_template(shifts):
+    """
+    Shift dicts with a weekday instead of a date
+    ({'staff_id', 'area_id', 'weekday', 'start_time', 'end_time'}) -> (blob, count).
+    """
+    dated = []
+    for shift in shifts:
+        day = TEMPLATE_EPOCH + timedelta(days=_weekday_index(shift.get('weekday')))
+        start = datetime.strptime(shift['start_time'], '%H:%M')
+        end = datetime.strptime(shift['end_time'], '%H:%M')
+        if end <= start:
+            raise ValueError("end_time must be after start_time")
+        dated.append(dict(shift, date=day.strftime('%Y-%m-%d')))
+    rows = to_rows(dated, TEMPLATE_EPOCH)
+    return encode_snapshot(rows), len(rows)
+
+
+def encode_week(clinic_id, week_start):
+    """Capture the live Mon-Fri week as template data."""
+    rows = to_rows(live_week_shifts(clinic_id, week_start), week_start)
+    return encode_snapshot(rows), len(rows)
+
+
+def template_shifts(template):
+    """Template rows as shift dicts with weekday names."""
+    shifts = from_rows(decode(template.template_data), TEMPLATE_EPOCH)
+    for shift in shifts:
+        day = datetime.strptime(shift.pop('date'), '%Y-%m-%d').date()
+        shift['weekday'] = WEEKDAYS[(day - TEMPLATE_EPOCH).days]
+    return shifts
+
+
+def expand(rows, week_starts):
+    """Lazily yield (staff_id, area_id, date, start_minute, end_minute) for every week."""
+    for week_start in week_starts:
+        for staff_id, area_id, weekday, start, end in rows:
+            yield staff_id, area_id, week_start + timedelta(days=weekday), start, end
+
+
+def _time(minutes):
+    return datetime.strptime(f"{minutes // 60:02d}:{minutes % 60:02d}", '%H:%M').time()
+
+
+def plan_shifts(clinic_id, rows, week_starts, skipped):
+    """
+    Generator of insertable shift rows for the weeks; conflicts are counted
+    in `skipped` (a Counter) instead of being yielded.  Shifts that break a
+    staff or area rule (shift length, area restrictions, start times, days
+    per week...) are skipped as 'rule_violation', as POST /shifts would refuse them.
+    """
+    first, last = week_starts[0], week_starts[-1] + timedelta(days=4)
+    staff = {s.id: s for s in Staff.query.filter_by(clinic_id=clinic_id, is_active=True)}
+    days_off = {staff_id: days_mask(s.required_days_off) for staff_id, s in staff.items()}
+    areas = {a.id: a for a in StaffArea.query.filter(StaffArea.clinic_id == clinic_id)}
+    time_off = get_time_off_days(clinic_id, first, last)
+    rules = clinic_rules(clinic_id)
+    # Each staff member's shifts per week, for the weekly rules; planned ones join as they're accepted
+    week_shifts = {}
+    for row in db.session.query(Shift.staff_id, Shift.area_id, Shift.date, Shift.start_time, Shift.end_time).filter(
+        Shift.clinic_id == clinic_id,
+        Shift.date.between(first, last)
+    ):
+        week_shifts.setdefault((row.staff_id, week_of(row.date).monday), []).append(row)
+    occupied = {(staff_id, row.date) for (staff_id, _), shifts in week_shifts.items() for row in shifts}
+
+    for staff_id, area_id, day, start, end in expand(rows, week_starts):
+        if staff_id not in staff or area_id not in areas:
+            skipped['inactive_staff_or_area'] += 1
+        elif (staff_id, day) in time_off:
+            skipped['time_off'] += 1
+        elif days_off[staff_id] & (1 << day.weekday()):
+            skipped['required_day_off'] += 1
+        elif (staff_id, day) in occupied:
+            skipped['already_scheduled'] += 1
+        else:
+            week = week_of(day)
+            others = week_shifts.setdefault((staff_id, week.monday), [])
+            shift = SimpleNamespace(staff_id=staff_id, area_id=area_id, date=day,
+                                    start_time=_time(start), end_time=_time(end))
+            if shift_rule_errors(staff[staff_id], areas[area_id], day, shift.start_time, shift.end_time,
+                                 others, False, check_double_booking=False, rules=rules, week=week):
+                skipped['rule_violation'] += 1
+                continue
+            occupied.add((staff_id, day))  # a template row per staff/day wins once
+            others.append(shift)
+            yield {
+                'clinic_id': clinic_id,
+                'staff_id': staff_id,
+                'area_id': area_id,
+                'date': day,
+                'start_time': shift.start_time,
+                'end_time': shift.end_time,
+            }
+
+
+def apply_template(template, week_starts, dry_run=False):
+    """
+    Insert the template's non-conflicting shifts for each Monday in
+    `week_starts` and rebuild coverage for the range. The caller commits.
+    Raises IntegrityError if another request booked the same staff/day meanwhile.
+    """
+    rows = decode(template.template_data)
+    skipped = Counter()
+    planned = plan_shifts(template.clinic_id, rows, week_starts, skipped)
+
+    created = 0
+    while True:
+        batch = list(islice(planned, INSERT_BATCH_SIZE))
+        if not batch:
+            break
+        if not dry_run:
+            db.session.execute(insert(Shift), batch)
+        created += len(batch)
+
+    if created and not dry_run:
+        rebuild_coverage(template.clinic_id, week_starts[0], week_starts[-1] + timedelta(days=4))
+    return {
+        'created': created,
+        'skipped': dict(skipped),
+        'weeks': [w.strftime('%Y-%m-%d') for w in week_starts],
+        'dry_run': dry_run
+    }
@@ -0,0 +1,291 @@
+"""
+What-if staffing simulations: "what happens to coverage over the next few
+weeks if we approve these requests / hire this per-diem / close a room?"
+
+The clinic's staff, areas, approved and pending time-off and rules are
+loaded once into an immutable Baseline (tuples and frozensets of plain
+StaffInput/AreaInput rows).  A scenario never copies or mutates it: it is
+a small overlay (staff removed, staff added, extra time-off, rooms
+closed), and only the pieces a scenario actually changes are rebuilt when
+it runs.  Each scenario then goes through the same engine as real
+generation (schedule_engine.build_weekly_schedule) plus the area coverage
+rules, week by week, entirely in memory -- nothing is written.  The
+generator leaves per-diem staff out, so hypothetical per-diem hires are
+then called in to the areas still short, as an admin would.
+
+Scenarios are independent and CPU-bound, so several run in parallel in a
+small per-process pool of worker processes (SIMULATION_WORKERS; 0 runs
+them inline).  Workers only import this module and the engine.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from rules import area_rules, compile_clinic_rules
+from schedule_engine import StaffInput, AreaInput, build_weekly_schedule, make_shift
+
+MAX_WEEKS = 6
+MAX_SCENARIOS = 8
+UNCOVERED_LIMIT = 50  # uncovered area-days listed per scenario
+
+
+@dataclass(frozen=True)
+class Baseline:
+    clinic_id: int
+    start_week: object
+    weeks: int
+    rules: str
+    staff: tuple
+    areas: tuple
+    time_off: frozenset      # (staff_id, date) blocked by approved time-off
+    pending: tuple           # (request_id, staff_id, first, last) pending requests in the horizon
+
+
+@dataclass
+class Scenario:
+    name: str
+    remove_staff: frozenset = frozenset()
+    add_staff: tuple = ()
+    approve_time_off: tuple = ()
+    closed_rooms: frozenset = frozenset()
+    active_rooms: dict = field(default_factory=dict)
+
+
+def load_baseline(clinic_id, start_week, weeks):
+    """Everything a simulation reads, in four queries."""
+    from db import db
+    from models import Clinic, Staff, StaffArea, TimeOffRequest
+    from utils import get_time_off_days
+
+    end = start_week + timedelta(weeks=weeks) - timedelta(days=3)  # through the last Friday
+    staff = tuple(StaffInput(*row) for row in db.session.query(
+        Staff.id, Staff.name, Staff.role, Staff.shift_length, Staff.days_per_week,
+        Staff.start_time, Staff.is_per_diem, Staff.required_days_off, Staff.flexible_days_off
+    ).filter(Staff.clinic_id == clinic_id, Staff.is_active.is_(True)).order_by(Staff.id))
+    areas = tuple(AreaInput(*row) for row in db.session.query(
+        StaffArea.id, StaffArea.name, StaffArea.required_rn_count, StaffArea.required_tech_count,
+        StaffArea.required_scope_tech_count, StaffArea.rules
+    ).filter(StaffArea.clinic_id == clinic_id).order_by(StaffArea.id))
+    pending = tuple(db.session.query(
+        TimeOffRequest.id, TimeOffRequest.staff_id, TimeOffRequest.start_date, TimeOffRequest.end_date
+    ).filter(
+        TimeOffRequest.clinic_id == clinic_id,
+        TimeOffRequest.status == 'pending',
+        TimeOffRequest.overlaps(start_week, end)
+    ).order_by(TimeOffRequest.id))
+    rules = db.session.query(Clinic.scheduling_rules).filter(Clinic.id == clinic_id).scalar()
+    return Baseline(clinic_id, start_week, weeks, rules, staff, areas,
+                    frozenset(get_time_off_days(clinic_id, start_week, end)), tuple(map(tuple, pending)))
+
+
+def _ids(spec, key, name):
+    values = spec.get(key) or []
+    if not isinstance(values, list) or any(not isinstance(v, int) or isinstance(v, bool) for v in values):
+        raise ValueError(f"{name}: {key} must be a list of ids")
+    return values
+
+
+def _area_names(values, key, name, known):
+    if not isinstance(values, list) or any(not isinstance(v, str) for v in values):
+        raise ValueError(f"{name}: {key} must be a list of area names")
+    unknown = set(values) - known
+    if unknown:
+        raise ValueError(f"{name}: unknown rooms {sorted(unknown)}")
+    return values
+
+
+def parse_scenario(spec, baseline, index):
+    """
+    A Scenario from its JSON spec, checked against the baseline.
+    Raises ValueError with a message fit for the API.
+    """
+    name = spec.get('name') or f'Scenario {index}'
+    staff_ids = {s.id for s in baseline.staff}
+    pending_ids = {p[0] for p in baseline.pending}
+    area_names = {a.name for a in baseline.areas}
+
+    remove = frozenset(_ids(spec, 'remove_staff', name))
+    if remove - staff_ids:
+        raise ValueError(f"{name}: unknown or inactive staff ids {sorted(remove - staff_ids)}")
+    approve = tuple(_ids(spec, 'approve_time_off', name))
+    if set(approve) - pending_ids:
+        raise ValueError(f"{name}: {sorted(set(approve) - pending_ids)} are not pending requests in this period")
+    closed = frozenset(_area_names(spec.get('closed_rooms') or [], 'closed_rooms', name, area_names))
+    active = spec.get('active_rooms') or {}
+    if not isinstance(active, dict):
+        raise ValueError(f"{name}: active_rooms must map dates to lists of area names")
+    active = {day: frozenset(_area_names(rooms, f'active_rooms[{day}]', name, area_names))
+              for day, rooms in active.items()}
+
+    added = []
+    for i, person in enumerate(spec.get('add_staff') or (), start=1):
+        try:
+            start_time = person.get('start_time')
+            added.append(StaffInput(
+                -i,  # hypothetical staff get negative ids so they never clash with real ones
+                person.get('name') or f'New hire {i}',
+                person['role'],
+                int(person['shift_length']),
+                int(person.get('days_per_week', 5)),
+                datetime.strptime(start_time, '%H:%M').time() if start_time else None,
+                bool(person.get('is_per_diem', False)),
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{name}: invalid add_staff entry {i}: {e}")
+        if added[-1].role not in ('RN', 'GI_Tech', 'Scope_Tech'):
+            raise ValueError(f"{name}: add_staff role must be RN, GI_Tech or Scope_Tech")
+
+    return Scenario(name, remove, tuple(added), approve, closed, active)
+
+
+def _scenario_inputs(baseline, scenario):
+    """Staff list and time-off set for a scenario, sharing the baseline's objects where unchanged."""
+    staff = baseline.staff
+    if scenario.remove_staff or scenario.add_staff:
+        staff = tuple(s for s in baseline.staff if s.id not in scenario.remove_staff) + scenario.add_staff
+
+    time_off = baseline.time_off
+    if scenario.approve_time_off:
+        approved = set(scenario.approve_time_off)
+        extra = set()
+        for request_id, staff_id, first, last in baseline.pending:
+            if request_id in approved:
+                day = first
+                while day <= last:
+                    extra.add((staff_id, day))
+                    day += timedelta(days=1)
+        time_off = time_off | extra
+    return staff, time_off
+
+
+def _day_rooms(procedure_rooms, scenario, date_str):
+    if date_str in scenario.active_rooms:
+        rooms = [r for r in procedure_rooms if r in scenario.active_rooms[date_str]]
+    else:
+        rooms = list(procedure_rooms)
+    return [r for r in rooms if r not in scenario.closed_rooms]
+
+
+def _call_in(per_diem, days, active_rooms, counts, compiled, area_by_id, procedure_rooms, rules):
+    """
+    The generator never schedules per-diem staff on its own; admins call them
+    in where a day is short.  Do that for a scenario's hypothetical per-diem
+    hires: each fills the first short area that takes their role, up to
+    days_per_week days. Updates counts; returns the added shifts.
+    """
+    added = []
+    for person in per_diem:
+        worked = 0
+        for day in days:
+            if worked >= person.days_per_week:
+                break
+            date_str = day.strftime('%Y-%m-%d')
+            for area_id, area_compiled in compiled.items():
+                name = area_by_id[area_id].name
+                if name in procedure_rooms and name not in active_rooms[date_str]:
+                    continue
+                by_role = counts.setdefault((area_id, date_str), {})
+                if person.role not in area_compiled.roles or not area_compiled.warnings(by_role):
+                    continue
+                slot = next((start for start, slot_area in rules.rn_slots if slot_area == name), None)
+                start = person.start_time.strftime('%H:%M') if person.start_time else (
+                    slot if person.role == 'RN' and slot else '07:00')
+                added.append(make_shift(person, area_by_id[area_id], date_str, start))
+                by_role[person.role] = by_role.get(person.role, 0) + 1
+                worked += 1
+                break
+    return added
+
+
+def run_scenario(baseline, scenario):
+    """Generate and check every week of the horizon for one scenario. Pure; runs in a worker."""
+    rules = compile_clinic_rules(baseline.rules)
+    staff, time_off = _scenario_inputs(baseline, scenario)
+    role_of = {s.id: s.role for s in staff}
+    area_by_id = {a.id: a for a in baseline.areas}
+    compiled = {a.id: area_rules(a) for a in baseline.areas}
+    procedure_rooms = set(rules.procedure_rooms)
+    per_diem_hires = [s for s in scenario.add_staff if s.is_per_diem]
+
+    totals = {'shifts': 0, 'generator_warnings': 0, 'area_days': 0, 'uncovered_area_days': 0}
+    by_week, uncovered = [], []
+    for w in range(baseline.weeks):
+        week_start = baseline.start_week + timedelta(weeks=w)
+        days = [week_start + timedelta(days=i) for i in range(5)]
+        active_rooms = {d.strftime('%Y-%m-%d'): _day_rooms(rules.procedure_rooms, scenario, d.strftime('%Y-%m-%d'))
+                        for d in days}
+        week_time_off = {(s, d) for s, d in time_off if week_start <= d <= days[-1]}
+        shifts, warnings = build_weekly_schedule(week_start, staff, baseline.areas, week_time_off, rules, active_rooms)
+
+        counts = {}
+        for shift in shifts:
+            by_role = counts.setdefault((shift['area_id'], shift['date']), {})
+            role = role_of[shift['staff_id']]
+            by_role[role] = by_role.get(role, 0) + 1
+        shifts += _call_in(per_diem_hires, days, active_rooms, counts, compiled, area_by_id, procedure_rooms, rules)
+
+        week_uncovered = 0
+        for day in days:
+            date_str = day.strftime('%Y-%m-%d')
+            open_rooms = active_rooms[date_str]
+            for area_id, area_compiled in compiled.items():
+                name = area_by_id[area_id].name
+                if not area_compiled.requirements or (name in procedure_rooms and name not in open_rooms):
+                    continue
+                totals['area_days'] += 1
+                area_warnings = area_compiled.warnings(counts.get((area_id, date_str), {}))
+                if area_warnings:
+                    week_uncovered += 1
+                    if len(uncovered) < UNCOVERED_LIMIT:
+                        uncovered.append({'date': date_str, 'area': name, 'warnings': area_warnings})
+
+        totals['shifts'] += len(shifts)
+        totals['generator_warnings'] += len(warnings)
+        totals['uncovered_area_days'] += week_uncovered
+        by_week.append({'week_start': week_start.strftime('%Y-%m-%d'), 'shifts': len(shifts),
+                        'generator_warnings': len(warnings), 'uncovered_area_days': week_uncovered})
+
+    return dict(totals, name=scenario.name, by_week=by_week, uncovered=uncovered)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: request threads may be running, and workers need nothing from the app
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def run_scenarios(baseline, scenarios, workers=0):
+    """Results in scenario order, with each scenario's change against the first (the baseline)."""
+    if workers and len(scenarios) > 1:
+        try:
+            results = list(_get_pool(workers).map(run_scenario, [baseline] * len(scenarios), scenarios))
+        except BrokenProcessPool:
+            _reset_pool()
+            results = [run_scenario(baseline, s) for s in scenarios]
+    else:
+        results = [run_scenario(baseline, s) for s in scenarios]
+
+    base = results[0]
+    for result in results[1:]:
+        result['change'] = {key: result[key] - base[key]
+                            for key in ('shifts', 'generator_warnings', 'uncovered_area_days')}
+    return results
@@ -0,0 +1,93 @@
+from datetime import date
+from types import SimpleNamespace
+
+from availability import WeekAvailability, area_roles, days_mask, month_bitset, is_available, rank_fill_candidates
+from conftest import make_staff
+
+MONDAY = date(2025, 10, 27)
+TUESDAY = date(2025, 10, 28)
+
+
+def test_days_mask():
+    assert days_mask('["Monday", "Sunday"]') == 0b1000001
+    assert days_mask(None) == 0
+
+
+def test_candidates_are_filtered_and_ranked():
+    roster = [
+        make_staff(1, 'Holder'),
+        make_staff(2, 'Busy'),                                       # already works Monday
+        make_staff(3, 'Full'),                                       # 4 of 4 days used
+        make_staff(4, 'Off', required_days_off='["Monday"]'),
+        make_staff(5, 'Away'),                                       # approved time-off
+        make_staff(6, 'Tech', role='GI_Tech'),
+        make_staff(7, 'Eight', shift_length=8),
+        make_staff(8, 'Restricted', area_restrictions='["Recovery"]'),
+        make_staff(9, 'Zed'),
+        make_staff(10, 'Amy'),
+        make_staff(11, 'Regular'),                                   # worked Admitting Tuesday
+    ]
+    shifts = [(1, MONDAY, 1), (2, MONDAY, 2), (11, TUESDAY, 1)]
+    shifts += [(3, date(2025, 10, 28 + i), 2) for i in range(4)]
+    week = WeekAvailability(MONDAY, roster, shifts, {(5, MONDAY)})
+
+    ranked = week.candidates('RN', MONDAY, 10, 1, 'Admitting', exclude={1})
+    assert [c['staff_name'] for c in ranked] == ['Amy', 'Zed', 'Regular']
+    assert ranked[2]['worked_area_this_week'] and ranked[2]['days_scheduled'] == 1
+
+    assert week.ineligible_reason(3, 'RN', MONDAY, 10, 'Admitting') == 'Full already works 4 days this week'
+    assert week.ineligible_reason(8, 'RN', MONDAY, 10, 'Recovery') is None
+
+
+def test_area_roles_follow_the_area_rules():
+    def area(name, rules=None, **counts):
+        fields = dict(required_rn_count=0, required_tech_count=0, required_scope_tech_count=0)
+        return SimpleNamespace(name=name, rules=rules, **dict(fields, **counts))
+
+    assert area_roles(area('Procedure Room 1', required_tech_count=2)) == ['RN', 'GI_Tech']
+    assert area_roles(area('Scope Room')) == ['GI_Tech', 'Scope_Tech']
+    assert area_roles(area('Admitting', required_rn_count=2)) == ['RN']
+    custom = '{"requirements": [{"roles": ["Scope_Tech"], "count": 1}]}'
+    assert area_roles(area('Admitting', rules=custom, required_rn_count=2)) == ['Scope_Tech']
+    assert area_roles(area('Float')) == ['RN', 'GI_Tech', 'Scope_Tech']
+
+
+def test_month_bitset():
+    bits = month_bitset([date(2025, 10, 1), date(2025, 10, 31)])
+    assert is_available(bits, date(2025, 10, 31)) and is_available(bits, date(2025, 10, 1))
+    assert not is_available(bits, date(2025, 10, 2))
+    assert not is_available(None, date(2025, 10, 1))
+
+
+def test_fill_candidates_prefer_available_per_diem_and_fewer_recent_hours():
+    area = SimpleNamespace(name='Admitting')
+    wednesday = date(2025, 10, 29)
+    rows = [
+        # staff, availability bitset, working, week days, recent shifts, on time-off
+        (make_staff(1, 'Working'), None, 1, 1, 0, False),
+        (make_staff(2, 'Away'), None, 0, 0, 0, True),
+        (make_staff(3, 'Busy week'), None, 0, 4, 4, False),
+        (make_staff(4, 'Rested'), None, 0, 1, 1, False),
+        (make_staff(5, 'Tired'), None, 0, 2, 6, False),
+        (make_staff(6, 'Per diem', is_per_diem=True), month_bitset([wednesday]), 0, 0, 3, False),
+        (make_staff(7, 'Unmarked', is_per_diem=True), 0, 0, 0, 0, False),
+        (make_staff(8, 'Tech', role='GI_Tech'), None, 0, 0, 0, False),
+    ]
+    ranked = rank_fill_candidates(rows, area, wednesday, ['RN'])
+    assert [c['staff_name'] for c in ranked] == ['Per diem', 'Rested', 'Tired', 'Unmarked', 'Busy week']
+    assert ranked[1]['recent_hours'] == 10
+
+
+def test_availability_windows_stay_inside_the_month(client, clinic_admin):
+    url = f'/staff/{clinic_admin.staff_ids[0]}/availability'
+    saved = client.put(url, headers=clinic_admin.headers, json={
+        'month': '2026-11', 'dates': ['2026-11-30'],
+        'windows': [{'start_date': '2026-10-20', 'end_date': '2026-11-02'}],
+    })
+    assert saved.status_code == 200
+    assert saved.get_json()['dates'] == ['2026-11-01', '2026-11-02', '2026-11-30']
+
+    for start, end in [('0001-01-01', '9999-12-31'), ('2026-11-10', '2026-11-03'), ('2026-11-28', '2026-12-02')]:
+        response = client.put(url, headers=clinic_admin.headers, json={
+            'month': '2026-11', 'windows': [{'start_date': start, 'end_date': end}]})
+        assert response.status_code == 400
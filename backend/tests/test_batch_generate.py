@@ -0,0 +1,30 @@
+from datetime import date
+
+from schedule_engine import StaffInput, AreaInput
+from batch_generate import ClinicJob, generate_all, next_monday
+
+MONDAY = date(2026, 11, 2)
+
+
+def make_job(clinic_id):
+    areas = [AreaInput(1, 'Admitting', required_rn_count=2), AreaInput(2, 'Recovery', required_rn_count=2),
+             AreaInput(3, 'Scope Room', required_scope_tech_count=2)]
+    staff = [StaffInput(i, f'RN{i}', 'RN', 10, 5) for i in range(1, 5)]
+    staff += [StaffInput(10, 'Olga', 'Scope_Tech', 8, 5), StaffInput(11, 'Jesus', 'Scope_Tech', 8, 5)]
+    return ClinicJob(clinic_id, f'Clinic {clinic_id}', staff=staff, areas=areas, time_off={(1, MONDAY)})
+
+
+def test_batch_jobs_run_without_a_database():
+    results = generate_all([make_job(1), make_job(2)], MONDAY, workers=1)
+    by_clinic = {clinic_id: (shifts, warnings) for clinic_id, shifts, warnings, _ in results}
+
+    shifts, warnings = by_clinic[1]
+    assert len(shifts) == 29  # 6 staff x 5 days, less RN1's day off
+    assert not any(s['staff_id'] == 1 and s['date'] == '2026-11-02' for s in shifts)
+    assert warnings == ['2026-11-02: Recovery has 1/2 RNs -- add per diem if needed']
+    assert len(by_clinic[2][0]) == 29
+
+
+def test_next_monday():
+    assert next_monday(date(2026, 10, 19)) == date(2026, 10, 26)
+    assert next_monday(date(2026, 10, 25)) == date(2026, 10, 26)
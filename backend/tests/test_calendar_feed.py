@@ -0,0 +1,78 @@
+from datetime import date, datetime, time, timedelta
+
+from calendar_feed import FeedCache, feed_window, lookup_feed, redact_feed_token, render_ics
+from db import db
+from models import StaffArea
+
+
+def test_render_ics_events_and_line_rules():
+    shifts = [(7, date(2025, 3, 3), time(7, 0), time(17, 0), 'Procedure Room 1, East; ' + 'x' * 80)]
+    time_off = [(3, date(2025, 3, 5), date(2025, 3, 6), 'pto')]
+    body = render_ics('Ann', 1, shifts, time_off, datetime(2025, 3, 1, 12, 0))
+
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert 'UID:shift-7@clinic-1.scheduler' in body
+    assert 'DTSTART:20250303T070000\r\nDTEND:20250303T170000' in body
+    assert 'DTSTART;VALUE=DATE:20250305\r\nDTEND;VALUE=DATE:20250307' in body
+    assert 'SUMMARY:Procedure Room 1\\, East\\; ' in body
+    assert all(len(line.encode()) <= 75 for line in body.split('\r\n'))
+
+
+def test_feed_cache_is_keyed_by_etag():
+    cache = FeedCache(max_size=1)
+    cache.put(1, ('a', 'body', None))
+    assert cache.get(1, 'a')[1] == 'body'
+    assert cache.get(1, 'b') is None
+    cache.put(2, ('c', 'other', None))
+    assert cache.get(1, 'a') is None
+
+
+def test_feed_token_is_redacted_for_access_logs():
+    assert redact_feed_token('/calendar/s3cr3t-Tok_en.ics') == '/calendar/<token>.ics'
+    assert redact_feed_token('GET /calendar/abc.ics HTTP/1.1') == 'GET /calendar/<token>.ics HTTP/1.1'
+    assert redact_feed_token('/shifts/3') == '/shifts/3'
+
+
+def _feed_token(client, clinic_admin, staff_id):
+    response = client.post(f'/staff/{staff_id}/calendar-token', headers=clinic_admin.headers)
+    assert response.status_code == 201
+    return response.get_json()['token']
+
+
+def test_lookup_feed_etag_moves_with_shifts(client, clinic_admin):
+    staff_id = clinic_admin.staff_ids[0]
+    token = _feed_token(client, clinic_admin, staff_id)
+    start, end = feed_window(date.today(), 7, 30)
+
+    found = lookup_feed(token, start, end)
+    assert found[0] == staff_id
+    assert lookup_feed(token, start, end)[3] == found[3]
+    assert lookup_feed('not-a-token', start, end) is None
+
+    response = client.post('/shifts', headers=clinic_admin.headers, json={
+        'staff_id': staff_id, 'area_id': clinic_admin.area_ids[0],
+        'date': (date.today() + timedelta(days=1)).isoformat(), 'start_time': '06:15', 'end_time': '16:15'
+    })
+    assert response.status_code == 201
+    with_shift = lookup_feed(token, start, end)[3]
+    assert with_shift != found[3]
+
+    # The feed prints the area's name, so renaming it must invalidate cached copies
+    db.session.get(StaffArea, clinic_admin.area_ids[0]).name = 'Admitting (East)'
+    db.session.commit()
+    assert lookup_feed(token, start, end)[3] != with_shift
+
+
+def test_calendar_feed_honours_if_none_match(client, clinic_admin):
+    token = _feed_token(client, clinic_admin, clinic_admin.staff_ids[0])
+
+    first = client.get(f'/calendar/{token}.ics')
+    assert first.status_code == 200 and first.mimetype == 'text/calendar'
+    etag = first.headers['ETag']
+
+    cached = client.get(f'/calendar/{token}.ics', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.headers['ETag'] == etag and not cached.data
+
+    stale = client.get(f'/calendar/{token}.ics', headers={'If-None-Match': '"something-else"'})
+    assert stale.status_code == 200
+    assert client.get('/calendar/unknown.ics').status_code == 404
@@ -0,0 +1,77 @@
+import logging
+
+from events import EventBroker, create_broker, stream
+
+
+def test_publish_reaches_only_that_clinic():
+    broker = EventBroker()
+    mine = broker.subscribe(1)
+    other = broker.subscribe(2)
+
+    broker.publish(1, 'shift.deleted', {'id': 7})
+
+    event = mine.get(timeout=0.1)
+    assert event['type'] == 'shift.deleted' and event['data'] == {'id': 7}
+    assert other.get(timeout=0.01) is None
+
+
+def test_slow_subscriber_is_told_to_resync():
+    broker = EventBroker(queue_size=2)
+    subscription = broker.subscribe(1)
+    for i in range(3):
+        broker.publish(1, 'shift.deleted', {'id': i})
+    assert subscription.overflowed
+
+    lines = list(stream(subscription, broker, heartbeat=0.01, max_seconds=1))
+    assert lines[-1].startswith('event: resync')
+    assert broker.subscriber_count(1) == 0
+
+
+def test_replay_after_last_event_id():
+    broker = EventBroker(replay_size=10)
+    for i in range(3):
+        broker.publish(1, 'shift.deleted', {'id': i})
+    assert broker.subscribe(1).replay == []  # no Last-Event-ID, nothing replayed
+
+    recent = list(broker._recent[1])
+    subscription = broker.subscribe(1, last_event_id=recent[0]['id'])
+    assert [e['data']['id'] for e in subscription.replay] == [1, 2]
+
+    assert broker.subscribe(1, last_event_id='gone').needs_resync
+
+
+def test_stream_sends_heartbeat_and_closes_at_max_lifetime():
+    broker = EventBroker()
+    subscription = broker.subscribe(1)
+    lines = list(stream(subscription, broker, heartbeat=0.01, max_seconds=0.05))
+    assert lines[0].startswith('retry:')
+    assert ': heartbeat\n\n' in lines
+    assert broker.subscriber_count() == 0
+
+
+def test_in_process_broker_with_several_workers_is_an_error(monkeypatch, caplog):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    with caplog.at_level(logging.ERROR, logger='events'):
+        broker = create_broker(None)
+    assert type(broker) is EventBroker
+    assert 'EVENTS_REDIS_URL is not set' in caplog.text
+
+
+def test_subscribe_refuses_past_max_streams():
+    broker = EventBroker(max_streams=2)
+    first = broker.subscribe(1)
+    assert broker.subscribe(2) is not None
+    assert broker.subscribe(1) is None
+
+    broker.unsubscribe(first)
+    assert broker.subscribe(1) is not None
+
+
+def test_events_returns_503_when_streams_are_full(client, clinic_admin, monkeypatch):
+    from app import event_broker
+    monkeypatch.setattr(event_broker, 'max_streams', 0)
+
+    response = client.get('/events', headers=clinic_admin.headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert response.get_data(as_text=True).startswith('retry: ')
@@ -0,0 +1,47 @@
+import gzip
+from datetime import date
+
+import pytest
+
+from exports import COLUMNS, build_xlsx, csv_chunks
+
+
+def make_rows(n):
+    return ([f'2025-03-{i % 28 + 1:02d}', 'Monday', i, f'Staff "{i}"', 'RN', 'no',
+             'Admitting', '07:00', '17:00', '10', 'shift'] for i in range(n))
+
+
+def test_csv_is_chunked_and_quoted():
+    chunks = list(csv_chunks(make_rows(1200)))
+    assert len(chunks) == 3
+    text = b''.join(chunks).decode()
+    lines = text.splitlines()
+    assert lines[0] == ','.join(COLUMNS)
+    assert lines[1].startswith('2025-03-01,Monday,0,"Staff ""0""",RN')
+    assert len(lines) == 1201
+
+
+def test_gzip_matches_plain():
+    plain = b''.join(csv_chunks(make_rows(50)))
+    assert gzip.decompress(b''.join(csv_chunks(make_rows(50), compress=True))) == plain
+
+
+def test_xlsx_has_header_and_numeric_hours():
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.load_workbook(build_xlsx(make_rows(3)))
+    rows = list(workbook['Shifts'].values)
+    assert list(rows[0]) == COLUMNS
+    assert len(rows) == 4 and rows[1][9] == 10.0
+
+
+def test_csv_export_respects_gzip_q_zero(client, clinic_admin):
+    today = date.today().isoformat()
+    url = f'/exports/shifts.csv?start_date={today}&end_date={today}'
+
+    refused = client.get(url, headers=dict(clinic_admin.headers, **{'Accept-Encoding': 'gzip;q=0, identity'}))
+    assert refused.status_code == 200 and 'Content-Encoding' not in refused.headers
+    assert refused.data.decode().startswith(','.join(COLUMNS))
+
+    accepted = client.get(url, headers=dict(clinic_admin.headers, **{'Accept-Encoding': 'gzip, deflate'}))
+    assert accepted.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(accepted.data) == refused.data
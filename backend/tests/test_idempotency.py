@@ -0,0 +1,61 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from db import db
+from models import IdempotencyKey, Shift
+
+
+def shift_body(clinic_admin, staff_index=0):
+    return json.dumps({'staff_id': clinic_admin.staff_ids[staff_index], 'area_id': clinic_admin.area_ids[0],
+                       'date': '2026-11-02', 'start_time': '06:15', 'end_time': '16:15'})
+
+
+def post_shift(client, clinic_admin, key, body):
+    return client.post('/shifts', data=body, content_type='application/json',
+                       headers=dict(clinic_admin.headers, **{'Idempotency-Key': key}))
+
+
+def claim(clinic_admin, key, body, claimed_at):
+    """A placeholder row, as left by a request that is still running (or whose worker died)."""
+    request_hash = hashlib.sha256(b'POST' + b'/shifts' + body.encode()).hexdigest()
+    db.session.add(IdempotencyKey(user_id=clinic_admin.user_id, key=key, request_hash=request_hash,
+                                  created_at=claimed_at, expires_at=claimed_at + timedelta(days=1)))
+    db.session.commit()
+
+
+def test_retry_replays_the_stored_response(client, clinic_admin):
+    body = shift_body(clinic_admin)
+    first = post_shift(client, clinic_admin, 'replay-1', body)
+    again = post_shift(client, clinic_admin, 'replay-1', body)
+
+    assert first.status_code == again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+    assert Shift.query.count() == 1
+
+
+def test_same_key_with_a_different_body_is_rejected(client, clinic_admin):
+    post_shift(client, clinic_admin, 'mismatch-1', shift_body(clinic_admin))
+    response = post_shift(client, clinic_admin, 'mismatch-1', shift_body(clinic_admin, staff_index=1))
+    assert response.status_code == 422
+    assert Shift.query.count() == 1
+
+
+def test_claim_in_progress_is_a_conflict(client, clinic_admin):
+    body = shift_body(clinic_admin)
+    claim(clinic_admin, 'running-1', body, datetime.utcnow())
+
+    response = post_shift(client, clinic_admin, 'running-1', body)
+    assert response.status_code == 409 and response.headers['Retry-After'] == '1'
+    assert Shift.query.count() == 0
+
+
+def test_abandoned_claim_is_retaken_after_the_lease(client, clinic_admin, app):
+    body = shift_body(clinic_admin)
+    claim(clinic_admin, 'abandoned-1', body,
+          datetime.utcnow() - timedelta(seconds=app.config['IDEMPOTENCY_LEASE'] + 1))
+
+    response = post_shift(client, clinic_admin, 'abandoned-1', body)
+    assert response.status_code == 201
+    assert IdempotencyKey.query.filter_by(key='abandoned-1').one().status_code == 201
@@ -0,0 +1,111 @@
+import logging
+
+import pytest
+
+from rate_limit import SlidingWindowLimiter, MemoryStore, RedisStore
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_limit_within_window():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter('t', limit=3, window=60, clock=clock)
+
+    assert limiter.hit('1.2.3.4')[0]
+    assert limiter.hit('1.2.3.4')[0]
+    assert limiter.hit('1.2.3.4')[0]
+    allowed, retry_after = limiter.hit('1.2.3.4')
+    assert not allowed
+    assert retry_after > 0
+
+    # Other keys are unaffected
+    assert limiter.hit('5.6.7.8')[0]
+
+
+def test_previous_window_decays():
+    clock = FakeClock(now=600.0)
+    limiter = SlidingWindowLimiter('t', limit=4, window=60, clock=clock)
+    for _ in range(4):
+        limiter.hit('k')
+
+    # Early in the next window most of the previous count still applies
+    clock.now = 600.0 + 60 + 6
+    assert not limiter.check('k')[0]
+
+    # Two full windows later the key is clean again
+    clock.now = 600.0 + 180
+    assert limiter.check('k')[0]
+
+
+def test_check_and_reset_for_lockout():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter('fail', limit=2, window=900, clock=clock)
+
+    assert limiter.check('nurse@example.com')[0]
+    limiter.hit('nurse@example.com')
+    limiter.hit('nurse@example.com')
+    assert not limiter.check('nurse@example.com')[0]
+
+    limiter.reset('nurse@example.com')
+    assert limiter.check('nurse@example.com')[0]
+
+
+def test_memory_store_evicts_oldest_keys():
+    store = MemoryStore(max_keys=2)
+    limiter = SlidingWindowLimiter('t', limit=1, window=60, store=store, clock=FakeClock())
+    limiter.hit('a')
+    limiter.hit('b')
+    limiter.hit('c')
+
+    # 'a' was evicted and starts clean; the two newest keys are still limited
+    assert limiter.check('a')[0]
+    assert not limiter.check('b')[0] and not limiter.check('c')[0]
+
+
+class DownRedis:
+    """A redis client whose server is unreachable."""
+
+    def __init__(self):
+        import redis
+        self.error = redis.ConnectionError('Connection refused')
+
+    def pipeline(self):
+        return self
+
+    def incr(self, name):
+        pass
+
+    def expire(self, name, ttl):
+        pass
+
+    def get(self, name):
+        pass
+
+    def execute(self):
+        raise self.error
+
+    def mget(self, *names):
+        raise self.error
+
+    def delete(self, *names):
+        raise self.error
+
+
+def test_redis_outage_falls_back_to_memory(caplog):
+    pytest.importorskip('redis')
+    limiter = SlidingWindowLimiter('t', limit=2, window=60, store=RedisStore(DownRedis()), clock=FakeClock())
+
+    with caplog.at_level(logging.ERROR, logger='rate_limit'):
+        assert limiter.hit('k')[0]
+        assert limiter.hit('k')[0]
+        assert not limiter.hit('k')[0]
+        limiter.reset('k')
+        assert limiter.check('k')[0]
+    # Logged once per outage, not once per request
+    assert len([r for r in caplog.records if r.levelno == logging.ERROR]) == 1
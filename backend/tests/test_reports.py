@@ -0,0 +1,56 @@
+from datetime import date, datetime, time
+
+from conftest import make_staff
+from reports import ShiftArrays, hours_report, fairness_report
+
+MONDAY = date(2025, 3, 3)
+STAFF = [make_staff(1, 'Ann'), make_staff(2, 'Bo')]
+
+
+def shift(staff_id, area_id, day, start=time(7, 0), end=time(17, 0)):
+    return (staff_id, area_id, date(2025, 3, day), start, end)
+
+
+def test_hours_against_contract_and_overtime():
+    # Ann: 5 x 10h in week one (40h contract) and nothing in week two
+    rows = [shift(1, 1, d) for d in range(3, 8)]
+    arrays = ShiftArrays([1, 2], [1, 2], rows)
+    time_off = [(2, date(2025, 3, 10), date(2025, 3, 11), datetime(2025, 2, 1), 'approved')]
+
+    report = hours_report(STAFF, arrays, time_off, MONDAY, date(2025, 3, 16))
+    ann, bo = report['staff']
+    assert ann['scheduled_hours'] == 50 and ann['expected_hours'] == 80 and ann['overtime_hours'] == 10
+    assert bo['time_off_days'] == 2 and bo['expected_hours'] == 60
+    assert report['totals']['shifts'] == 5
+
+
+def test_per_diem_staff_have_no_contract():
+    per_diem = make_staff(3, 'Cy', is_per_diem=True)
+    rows = [shift(3, 1, d) for d in range(3, 8)]
+    report = hours_report(STAFF + [per_diem], ShiftArrays([1, 2, 3], [1], rows), [], MONDAY, date(2025, 3, 9))
+
+    cy = report['staff'][2]
+    assert cy['is_per_diem'] and cy['scheduled_hours'] == 50
+    assert cy['expected_hours'] == 0 and cy['overtime_hours'] == 0 and cy['difference'] == 50
+    assert report['totals']['expected_hours'] == 80
+
+
+def test_fairness_counts_weekends_early_starts_rotation_and_call_outs():
+    rows = [
+        shift(1, 1, 3, start=time(6, 15), end=time(16, 15)),
+        shift(1, 2, 4),
+        shift(1, 1, 8),                       # Saturday
+        shift(2, 1, 3), shift(2, 1, 4),
+    ]
+    arrays = ShiftArrays([1, 2], [1, 2], rows)
+    time_off = [
+        (2, date(2025, 3, 6), date(2025, 3, 6), datetime(2025, 3, 5, 6, 0), 'approved'),   # call-out
+        (2, date(2025, 3, 7), date(2025, 3, 7), datetime(2025, 2, 1), 'approved'),        # planned
+    ]
+
+    report = fairness_report(STAFF, arrays, time_off, MONDAY, date(2025, 3, 9))
+    ann, bo = report['staff']
+    assert (ann['weekend_shifts'], ann['early_starts']) == (1, 1)
+    assert 0 < ann['area_rotation'] < 1 and bo['area_rotation'] == 0
+    assert (bo['call_outs'], bo['call_out_days']) == (1, 1)
+    assert report['by_role']['RN']['staff'] == 2
@@ -0,0 +1,59 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from rules import area_rules, compile_area_rules, compile_clinic_rules
+
+
+def make_area(name, rn=0, tech=0, scope=0, rules=None):
+    return SimpleNamespace(name=name, required_rn_count=rn, required_tech_count=tech,
+                           required_scope_tech_count=scope, rules=rules)
+
+
+def test_default_area_rules_match_original_messages():
+    scope = area_rules(make_area('Scope Room', scope=2))
+    assert scope.warnings({'GI_Tech': 1}) == ['Needs 1 more staff (Scope Tech or GI Tech)']
+    assert scope.warnings({'GI_Tech': 2}) == ['Warning: No Scope Techs scheduled (should have at least 1)']
+    assert area_rules(make_area('Procedure Room 3', tech=2)).warnings({'RN': 1}) == ['Needs 1 more staff (RN or Tech)']
+    assert area_rules(make_area('Admitting', rn=2)).warnings({'RN': 1}) == ['Needs 1 more RN(s)']
+    assert area_rules(make_area('Admitting', rn=2)) is area_rules(make_area('Admitting', rn=2))
+
+
+def test_stored_area_rules_replace_the_defaults():
+    rules = json.dumps({'requirements': [{'roles': ['RN'], 'count': 1}],
+                        'preferences': [{'roles': ['GI_Tech'], 'count': 1, 'message': 'No tech'}]})
+    compiled = area_rules(make_area('Procedure Room 1', tech=2, rules=rules))
+    assert compiled.warnings({}) == ['Needs 1 more RN(s)']
+    assert compiled.warnings({'RN': 1}) == ['No tech']
+    with pytest.raises(ValueError):
+        compile_area_rules(json.dumps({'requirements': [{'roles': ['Doctor'], 'count': 1}]}))
+
+
+def test_clinic_rules_start_times():
+    defaults = compile_clinic_rules()
+    assert defaults.start_time_errors('RN', '06:30', 'Recovery') == [
+        'RNs starting at 06:30 should be assigned to Admitting, not Recovery']
+    assert defaults.start_time_errors('GI_Tech', '06:30', 'Recovery') == []
+    assert defaults.slot_counts == {'Admitting': 2, 'Recovery': 2}
+
+    custom = compile_clinic_rules(json.dumps({'valid_start_times': ['08:00'], 'start_time_areas': {}}))
+    assert custom.start_time_errors('RN', '08:00', 'Recovery') == []
+    assert custom.openers == ('Jess', 'Curtis')
+    with pytest.raises(ValueError):
+        compile_clinic_rules(json.dumps({'unknown': 1}))
+
+
+@pytest.mark.parametrize('overrides', [
+    {'openers': 'Jess'},
+    {'procedure_rooms': ['Procedure Room 1', '']},
+    {'valid_start_times': ['7am']},
+    {'rn_slots': [['06:15', 'Admitting'], ['25:00', 'Recovery']]},
+    {'rn_slots': ['ab']},
+    {'start_time_areas': {'RN': {'6:15': 'Admitting'}}},
+    {'start_time_areas': {'Doctor': {'06:15': 'Admitting'}}},
+    {'scope_area': 3},
+])
+def test_clinic_rules_reject_malformed_shapes(overrides):
+    with pytest.raises(ValueError):
+        compile_clinic_rules(json.dumps(overrides))
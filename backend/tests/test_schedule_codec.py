@@ -0,0 +1,62 @@
+import json
+from datetime import date
+
+from schedule_codec import to_rows, from_rows, encode_snapshot, encode_delta, decode, diff_shifts
+
+WEEK = date(2025, 3, 3)
+
+
+def make_shifts(n_staff=20):
+    shifts = []
+    for staff_id in range(1, n_staff + 1):
+        for day in range(5):
+            shifts.append({
+                'staff_id': staff_id,
+                'area_id': staff_id % 4 + 1,
+                'date': f'2025-03-0{3 + day}',
+                'start_time': '07:00',
+                'end_time': '17:30',
+            })
+    return shifts
+
+
+def test_snapshot_roundtrip_and_size():
+    shifts = make_shifts()
+    blob = encode_snapshot(to_rows(shifts, WEEK))
+
+    decoded = from_rows(decode(blob), WEEK)
+    key = lambda s: (s['date'], s['staff_id'])
+    assert sorted(decoded, key=key) == sorted(shifts, key=key)
+    assert len(blob) < len(json.dumps(shifts)) / 5
+
+
+def test_delta_applies_against_base():
+    base_rows = to_rows(make_shifts(), WEEK)
+    changed = make_shifts()
+    changed[0]['area_id'] = 9
+    del changed[5]
+    rows = to_rows(changed, WEEK)
+
+    delta = encode_delta(base_rows, rows)
+    assert decode(delta, base_rows) == rows
+    assert len(delta) < len(encode_snapshot(rows))
+
+
+def test_empty_schedule():
+    assert decode(encode_snapshot([])) == []
+    assert decode(encode_delta([], []), []) == []
+
+
+def test_diff_shifts():
+    before = make_shifts(2)
+    after = make_shifts(2)
+    after[0]['start_time'] = '08:00'
+    after.pop()
+    after.append({'staff_id': 3, 'area_id': 1, 'date': '2025-03-03',
+                  'start_time': '07:00', 'end_time': '15:00'})
+
+    diff = diff_shifts(before, after)
+    assert len(diff['added']) == 1 and diff['added'][0]['staff_id'] == 3
+    assert len(diff['removed']) == 1
+    assert diff['changed'][0]['after']['start_time'] == '08:00'
+    assert diff['unchanged_count'] == 8
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import date, time
+
+from rules import compile_clinic_rules
+from schedule_engine import StaffInput, AreaInput, build_weekly_schedule, snapshot_from_inputs, run_snapshot
+
+MONDAY = date(2026, 11, 2)
+
+
+def test_snapshot_round_trip_matches_direct_run():
+    staff = [StaffInput(1, 'Ann', 'RN', 10, 4, required_days_off='["Friday"]'),
+             StaffInput(2, 'Bea', 'RN', 10, 5, start_time=time(7, 0)),
+             StaffInput(3, 'Olga', 'Scope_Tech', 8, 5)]
+    areas = [AreaInput(1, 'Admitting', required_rn_count=2),
+             AreaInput(2, 'Scope Room', rules='{"requirements": [{"count": 1, "roles": ["Scope_Tech"]}]}')]
+    time_off = {(2, date(2026, 11, 3))}
+
+    direct = build_weekly_schedule(MONDAY, staff, areas, time_off, compile_clinic_rules())
+    snapshot = json.loads(json.dumps(snapshot_from_inputs(MONDAY, staff, areas, time_off)))
+    week_start, shifts, warnings = run_snapshot(snapshot)
+
+    assert week_start == '2026-11-02'
+    assert (shifts, warnings) == direct
+    assert snapshot['areas'][1]['rules'] == {'requirements': [{'count': 1, 'roles': ['Scope_Tech']}]}
+
+
+def test_engine_imports_without_flask():
+    code = 'import sys, schedule_engine; print(any(m.startswith("flask") for m in sys.modules))'
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.strip() == 'False'
+
+
+def test_days_off_and_times_come_back_as_strings():
+    staff = [StaffInput(1, 'Ann', 'RN', 10, 5, required_days_off='["Monday", "Saturday"]'),
+             StaffInput(2, 'Bea', 'RN', 12, 4, start_time=time(7, 30), flexible_days_off='["Wednesday"]')]
+    areas = [AreaInput(1, 'Admitting', required_rn_count=2)]
+    shifts, _ = build_weekly_schedule(MONDAY, staff, areas, set(), compile_clinic_rules())
+
+    days = {(s['staff_id'], s['date']) for s in shifts}
+    assert (1, '2026-11-02') not in days and (1, '2026-11-03') in days
+    assert (2, '2026-11-04') not in days and len([d for d in days if d[0] == 2]) == 4
+    assert {(s['start_time'], s['end_time']) for s in shifts if s['staff_id'] == 2} == {('06:15', '18:15'), ('06:30', '18:30')}
@@ -0,0 +1,73 @@
+from collections import Counter
+from datetime import date, time
+from types import SimpleNamespace
+
+import pytest
+
+from schedule_templates import apply_template, encode_template, expand, plan_shifts
+from schedule_codec import decode
+
+
+def test_template_round_trip_and_lazy_expansion():
+    blob, count = encode_template([
+        {'staff_id': 4, 'area_id': 2, 'weekday': 'Wednesday', 'start_time': '07:00', 'end_time': '17:00'},
+        {'staff_id': 5, 'area_id': 1, 'weekday': 0, 'start_time': '06:30', 'end_time': '14:30'},
+    ])
+    rows = decode(blob)
+    assert count == 2
+    assert rows == [(5, 1, 0, 390, 870), (4, 2, 2, 420, 1020)]
+
+    weeks = [date(2026, 11, 2), date(2026, 11, 9)]
+    expanded = expand(rows, weeks)
+    assert next(expanded) == (5, 1, date(2026, 11, 2), 390, 870)
+    assert [r[2] for r in expanded] == [date(2026, 11, 4), date(2026, 11, 9), date(2026, 11, 11)]
+
+
+def test_template_rejects_weekends_and_inverted_times():
+    shift = {'staff_id': 1, 'area_id': 1, 'weekday': 'Saturday', 'start_time': '07:00', 'end_time': '17:00'}
+    with pytest.raises(ValueError):
+        encode_template([shift])
+    with pytest.raises(ValueError):
+        encode_template([dict(shift, weekday=1, end_time='06:00')])
+
+
+def test_plan_shifts_counts_each_skip_reason(_db, clinic_admin):
+    from models import Shift, Staff, TimeOffRequest
+
+    ann, bea, tom = clinic_admin.staff_ids
+    admitting = clinic_admin.area_ids[0]
+    _db.session.get(Staff, tom).required_days_off = '["Tuesday"]'
+    _db.session.get(Staff, bea).area_restrictions = '["Recovery"]'
+    _db.session.add(TimeOffRequest(clinic_id=clinic_admin.clinic_id, staff_id=bea, status='approved',
+                                   start_date=date(2026, 11, 3), end_date=date(2026, 11, 3)))
+    _db.session.add(Shift(clinic_id=clinic_admin.clinic_id, staff_id=ann, area_id=admitting,
+                          date=date(2026, 11, 2), start_time=time(6, 15), end_time=time(16, 15)))
+    _db.session.commit()
+
+    day = {'area_id': admitting, 'start_time': '07:00', 'end_time': '17:00'}
+    blob, _ = encode_template([
+        dict(day, staff_id=ann, weekday='Monday'),       # already scheduled
+        dict(day, staff_id=ann, weekday='Wednesday'),
+        dict(day, staff_id=bea, weekday='Tuesday'),      # time off
+        dict(day, staff_id=bea, weekday='Wednesday'),    # restricted to Recovery
+        dict(day, staff_id=tom, weekday='Tuesday'),      # required day off
+        dict(day, staff_id=tom, weekday='Thursday', end_time='15:00'),
+        dict(day, staff_id=tom, weekday='Friday'),       # 10 hours for an 8-hour tech
+        dict(day, staff_id=9999, weekday='Friday'),      # not in this clinic
+    ])
+    skipped = Counter()
+    planned = list(plan_shifts(clinic_admin.clinic_id, decode(blob), [date(2026, 11, 2)], skipped))
+    assert [(row['staff_id'], row['date']) for row in planned] == [(ann, date(2026, 11, 4)), (tom, date(2026, 11, 5))]
+    assert skipped == {'already_scheduled': 1, 'time_off': 1, 'required_day_off': 1,
+                       'rule_violation': 2, 'inactive_staff_or_area': 1}
+
+    template = SimpleNamespace(clinic_id=clinic_admin.clinic_id, template_data=blob)
+    result = apply_template(template, [date(2026, 11, 2)], dry_run=True)
+    assert result['created'] == 2 and result['skipped'] == dict(skipped)
+    assert Shift.query.filter_by(clinic_id=clinic_admin.clinic_id).count() == 1
+
+
+def test_create_template_rejects_malformed_shifts(client, clinic_admin):
+    for shifts in (['Monday'], [{'staff_id': [1], 'area_id': clinic_admin.area_ids[0]}]):
+        response = client.post('/templates', headers=clinic_admin.headers, json={'name': 'Bad', 'shifts': shifts})
+        assert response.status_code == 400
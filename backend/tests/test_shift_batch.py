@@ -0,0 +1,71 @@
+from models import Shift
+
+MONDAY = '2026-11-02'
+
+
+def create(staff_id, area_id, day=MONDAY, start='06:15', end='16:15'):
+    return {'op': 'create', 'staff_id': staff_id, 'area_id': area_id, 'date': day,
+            'start_time': start, 'end_time': end}
+
+
+def batch(client, clinic_admin, operations, **extra):
+    return client.post('/shifts/batch', headers=clinic_admin.headers,
+                       json=dict(extra, operations=operations))
+
+
+def test_one_invalid_operation_rolls_back_the_batch(client, clinic_admin):
+    ann, bea, _ = clinic_admin.staff_ids
+    admitting = clinic_admin.area_ids[0]
+
+    response = batch(client, clinic_admin, [
+        create(ann, admitting),
+        create(bea, admitting, start='06:30', end='14:30'),  # 8 hours for a 10-hour RN
+    ])
+    assert response.status_code == 400
+    assert [e['index'] for e in response.get_json()['errors']] == [1]
+    assert Shift.query.count() == 0
+
+    ok = batch(client, clinic_admin, [create(ann, admitting), create(bea, admitting, start='06:30', end='16:30')])
+    assert ok.status_code == 200 and len(ok.get_json()['created']) == 2
+
+
+def test_stale_version_is_a_conflict(client, clinic_admin):
+    ann = clinic_admin.staff_ids[0]
+    admitting, recovery = clinic_admin.area_ids[:2]
+    shift = batch(client, clinic_admin, [create(ann, admitting)]).get_json()['created'][0]
+
+    stale = batch(client, clinic_admin, [
+        {'op': 'update', 'id': shift['id'], 'version': shift['version'] + 1,
+         'area_id': recovery, 'start_time': '07:30', 'end_time': '17:30'}
+    ])
+    assert stale.status_code == 409
+    assert stale.get_json()['current'][0]['version'] == shift['version']
+
+    fresh = batch(client, clinic_admin, [
+        {'op': 'update', 'id': shift['id'], 'version': shift['version'],
+         'area_id': recovery, 'start_time': '07:30', 'end_time': '17:30'}
+    ])
+    assert fresh.status_code == 200
+    assert fresh.get_json()['updated'][0]['version'] == shift['version'] + 1
+
+
+def test_operations_must_share_one_week(client, clinic_admin):
+    ann, bea, _ = clinic_admin.staff_ids
+    admitting = clinic_admin.area_ids[0]
+    response = batch(client, clinic_admin, [create(ann, admitting), create(bea, admitting, day='2026-11-09')])
+    assert response.status_code == 400
+    assert 'one week' in response.get_json()['error']
+    assert Shift.query.count() == 0
+
+
+def test_restore_with_override_skips_rules_but_not_double_booking(client, clinic_admin):
+    ann = clinic_admin.staff_ids[0]
+    admitting, recovery = clinic_admin.area_ids[:2]
+
+    short = create(ann, admitting, start='06:15', end='14:15')
+    assert batch(client, clinic_admin, [short]).status_code == 400
+    assert batch(client, clinic_admin, [short], override_validation=True).status_code == 200
+
+    twice = batch(client, clinic_admin, [create(ann, recovery, start='07:30', end='17:30')], override_validation=True)
+    assert twice.status_code == 400
+    assert 'already scheduled' in twice.get_json()['errors'][0]['error']
@@ -0,0 +1,40 @@
+from datetime import date, time
+from types import SimpleNamespace
+
+from conftest import make_staff
+from utils import shift_rule_errors
+
+MONDAY = date(2025, 10, 27)
+
+
+def make_shift(day, area_id=1, start=time(7, 0), end=time(17, 0)):
+    return SimpleNamespace(date=day, area_id=area_id, start_time=start, end_time=end)
+
+
+ADMITTING = SimpleNamespace(name='Admitting')
+
+
+def test_valid_shift_has_no_errors():
+    assert shift_rule_errors(make_staff(), ADMITTING, MONDAY, time(7, 0), time(17, 0), [], False) == []
+
+
+def test_overlap_and_time_off():
+    others = [make_shift(MONDAY, area_id=2)]
+    errors = shift_rule_errors(make_staff(), ADMITTING, MONDAY, time(7, 0), time(17, 0), others, True,
+                               area_names={2: 'Recovery'})
+    assert 'Test RN is already scheduled 07:00-17:00 in Recovery' in errors
+    assert 'Test RN has approved time-off on this date' in errors
+
+
+def test_fifth_day_for_four_day_staff():
+    others = [make_shift(date(2025, 10, 27 + i)) for i in range(4)]
+    errors = shift_rule_errors(make_staff(), ADMITTING, date(2025, 10, 31), time(7, 0), time(17, 0),
+                               others, False)
+    assert any('5th day' in e for e in errors)
+
+
+def test_flexible_days_off():
+    staff = make_staff(flexible_days_off='["Monday", "Friday"]')
+    errors = shift_rule_errors(staff, ADMITTING, date(2025, 10, 31), time(7, 0), time(17, 0),
+                               [make_shift(MONDAY)], False)
+    assert any('Already scheduled Monday' in e for e in errors)
@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+
+from schedule_engine import StaffInput, AreaInput
+from simulation import Baseline, Scenario, _scenario_inputs, parse_scenario, run_scenarios
+
+MONDAY = date(2026, 11, 2)
+
+
+def make_baseline():
+    staff = tuple(StaffInput(i, f'RN{i}', 'RN', 10, 5) for i in range(1, 5))
+    areas = (AreaInput(1, 'Admitting', required_rn_count=2), AreaInput(2, 'Recovery', required_rn_count=2))
+    pending = ((7, 1, MONDAY, date(2026, 11, 4)),)
+    return Baseline(1, MONDAY, 2, None, staff, areas, frozenset(), pending)
+
+
+def test_scenarios_share_unchanged_baseline_data():
+    baseline = make_baseline()
+    staff, time_off = _scenario_inputs(baseline, Scenario('Baseline'))
+    assert staff is baseline.staff and time_off is baseline.time_off
+
+    staff, time_off = _scenario_inputs(baseline, Scenario('PTO', approve_time_off=(7,)))
+    assert staff is baseline.staff
+    assert len(time_off) == 3 and not baseline.time_off
+
+
+def test_run_scenarios_compares_against_baseline():
+    baseline = make_baseline()
+    hire = StaffInput(-1, 'Per diem', 'RN', 10, 5, is_per_diem=True)
+    results = run_scenarios(baseline, [
+        Scenario('Baseline'),
+        Scenario('Approve PTO', approve_time_off=(7,)),
+        Scenario('Approve PTO and hire', approve_time_off=(7,), add_staff=(hire,)),
+    ])
+
+    base, pto, hired = results
+    assert base['uncovered_area_days'] == 0 and base['area_days'] == 20
+    assert pto['uncovered_area_days'] == 3
+    assert pto['change'] == {'shifts': -3, 'generator_warnings': 3, 'uncovered_area_days': 3}
+    assert pto['uncovered'][0] == {'date': '2026-11-02', 'area': 'Recovery', 'warnings': ['Needs 1 more RN(s)']}
+    assert hired['change']['uncovered_area_days'] == 0
+
+
+def test_parse_scenario_checks_field_types():
+    baseline = make_baseline()
+    scenario = parse_scenario({'remove_staff': [1], 'approve_time_off': [7],
+                               'active_rooms': {'2026-11-02': ['Recovery']}}, baseline, 1)
+    assert scenario.remove_staff == {1} and scenario.approve_time_off == (7,)
+    assert scenario.active_rooms == {'2026-11-02': {'Recovery'}}
+
+
+@pytest.mark.parametrize('spec', [
+    {'remove_staff': [[1]]},
+    {'remove_staff': [True]},
+    {'approve_time_off': [{'id': 7}]},
+    {'closed_rooms': 'Recovery'},
+    {'active_rooms': {'2026-11-02': 'Recovery'}},
+    {'active_rooms': {'2026-11-02': ['Room 9']}},
+    {'active_rooms': ['Recovery']},
+])
+def test_parse_scenario_rejects_malformed_fields(spec):
+    with pytest.raises(ValueError):
+        parse_scenario(spec, make_baseline(), 1)
+
+
+def test_simulate_rejects_boolean_weeks(client, clinic_admin):
+    response = client.post('/simulate', headers=clinic_admin.headers,
+                           json={'weeks': True, 'scenarios': [{'name': 'Nothing changes'}]})
+    assert response.status_code == 400
@@ -54,4 +54,49 @@ def test_deny_time_off(client, sample_staff):
                          content_type='application/json')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert data['status'] == 'denied'
\ No newline at end of file
+    assert data['status'] == 'denied'
+
+def _pending_requests(client, clinic_admin, count):
+    start = date.today() + timedelta(days=10)
+    ids = []
+    for staff_id in clinic_admin.staff_ids[:count]:
+        response = client.post('/time-off', headers=clinic_admin.headers, json={
+            'staff_id': staff_id, 'start_date': str(start), 'end_date': str(start), 'reason': 'Appointment'
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    return ids
+
+
+def test_batch_reports_version_conflicts_per_item(client, clinic_admin):
+    first, second = _pending_requests(client, clinic_admin, 2)
+
+    response = client.post('/time-off/batch', headers=clinic_admin.headers, json={'updates': [
+        {'id': first, 'status': 'approved', 'version': 1},
+        {'id': second, 'status': 'approved', 'version': 7},
+    ]})
+    assert response.status_code == 200
+    results = {r['id']: r for r in response.get_json()['results']}
+    assert results[first] == {'id': first, 'result': 'updated', 'status': 'approved', 'version': 2}
+    assert results[second]['result'] == 'conflict' and results[second]['version'] == 1
+    assert response.get_json()['updated'] == 1
+
+
+def test_batch_mixes_versioned_unversioned_and_invalid_items(client, clinic_admin):
+    first, second, third = _pending_requests(client, clinic_admin, 3)
+
+    response = client.post('/time-off/batch', headers=clinic_admin.headers, json={'updates': [
+        {'id': first, 'status': 'denied', 'version': '1'},
+        {'id': second, 'status': 'denied'},
+        {'id': third, 'status': 'denied', 'version': 'abc'},
+    ]})
+    assert response.status_code == 200
+    results = {r['id']: r for r in response.get_json()['results']}
+    assert results[first]['result'] == results[second]['result'] == 'updated'
+    assert results[third]['result'] == 'invalid' and results[third]['status_code'] == 400
+
+
+def test_batch_rejects_a_missing_or_malformed_body(client, clinic_admin):
+    for kwargs in ({}, {'data': 'not json', 'content_type': 'application/json'}, {'json': [1, 2]}):
+        response = client.post('/time-off/batch', headers=clinic_admin.headers, **kwargs)
+        assert response.status_code == 400
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+
+def make_shift(client, clinic_admin):
+    response = client.post('/shifts', headers=clinic_admin.headers, json={
+        'staff_id': clinic_admin.staff_ids[0], 'area_id': clinic_admin.area_ids[0],
+        'date': '2026-11-02', 'start_time': '06:15', 'end_time': '16:15'
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def make_time_off(client, clinic_admin):
+    day = str(date.today() + timedelta(days=10))
+    response = client.post('/time-off', headers=clinic_admin.headers, json={
+        'staff_id': clinic_admin.staff_ids[1], 'start_date': day, 'end_date': day
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def with_if_match(clinic_admin, etag):
+    return dict(clinic_admin.headers, **{'If-Match': etag})
+
+
+def test_shift_etag_round_trips_through_if_match(client, clinic_admin):
+    shift_id = make_shift(client, clinic_admin)
+    etag = client.get(f'/shifts/{shift_id}', headers=clinic_admin.headers).headers['ETag']
+    assert etag == '"1"'
+
+    response = client.put(f'/shifts/{shift_id}', headers=with_if_match(clinic_admin, etag),
+                          json={'area_id': clinic_admin.area_ids[0], 'start_time': '06:30', 'end_time': '16:30'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"2"' and response.get_json()['version'] == 2
+
+    # Weak validators are accepted too
+    response = client.put(f'/shifts/{shift_id}', headers=with_if_match(clinic_admin, 'W/"2"'),
+                          json={'start_time': '06:15', 'end_time': '16:15'})
+    assert response.status_code == 200
+
+
+def test_stale_if_match_returns_the_current_shift(client, clinic_admin):
+    shift_id = make_shift(client, clinic_admin)
+    client.put(f'/shifts/{shift_id}', headers=clinic_admin.headers,
+               json={'start_time': '06:30', 'end_time': '16:30'})
+
+    response = client.put(f'/shifts/{shift_id}', headers=with_if_match(clinic_admin, '"1"'),
+                          json={'start_time': '06:15', 'end_time': '16:15'})
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body['current']['version'] == 2 and body['current']['start_time'] == '06:30'
+    assert response.headers['ETag'] == '"2"'
+
+    assert client.delete(f'/shifts/{shift_id}', headers=with_if_match(clinic_admin, '"1"')).status_code == 409
+    assert client.put(f'/shifts/{shift_id}', headers=with_if_match(clinic_admin, '"x"'),
+                      json={}).status_code == 400
+
+
+def test_missing_if_match_means_no_precondition(client, clinic_admin):
+    shift_id = make_shift(client, clinic_admin)
+    response = client.put(f'/shifts/{shift_id}', headers=clinic_admin.headers,
+                          json={'start_time': '06:30', 'end_time': '16:30'})
+    assert response.status_code == 200 and response.headers['ETag'] == '"2"'
+    assert client.delete(f'/shifts/{shift_id}', headers=clinic_admin.headers).status_code == 200
+
+
+def test_time_off_update_checks_version(client, clinic_admin):
+    # Admins' own requests start out approved
+    request_id = make_time_off(client, clinic_admin)
+    etag = client.get(f'/time-off/{request_id}', headers=clinic_admin.headers).headers['ETag']
+
+    denied = client.put(f'/time-off/{request_id}', headers=with_if_match(clinic_admin, etag),
+                        json={'status': 'denied'})
+    assert denied.status_code == 200 and denied.headers['ETag'] == '"2"'
+
+    stale = client.put(f'/time-off/{request_id}', headers=with_if_match(clinic_admin, etag),
+                       json={'status': 'approved'})
+    assert stale.status_code == 409
+    assert stale.get_json()['current']['status'] == 'denied'
+    assert stale.headers['ETag'] == '"2"'
+
+    # "version" in the body works like If-Match
+    assert client.put(f'/time-off/{request_id}', headers=clinic_admin.headers,
+                      json={'status': 'approved', 'version': 1}).status_code == 409
+    assert client.put(f'/time-off/{request_id}', headers=clinic_admin.headers,
+                      json={'status': 'approved'}).status_code == 200
@@ -0,0 +1,24 @@
+from datetime import date
+
+from week_context import WeekContext, days_mask, day_names, week_of
+
+MONDAY = date(2026, 11, 2)
+
+
+def test_week_tables():
+    week = WeekContext(MONDAY)
+    assert week.iso[0] == '2026-11-02' and week.iso[6] == '2026-11-08'
+    assert week.index[date(2026, 11, 5)] == 3
+    assert week.date_of('Friday') == date(2026, 11, 6)
+    assert date(2026, 11, 7) not in week.weekdays and date(2026, 11, 9) not in week
+
+
+def test_week_of_is_shared_per_monday():
+    assert week_of(date(2026, 11, 5)) is week_of(MONDAY)
+    assert week_of(date(2026, 11, 9)).monday == date(2026, 11, 9)
+
+
+def test_stored_day_lists():
+    assert days_mask('["Friday", "Someday", "Monday"]') == 0b10001
+    assert day_names('["Friday", "Monday"]') == ('Friday', 'Monday')
+    assert days_mask(None) == 0 and day_names('') == ()
@@ -2,186 +2,302 @@ from models import Shift, TimeOffRequest, Staff, StaffArea
 from datetime import datetime, timedelta
 from db import db
 from sqlalchemy.orm import joinedload
+from coverage import coverage_for_area_days, refresh_coverage
+from rules import clinic_rules, compile_clinic_rules
+from week_context import WEEKDAYS, DAY_INDEX, day_names, days_mask, hhmm, week_of
+import json
 
 
-def validate_shift(staff_id, area_id, date, start_time, end_time, shift_id=None):
+DOUBLE_BOOKING_CONSTRAINT = 'uq_shift_clinic_staff_date'
+
+
+def is_double_booking(error):
+    """True if an IntegrityError came from the one-shift-per-staff-per-day constraint."""
+    orig = getattr(error, 'orig', None)
+    constraint = getattr(getattr(orig, 'diag', None), 'constraint_name', None)
+    if constraint:
+        return constraint == DOUBLE_BOOKING_CONSTRAINT
+    message = str(orig)
+    return DOUBLE_BOOKING_CONSTRAINT in message or 'shift.clinic_id, shift.staff_id, shift.date' in message
+
+
+def shift_rule_errors(staff, area, date, start_time, end_time, other_shifts, has_time_off,
+                      area_names=None, check_double_booking=True, rules=None, week=None):
+    """
+    The scheduling rules as pure checks over preloaded data (no queries).
+    other_shifts: the staff member's other shifts in the Mon-Sun week of `date`
+    (anything with date, start_time, end_time, area_id).
+    rules: the clinic's compiled ClinicRules (the defaults if omitted).
+    week: the WeekContext of `date`'s week, when the caller checks many shifts in it.
+    Returns a list of error messages.
+    """
+    rules = rules or compile_clinic_rules()
+    week = week if week is not None and date in week else week_of(date)
     errors = []
-    
-    staff = Staff.query.get(staff_id)
-    area = StaffArea.query.get(area_id)
-    
-    if not staff:
-        return False, "Staff member not found"
-    if not area:
-        return False, "Area not found"
-    
+
     start_dt = datetime.combine(date, start_time)
     end_dt = datetime.combine(date, end_time)
-    shift_duration = (end_dt - start_dt).total_seconds() / 3600 
-    
+    shift_duration = (end_dt - start_dt).total_seconds() / 3600
+    day_index = week.index[date]
+    day_of_week = WEEKDAYS[day_index]
+
     # 1. Check shift length matches staff requirement
     if staff.shift_length == 8 and shift_duration != 8:
         errors.append(f"{staff.name} works 8-hour shifts. This shift is {shift_duration} hours.")
     elif staff.shift_length == 10 and shift_duration != 10:
         errors.append(f"{staff.name} works 10-hour shifts. This shift is {shift_duration} hours.")
-    
+
     # 2. Check for double-booking (overlapping shifts)
-    query = Shift.query.filter(
-        Shift.staff_id == staff_id,
-        Shift.date == date
-    )
-    if shift_id: 
-        query = query.filter(Shift.id != shift_id)
-    
-    existing_shifts = query.all()
-    for existing in existing_shifts:
-        existing_start = datetime.combine(date, existing.start_time)
-        existing_end = datetime.combine(date, existing.end_time)
-        
-        # Check for overlap
-        if not (end_dt <= existing_start or start_dt >= existing_end):
-            errors.append(f"{staff.name} is already scheduled {existing.start_time.strftime('%H:%M')}-{existing.end_time.strftime('%H:%M')} in {existing.area.name}")
-    
+    if check_double_booking:
+        for existing in other_shifts:
+            if existing.date != date:
+                continue
+            existing_start = datetime.combine(date, existing.start_time)
+            existing_end = datetime.combine(date, existing.end_time)
+            if not (end_dt <= existing_start or start_dt >= existing_end):
+                area_name = (area_names or {}).get(existing.area_id, 'another area')
+                errors.append(f"{staff.name} is already scheduled {existing.start_time.strftime('%H:%M')}-{existing.end_time.strftime('%H:%M')} in {area_name}")
+
     # 3. Check time-off conflicts
-    time_off_requests = TimeOffRequest.query.filter(
-        TimeOffRequest.staff_id == staff_id,
-        TimeOffRequest.status == 'approved',
-        TimeOffRequest.start_date <= date,
-        TimeOffRequest.end_date >= date
-    ).all()
-    
-    if time_off_requests:
+    if has_time_off:
         errors.append(f"{staff.name} has approved time-off on this date")
-    
+
     # 4. Check required days off (must be off ALL of these days)
-    if staff.required_days_off:
-        import json
-        required_off = json.loads(staff.required_days_off)
-        day_of_week = date.strftime('%A')
-        
-        if day_of_week in required_off:
-            errors.append(f"{staff.name} must be off on {day_of_week}s")
+    if days_mask(staff.required_days_off) & (1 << day_index):
+        errors.append(f"{staff.name} must be off on {day_of_week}s")
 
     # 5. Check flexible days off (must be off AT LEAST ONE of these days)
-    if staff.flexible_days_off:
-        import json
-        flexible_off = json.loads(staff.flexible_days_off)
-        day_of_week = date.strftime('%A')
-        
-        if day_of_week in flexible_off:
-            monday = date - timedelta(days=date.weekday())
-            
-            for other_day in flexible_off:
-                if other_day != day_of_week:
-                    day_offset = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'].index(other_day)
-                    other_date = monday + timedelta(days=day_offset)
-                    
-                    existing_shifts = Shift.query.filter(
-                        Shift.staff_id == staff_id,
-                        Shift.date == other_date
-                    )
-                    if shift_id:
-                        existing_shifts = existing_shifts.filter(Shift.id != shift_id)
-                    
-                    if existing_shifts.count() > 0:
-                        days_str = ' or '.join(flexible_off)
-                        errors.append(f"{staff.name} must have at least one of these days off: {days_str}. Already scheduled {other_day}.")
-                        break
-    
+    if days_mask(staff.flexible_days_off) & (1 << day_index):
+        flexible_off = day_names(staff.flexible_days_off)
+        scheduled = {s.date for s in other_shifts}
+        for other_day in flexible_off:
+            if other_day != day_of_week and other_day in DAY_INDEX and week.date_of(other_day) in scheduled:
+                days_str = ' or '.join(flexible_off)
+                errors.append(f"{staff.name} must have at least one of these days off: {days_str}. Already scheduled {other_day}.")
+                break
+
     # 6. Check 10-hour staff get at least 1 day off Mon-Fri
     if staff.shift_length == 10 and staff.days_per_week == 4:
-        # Get Monday of the week
-        monday = date - timedelta(days=date.weekday())
-        week_dates = [monday + timedelta(days=i) for i in range(5)]  # Mon-Fri
-        
-        # Count scheduled days this week
-        scheduled_query = Shift.query.filter(
-            Shift.staff_id == staff_id,
-            Shift.date.in_(week_dates)
-        )
-        if shift_id:
-            scheduled_query = scheduled_query.filter(Shift.id != shift_id)
-        
-        scheduled_dates = {shift.date for shift in scheduled_query.all()}
-        scheduled_dates.add(date) 
-        
+        scheduled_dates = {s.date for s in other_shifts if s.date in week.weekdays}
+        scheduled_dates.add(date)
         if len(scheduled_dates) > 4:
             errors.append(f"{staff.name} works 4 days/week and must have at least 1 day off Mon-Fri. This would be their 5th day.")
-    
+
     # 7. Check area restrictions for per diem staff
     if staff.area_restrictions and staff.area_restrictions != '["Any"]':
-        import json
         allowed_areas = json.loads(staff.area_restrictions)
         if area.name not in allowed_areas:
             errors.append(f"{staff.name} can only work in: {', '.join(allowed_areas)}")
-    
-    # 8. Check start time rules for RNs
-    if staff.role == 'RN':
-        start_time_str = start_time.strftime('%H:%M')
-        
-        # Early nurses (6:15, 6:30) should be in Admitting
-        if start_time_str in ['06:15', '06:30'] and area.name != 'Admitting':
-            errors.append(f"RNs starting at {start_time_str} should be assigned to Admitting, not {area.name}")
-        
-        # 7:30 nurses should be in Recovery
-        if start_time_str == '07:30' and area.name != 'Recovery':
-            errors.append(f"RNs starting at 07:30 should be assigned to Recovery, not {area.name}")
-    
-    # 9. Check if start time is valid
-    valid_start_times = ['06:15', '06:30', '07:00', '07:30']
-    if start_time.strftime('%H:%M') not in valid_start_times:
-        errors.append(f"Start time must be one of: {', '.join(valid_start_times)}")
-    
+
+    # 8-9. Start time must be valid and match the area it maps to for the role
+    # (early RNs in Admitting, 07:30 RNs in Recovery by default)
+    errors.extend(rules.start_time_errors(staff.role, hhmm(start_time), area.name))
+
+    return errors
+
+
+def validate_shift(staff_id, area_id, date, start_time, end_time, shift_id=None,
+                   check_double_booking=True):
+    """
+    Check a proposed shift against the scheduling rules.
+    Write routes pass check_double_booking=False and rely on the
+    uq_shift_clinic_staff_date constraint instead of a read-then-write check.
+    """
+    staff = Staff.query.get(staff_id)
+    area = StaffArea.query.get(area_id)
+
+    if not staff:
+        return False, "Staff member not found"
+    if not area:
+        return False, "Area not found"
+
+    # One query for the staff member's week covers every rule that looks at other shifts
+    week = week_of(date)
+    query = Shift.query.options(joinedload(Shift.area)).filter(
+        Shift.staff_id == staff_id,
+        Shift.date >= week.dates[0],
+        Shift.date <= week.dates[6]
+    )
+    if shift_id:
+        query = query.filter(Shift.id != shift_id)
+    other_shifts = query.all()
+
+    has_time_off = TimeOffRequest.query.filter(
+        TimeOffRequest.staff_id == staff_id,
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(date, date)
+    ).first() is not None
+
+    errors = shift_rule_errors(
+        staff, area, date, start_time, end_time, other_shifts, has_time_off,
+        area_names={s.area_id: s.area.name for s in other_shifts},
+        check_double_booking=check_double_booking,
+        rules=clinic_rules(staff.clinic_id),
+        week=week
+    )
     if errors:
         return False, " | ".join(errors)
-    
+
     return True, "Valid"
 
 
-def check_area_coverage(area_id, date):
-    area = StaffArea.query.get(area_id)
-    if not area:
-        return False, ["Area not found"]
-    
-    shifts = Shift.query.options(
-        joinedload(Shift.staff_member)
+def get_time_off_days(clinic_id, start, end, staff_ids=None):
+    """
+    Set of (staff_id, date) pairs blocked by approved time-off in [start, end].
+    One projected query; each request is clipped to the window before it is
+    expanded, so a 30-day PTO only costs the days that fall inside the window.
+    """
+    query = db.session.query(
+        TimeOffRequest.staff_id, TimeOffRequest.start_date, TimeOffRequest.end_date
     ).filter(
-        Shift.area_id == area_id,
-        Shift.date == date
-    ).all()
-    
-    rn_count = sum(1 for s in shifts if s.staff_member.role == 'RN')
-    tech_count = sum(1 for s in shifts if s.staff_member.role == 'GI_Tech')
-    scope_tech_count = sum(1 for s in shifts if s.staff_member.role == 'Scope_Tech')
-    
-    warnings = []
-
-        # Special handling for Scope Room
-    if 'Scope Room' in area.name:
-        # Scope Room needs 2 people: ideally 2 Scope Techs, but allows 1 Scope Tech + 1 GI Tech
-        total_scope_staff = scope_tech_count + tech_count
-        if total_scope_staff < 2:
-            warnings.append(f"Needs {2 - total_scope_staff} more staff (Scope Tech or GI Tech)")
-        elif scope_tech_count == 0:
-            warnings.append("Warning: No Scope Techs scheduled (should have at least 1)")
-    
-    # Special handling for Procedure Rooms (flexible staffing)
-    elif 'Procedure Room' in area.name:
-        # Procedure rooms need 2 people total: can be 2 techs, 2 RNs, or 1 of each
-        total_staff = rn_count + tech_count
-        if total_staff < 2:
-            warnings.append(f"Needs {2 - total_staff} more staff (RN or Tech)")
-    
-    else:
-        if area.required_rn_count > 0 and rn_count < area.required_rn_count:
-            warnings.append(f"Needs {area.required_rn_count - rn_count} more RN(s)")
-        
-        if area.required_tech_count > 0 and tech_count < area.required_tech_count:
-            warnings.append(f"Needs {area.required_tech_count - tech_count} more Tech(s)")
-        
-        if area.required_scope_tech_count > 0 and scope_tech_count < area.required_scope_tech_count:
-            warnings.append(f"Needs {area.required_scope_tech_count - scope_tech_count} more Scope Tech(s)")
-    
-    is_covered = len(warnings) == 0
-    
-    return is_covered, warnings
\ No newline at end of file
+        TimeOffRequest.status == 'approved',
+        TimeOffRequest.overlaps(start, end)
+    )
+    if clinic_id is not None:
+        query = query.filter(TimeOffRequest.clinic_id == clinic_id)
+    if staff_ids is not None:
+        query = query.filter(TimeOffRequest.staff_id.in_(staff_ids))
+
+    blocked = set()
+    for staff_id, first, last in query:
+        cur, last = max(first, start), min(last, end)
+        while cur <= last:
+            blocked.add((staff_id, cur))
+            cur += timedelta(days=1)
+    return blocked
+
+
+def validate_week_shifts(clinic_id, week_start, week_shifts, changed, check_rules=True):
+    """
+    Validate a batch of edits against the week as it will look afterwards,
+    entirely in memory: staff, areas and time-off are loaded once for the
+    Mon-Sun week starting at week_start.
+
+    week_shifts: every shift in the week after the edits (ORM objects, pending or persistent)
+    changed:     the created/updated shifts among them that need checking
+    Returns {shift: error message} for the shifts that fail.
+    """
+    staff_by_id = {s.id: s for s in Staff.query.filter_by(clinic_id=clinic_id)}
+    areas_by_id = {a.id: a for a in StaffArea.query.filter_by(clinic_id=clinic_id)}
+    area_names = {a.id: a.name for a in areas_by_id.values()}
+    rules = clinic_rules(clinic_id)
+    week = week_of(week_start)
+    blocked = get_time_off_days(clinic_id, week_start, week.dates[6]) if check_rules else set()
+
+    by_staff = {}
+    for shift in week_shifts:
+        by_staff.setdefault(shift.staff_id, []).append(shift)
+
+    failures = {}
+    for shift in changed:
+        staff = staff_by_id.get(shift.staff_id)
+        area = areas_by_id.get(shift.area_id)
+        if not staff:
+            failures[shift] = "Staff member not found"
+            continue
+        if not area:
+            failures[shift] = "Area not found"
+            continue
+
+        others = [s for s in by_staff.get(shift.staff_id, []) if s is not shift]
+        # The unique constraint allows one shift per staff per day, even without overlap
+        if any(s.date == shift.date for s in others):
+            failures[shift] = f"{staff.name} is already scheduled on {shift.date}"
+            continue
+
+        if check_rules:
+            errors = shift_rule_errors(
+                staff, area, shift.date, shift.start_time, shift.end_time, others,
+                (shift.staff_id, shift.date) in blocked, area_names=area_names, rules=rules, week=week
+            )
+            if errors:
+                failures[shift] = " | ".join(errors)
+    return failures
+
+
+def find_time_off_conflicts(clinic_id, request_ids):
+    """Shifts that fall inside any of the given time-off requests -- one joined query."""
+    if not request_ids:
+        return []
+    return db.session.query(TimeOffRequest.id, Shift).join(
+        Shift, db.and_(
+            Shift.staff_id == TimeOffRequest.staff_id,
+            Shift.clinic_id == TimeOffRequest.clinic_id,
+            Shift.date >= TimeOffRequest.start_date,
+            Shift.date <= TimeOffRequest.end_date
+        )
+    ).options(
+        joinedload(Shift.staff_member),
+        joinedload(Shift.area)
+    ).filter(
+        TimeOffRequest.clinic_id == clinic_id,
+        TimeOffRequest.id.in_(list(request_ids))
+    ).order_by(Shift.date, Shift.area_id).all()
+
+
+def suggest_replacements(clinic_id, shifts, exclude_staff_ids=()):
+    """
+    Candidate fill-ins for shifts that are being vacated: active staff with the
+    same role who are not already working that day, not on time-off, not on a
+    required day off, and allowed in the area.
+    """
+    if not shifts:
+        return {}
+    dates = {s.date for s in shifts}
+    staff_list = Staff.query.filter_by(clinic_id=clinic_id, is_active=True).all()
+    working = set(db.session.query(Shift.staff_id, Shift.date).filter(
+        Shift.clinic_id == clinic_id,
+        Shift.date.in_(dates)
+    ).all())
+    blocked = get_time_off_days(clinic_id, min(dates), max(dates))
+    excluded = set(exclude_staff_ids)
+
+    suggestions = {}
+    for shift in shifts:
+        day_bit = 1 << shift.date.weekday()
+        candidates = []
+        for staff in staff_list:
+            if staff.id in excluded or staff.role != shift.staff_member.role:
+                continue
+            if (staff.id, shift.date) in working or (staff.id, shift.date) in blocked:
+                continue
+            if days_mask(staff.required_days_off) & day_bit:
+                continue
+            if staff.area_restrictions and staff.area_restrictions != '["Any"]':
+                if shift.area.name not in json.loads(staff.area_restrictions):
+                    continue
+            candidates.append({'staff_id': staff.id, 'staff_name': staff.name})
+        suggestions[shift.id] = sorted(candidates, key=lambda c: c['staff_name'])
+    return suggestions
+
+
+def time_off_approval_impact(clinic_id, request_ids, conflict_action='report'):
+    """
+    What approving these time-off requests does to the schedule.
+    conflict_action: 'report' (default), 'remove' (delete the conflicting
+    shifts in the caller's transaction) or 'suggest' (propose replacements).
+    """
+    conflicts = find_time_off_conflicts(clinic_id, request_ids)
+    shifts = [shift for _, shift in conflicts]
+    shift_ids = [s.id for s in shifts]
+
+    impact = {
+        'conflicting_shifts': [
+            dict(shift.to_dict(), time_off_request_id=request_id)
+            for request_id, shift in conflicts
+        ],
+        'coverage': coverage_for_area_days(
+            clinic_id, {(s.area_id, s.date) for s in shifts}, exclude_shift_ids=shift_ids
+        )
+    }
+
+    if conflict_action == 'suggest':
+        impact['replacements'] = suggest_replacements(
+            clinic_id, shifts, exclude_staff_ids={s.staff_id for s in shifts}
+        )
+    elif conflict_action == 'remove' and shift_ids:
+        Shift.query.filter(Shift.id.in_(shift_ids)).delete(synchronize_session=False)
+        refresh_coverage(clinic_id, {(s.area_id, s.date) for s in shifts})
+        impact['removed_shift_ids'] = shift_ids
+
+    return impact
@@ -0,0 +1,75 @@
+"""
+Weekday and date lookups shared by the generator and the validator.
+
+Scheduling loops used to ask the same questions of every date over and
+over -- strftime('%A') for the day name, date - timedelta(days=weekday())
+for its Monday, WEEKDAYS.index(name) to go the other way, strftime again
+for the ISO string.  A WeekContext answers them for one Mon-Sun week from
+tables built once (per request, or per generated week), and the JSON day
+lists stored on Staff are parsed once per distinct value.
+
+No Flask or database imports, so schedule_engine can use it too.
+"""
+
+from datetime import timedelta
+from functools import lru_cache
+import json
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DAY_INDEX = {name: i for i, name in enumerate(WEEKDAYS)}
+
+
+@lru_cache(maxsize=1024)
+def day_names(days_json):
+    """A stored JSON list of weekday names as a tuple ('' or None -> ())."""
+    return tuple(json.loads(days_json)) if days_json else ()
+
+
+@lru_cache(maxsize=1024)
+def days_mask(days_json):
+    """Bitmask (bit 0 = Monday) for a stored JSON list of weekday names; unknown names are ignored."""
+    mask = 0
+    for name in day_names(days_json):
+        if name in DAY_INDEX:
+            mask |= 1 << DAY_INDEX[name]
+    return mask
+
+
+@lru_cache(maxsize=None)
+def hhmm(value):
+    """'HH:MM' for a datetime.time (at most 1440 distinct values)."""
+    return f"{value.hour:02d}:{value.minute:02d}"
+
+
+class WeekContext:
+    """
+    Lookup tables for the Mon-Sun week starting `monday`:
+      dates[i] / iso[i]  -- day i (0 = Monday) as a date and as 'YYYY-MM-DD'
+      index[date]        -- the reverse, for dates inside the week
+      weekdays           -- the Mon-Fri dates, as a frozenset
+    Day names are WEEKDAYS[i].
+    """
+    __slots__ = ('monday', 'dates', 'iso', 'index', 'weekdays')
+
+    def __init__(self, monday):
+        self.monday = monday
+        self.dates = tuple(monday + timedelta(days=i) for i in range(7))
+        self.iso = tuple(d.strftime('%Y-%m-%d') for d in self.dates)
+        self.index = {d: i for i, d in enumerate(self.dates)}
+        self.weekdays = frozenset(self.dates[:5])
+
+    def date_of(self, day_name):
+        return self.dates[DAY_INDEX[day_name]]
+
+    def __contains__(self, day):
+        return day in self.index
+
+
+@lru_cache(maxsize=64)
+def _week(monday):
+    return WeekContext(monday)
+
+
+def week_of(day):
+    """The (cached) WeekContext for the week containing `day`."""
+    return _week(day - timedelta(days=day.weekday()))
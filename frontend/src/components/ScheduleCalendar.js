@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { fetchWithAuth } from '../api';
 import './ScheduleCalendar.css';
 import ShiftForm from './ShiftForm';
@@ -20,6 +20,7 @@ function ScheduleCalendar() {
   const [selectedDateForForm, setSelectedDateForForm] = useState(null);
   const [staff, setStaff] = useState([]);
   const [coverage, setCoverage] = useState({});
+  const [fillSuggestions, setFillSuggestions] = useState({});
   const [history, setHistory] = useState([]);
   const [historyIndex, setHistoryIndex] = useState(-1);
 
@@ -89,23 +90,70 @@ function ScheduleCalendar() {
   }
 }, [viewMode, selectedDate, areas]);
 
+  // Who could fill a gap depends on the schedule, so drop cached answers when it changes
+  useEffect(() => {
+    setFillSuggestions({});
+  }, [shifts]);
+
+  // The /events connection outlives renders, so its handlers go through this
+  // ref (refreshed every render, below) to reach the current week's fetchers
+  const liveHandlers = useRef({});
+
+  // Live updates: other admins' edits arrive as deltas over /events
+  useEffect(() => {
+    let source = null;
+    let retryTimer = null;
+
+    const connect = () => {
+      const token = localStorage.getItem('access_token');
+      if (!token) return;
+
+      source = new EventSource(API_ENDPOINTS.EVENTS(token));
+      const on = (type, handler) =>
+        source.addEventListener(type, (e) => handler(JSON.parse(e.data)));
+
+      on('shift.created', (shift) => liveHandlers.current.mergeShiftChanges({ created: [shift] }));
+      on('shift.updated', (shift) => liveHandlers.current.mergeShiftChanges({ updated: [shift] }));
+      on('shift.deleted', ({ id }) => liveHandlers.current.mergeShiftChanges({ deleted: [id] }));
+      on('shifts.batch', (changes) => liveHandlers.current.mergeShiftChanges(changes));
+      on('coverage.updated', (rows) => liveHandlers.current.mergeCoverage(rows));
+      // Too large for a delta, or we fell behind: reload once
+      on('schedule.replaced', () => liveHandlers.current.fetchScheduleData());
+      on('staff.updated', () => liveHandlers.current.fetchScheduleData());
+      on('resync', () => liveHandlers.current.fetchScheduleData());
+
+      source.onerror = () => {
+        // EventSource retries dropped connections itself; it gives up on
+        // HTTP errors (e.g. an expired token), so reconnect with a fresh one
+        if (source.readyState === EventSource.CLOSED) {
+          source.close();
+          retryTimer = setTimeout(connect, 5000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
+
 const fetchCoverageData = async () => {
   try {
     const coverageData = {};
     
     const datesToCheck = viewMode === 'week' ? weekDates : [selectedDate];
-    
-    for (const date of datesToCheck) {
-      const dateStr = date.toISOString().split('T')[0];
-      coverageData[dateStr] = {};
-      
-      for (const area of areas) {
-        const response = await fetchWithAuth(API_ENDPOINTS.COVERAGE(area.id, dateStr));
-        if (response.ok) {
-          const data = await response.json();
-          coverageData[dateStr][area.id] = data;
-        }
-      }
+    const startStr = datesToCheck[0].toISOString().split('T')[0];
+    const endStr = datesToCheck[datesToCheck.length - 1].toISOString().split('T')[0];
+
+    const response = await fetchWithAuth(API_ENDPOINTS.COVERAGE_RANGE(startStr, endStr));
+    if (response.ok) {
+      const rows = await response.json();
+      rows.forEach(row => {
+        coverageData[row.date] = coverageData[row.date] || {};
+        coverageData[row.date][row.area_id] = row;
+      });
     }
     
     setCoverage(coverageData);
@@ -330,14 +378,11 @@ const handleShiftSubmit = (data) => {
       const genData = await genRes.json();
 
       // Step 2: immediately apply (replace existing)
-      const applyRes = await fetchWithAuth(API_ENDPOINTS.AI_APPLY, {
+      // The server already stored the suggestion, so apply it by id
+      const applyRes = await fetchWithAuth(API_ENDPOINTS.AI_SUGGESTION_APPLY(genData.suggestion_id), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          shifts: genData.shifts,
-          clear_existing: true,
-          week_start_date: weekStart
-        })
+        body: JSON.stringify({ clear_existing: true })
       });
       if (!applyRes.ok) {
         const err = await applyRes.json();
@@ -376,14 +421,11 @@ const handleShiftSubmit = (data) => {
       }
       const genData = await genRes.json();
 
-      const applyRes = await fetchWithAuth(API_ENDPOINTS.AI_APPLY, {
+      // The server already stored the suggestion, so apply it by id
+      const applyRes = await fetchWithAuth(API_ENDPOINTS.AI_SUGGESTION_APPLY(genData.suggestion_id), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          shifts: genData.shifts,
-          clear_existing: false,
-          week_start_date: weekStart
-        })
+        body: JSON.stringify({ clear_existing: false })
       });
       if (!applyRes.ok) {
         const err = await applyRes.json();
@@ -473,42 +515,115 @@ const handleRedo = () => {
   }
 };
 
-const restoreShiftsFromHistory = async (historicalShifts) => {
+// Send create/update/delete operations as one atomic request and merge the
+// returned rows and coverage into local state instead of reloading everything.
+const applyShiftBatch = async (operations, overrideValidation = false) => {
+  if (operations.length === 0) return;
+
+  const response = await fetchWithAuth(API_ENDPOINTS.SHIFTS_BATCH, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ operations, override_validation: overrideValidation })
+  });
+  const result = await response.json();
+  if (!response.ok) {
+    const details = (result.errors || []).map(e => e.error).join('\n');
+    throw new Error(details || result.error || 'Failed to save changes');
+  }
+
+  mergeShiftChanges(result);
+  mergeCoverage(result.coverage);
+};
+
+// Hovering a short-staffed cell asks who could be called in (admins only, once per cell)
+const loadFillSuggestions = async (areaId, date) => {
+  const dateStr = date.toISOString().split('T')[0];
+  const key = `${areaId}|${dateStr}`;
+  if (!canEditSchedule || fillSuggestions[key]) return;
+  setFillSuggestions(prev => ({ ...prev, [key]: [] }));
   try {
-    const monday = getMonday(currentWeek);
-    const weekEnd = new Date(monday);
-    weekEnd.setDate(weekEnd.getDate() + 4);
-    
-    const currentWeekShifts = shifts.filter(shift => {
-      const shiftDate = new Date(shift.date);
-      return shiftDate >= monday && shiftDate <= weekEnd;
-    });
-    
-    for (const shift of currentWeekShifts) {
-      await fetchWithAuth(API_ENDPOINTS.SHIFTS_BY_ID(shift.id), {
-        method: 'DELETE'
-      });
+    const response = await fetchWithAuth(API_ENDPOINTS.FILL_SUGGESTIONS(areaId, dateStr));
+    if (response.ok) {
+      const data = await response.json();
+      setFillSuggestions(prev => ({ ...prev, [key]: data.candidates }));
     }
-    
-    // Recreate shifts from history
-    for (const shift of historicalShifts) {
-      const shiftDate = new Date(shift.date);
-      if (shiftDate >= monday && shiftDate <= weekEnd) {
-        await fetchWithAuth(API_ENDPOINTS.SHIFTS, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            staff_id: shift.staff_id,
-            area_id: shift.area_id,
-            date: shift.date,
-            start_time: shift.start_time,
-            end_time: shift.end_time
-          })
-        });
+  } catch (err) {
+    console.error('Failed to fetch fill suggestions:', err);
+  }
+};
+
+const getCellTitle = (areaId, date, coverageStatus) => {
+  const candidates = fillSuggestions[`${areaId}|${date.toISOString().split('T')[0]}`] || [];
+  const lines = [...coverageStatus.warnings];
+  if (candidates.length > 0) {
+    lines.push('Could fill: ' + candidates.slice(0, 5).map(c =>
+      c.is_per_diem && c.marked_available ? `${c.staff_name} (per diem, available)` : c.staff_name
+    ).join(', '));
+  }
+  return lines.join('\n');
+};
+
+// Apply {created, updated, deleted} to local shifts; safe to repeat, since
+// our own changes also come back over /events
+const mergeShiftChanges = ({ created = [], updated = [], deleted = [] }) => {
+  const replaced = new Set([...deleted, ...updated.map(s => s.id), ...created.map(s => s.id)]);
+  setShifts(prev => [
+    ...prev.filter(s => !replaced.has(s.id)),
+    ...updated,
+    ...created
+  ]);
+};
+
+const mergeCoverage = (rows = []) => {
+  setCoverage(prev => {
+    const next = { ...prev };
+    rows.forEach(row => {
+      next[row.date] = { ...(next[row.date] || {}), [row.area_id]: row };
+    });
+    return next;
+  });
+};
+
+liveHandlers.current = { mergeShiftChanges, mergeCoverage, fetchScheduleData };
+
+const getWeekRange = () => {
+  const monday = getMonday(currentWeek);
+  const mondayStr = monday.toISOString().split('T')[0];
+  const fridayStr = new Date(monday.getFullYear(), monday.getMonth(), monday.getDate() + 4).toISOString().split('T')[0];
+  return [mondayStr, fridayStr];
+};
+
+const restoreShiftsFromHistory = async (historicalShifts) => {
+  try {
+    const [mondayStr, fridayStr] = getWeekRange();
+    const inWeek = (shift) => shift.date >= mondayStr && shift.date <= fridayStr;
+    const fieldsOf = ({ staff_id, area_id, date, start_time, end_time }) =>
+      ({ staff_id, area_id, date, start_time, end_time });
+
+    // Diff the snapshot against what is on screen: only changed shifts are sent
+    const current = new Map(shifts.filter(inWeek).map(shift => [shift.id, shift]));
+    const kept = new Set();
+    const operations = [];
+
+    for (const shift of historicalShifts.filter(inWeek)) {
+      const live = current.get(shift.id);
+      if (!live) {
+        operations.push({ op: 'create', ...fieldsOf(shift) });
+        continue;
+      }
+      kept.add(shift.id);
+      const fields = fieldsOf(shift);
+      if (Object.keys(fields).some(key => fields[key] !== live[key])) {
+        operations.push({ op: 'update', id: shift.id, ...fields });
       }
     }
-    
-    fetchScheduleData();
+    for (const id of current.keys()) {
+      if (!kept.has(id)) operations.push({ op: 'delete', id });
+    }
+
+    // Restore a week exactly as it was (AI and template weeks were never rule-checked);
+    // the server still refuses two shifts for one person on the same day
+    await applyShiftBatch(operations, true);
   } catch (err) {
     alert(`Error restoring: ${err.message}`);
   }
@@ -522,21 +637,12 @@ const handleClearSchedule = async () => {
   try {
     saveToHistory(shifts);
     
-    const monday = getMonday(currentWeek);
-    const mondayStr = monday.toISOString().split('T')[0];
-    const fridayStr = new Date(monday.getFullYear(), monday.getMonth(), monday.getDate() + 4).toISOString().split('T')[0];
-    
+    const [mondayStr, fridayStr] = getWeekRange();
     const weekShifts = shifts.filter(shift => {
       return shift.date >= mondayStr && shift.date <= fridayStr;
     });
     
-    for (const shift of weekShifts) {
-      await fetchWithAuth(API_ENDPOINTS.SHIFTS_BY_ID(shift.id), {
-        method: 'DELETE'
-      });
-    }
-    
-    fetchScheduleData();
+    await applyShiftBatch(weekShifts.map(shift => ({ op: 'delete', id: shift.id })));
   } catch (err) {
     alert(`Error clearing schedule: ${err.message}`);
   }
@@ -701,7 +807,12 @@ const handleClearSchedule = async () => {
                     key={`${area.id}-${date.toISOString()}`} 
                     className={`schedule-cell ${coverageStatus.status}`}
                     onClick={() => switchToDayView(date)}
-                    title={coverageStatus.warnings.join(', ')}
+                    onMouseEnter={() => {
+                      if (coverageStatus.status === 'understaffed' || coverageStatus.status === 'empty') {
+                        loadFillSuggestions(area.id, date);
+                      }
+                    }}
+                    title={getCellTitle(area.id, date, coverageStatus)}
                   >
                     {areaShifts.length === 0 ? (
                       <div className="empty-cell">Not Staffed</div>
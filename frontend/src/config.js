@@ -62,6 +62,8 @@ export const API_ENDPOINTS = {
 
   SHIFTS_BY_ID: (id) => buildApiUrl(`shifts/${id}`),
 
+  SHIFTS_BATCH: buildApiUrl('shifts/batch'),
+
  
 
   // Areas
@@ -71,6 +73,8 @@ export const API_ENDPOINTS = {
   AREAS_BY_ID: (id) => buildApiUrl(`areas/${id}`),
 
   COVERAGE: (areaId, date) => buildApiUrl(`coverage/${areaId}/${date}`),
+  COVERAGE_RANGE: (startDate, endDate) => buildApiUrl(`coverage?start_date=${startDate}&end_date=${endDate}`),
+  FILL_SUGGESTIONS: (areaId, date) => buildApiUrl(`fill-suggestions?area_id=${areaId}&date=${date}`),
 
  
 
@@ -88,6 +92,8 @@ export const API_ENDPOINTS = {
 
   AI_APPLY: buildApiUrl('ai/apply-schedule'),
 
+  AI_SUGGESTION_APPLY: (id) => buildApiUrl(`ai/suggestions/${id}/apply`),
+
  
 
   // Health
@@ -96,6 +102,12 @@ export const API_ENDPOINTS = {
 
   READY: buildApiUrl('ready'),
 
+ 
+
+  // Live updates (EventSource can't send headers, so the token goes in the query)
+
+  EVENTS: (token) => buildApiUrl(`events?jwt=${encodeURIComponent(token)}`),
+
 };
 
  